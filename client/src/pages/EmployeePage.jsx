@@ -1,8 +1,10 @@
 import { useEffect, useState } from 'react';
 import { Calendar, FileText, Send, Check, X, AlertCircle } from 'lucide-react';
-import { useSelector } from 'react-redux';
+import { useDispatch, useSelector } from 'react-redux';
 import { backendUrl } from '../utils/const';
 import createAxiosInstance from '../utils/api/axiosInstance';
+import subscribeToApplicationEvents, { coalesce } from '../utils/api/events';
+import { renewTokens } from '../utils/api/tokens';
 import { createPortal } from 'react-dom';
 
 
@@ -103,6 +105,7 @@ const EmployeePage = () => {
   const [leaveApplications, setLeaveApplications] = useState([]);
   const [managers, setManagers] = useState([]);
   const token = useSelector((state) => state.auth.accessToken);
+  const dispatch = useDispatch();
   const [formData, setFormData] = useState({
     start_date: '',
     end_date: '',
@@ -155,6 +158,22 @@ const EmployeePage = () => {
 
     fetchLeaveApplications();
     fetchManagers();
+
+    // Status changes are patched in place; other events refetch, once per burst.
+    const refetch = coalesce(fetchLeaveApplications);
+    const unsubscribe = subscribeToApplicationEvents(token, (event) => {
+      if (event.type === 'application.status_changed') {
+        setLeaveApplications((applications) => applications.map((application) => (
+          application.id === event.id ? { ...application, status: event.status } : application
+        )));
+      } else {
+        refetch();
+      }
+    }, () => dispatch(renewTokens()));
+    return () => {
+      unsubscribe();
+      refetch.cancel();
+    };
   }, [token]);
 
   const showToast = (message, type = 'success') => {
@@ -2,7 +2,9 @@ import { useEffect, useState } from 'react';
 import { Calendar, FileText, Check, X, Mail, ChevronDown, ChevronUp, AlertCircle } from 'lucide-react';
 import { backendUrl } from '../utils/const';
 import createAxiosInstance from '../utils/api/axiosInstance';
-import { useSelector } from 'react-redux';
+import subscribeToApplicationEvents, { coalesce } from '../utils/api/events';
+import { renewTokens } from '../utils/api/tokens';
+import { useDispatch, useSelector } from 'react-redux';
 import { createPortal } from 'react-dom';
 
 const ConfirmationModal = ({ isOpen, onClose, title, description, onConfirm, application }) => {
@@ -113,9 +115,19 @@ const ManagerPage = () => {
     type: 'success'
   });
   const token = useSelector(state => state.auth.accessToken);
+  const dispatch = useDispatch();
 
   useEffect(() => {
     fetchData();
+    // Every event changes the report totals, so refetch both; the server caches them per manager.
+    // Bursts (e.g. a bulk decision) are coalesced into one refetch. A renewed token changes
+    // `token`, which subscribes again.
+    const refetch = coalesce(() => fetchData());
+    const unsubscribe = subscribeToApplicationEvents(token, refetch, () => dispatch(renewTokens()));
+    return () => {
+      unsubscribe();
+      refetch.cancel();
+    };
   }, [token]);
 
   const fetchData = async () => {
@@ -0,0 +1,77 @@
+import { backendUrl } from '../const';
+import { tokenExpiry } from './tokens';
+
+export const APPLICATION_EVENTS = [
+  'application.created',
+  'application.updated',
+  'application.status_changed',
+  'application.deleted',
+  'resync',
+];
+
+// How long before the access token expires to ask for a fresh one.
+const RENEW_MARGIN_MS = 60 * 1000;
+
+// How long to gather events before refetching, so a bulk decision's burst costs one refetch.
+const REFETCH_DELAY_MS = 500;
+
+// Wraps `refetch` so that calls within REFETCH_DELAY_MS of the first one run it once, at the end
+// of that window; a steady stream of events still refetches every REFETCH_DELAY_MS. `cancel`
+// drops a pending run, e.g. when unsubscribing.
+export const coalesce = (refetch) => {
+  let timer = null;
+  const run = () => {
+    if (timer === null) {
+      timer = setTimeout(() => {
+        timer = null;
+        refetch();
+      }, REFETCH_DELAY_MS);
+    }
+  };
+  run.cancel = () => {
+    clearTimeout(timer);
+    timer = null;
+  };
+  return run;
+};
+
+// Server-sent application events for the signed-in user. EventSource cannot send an
+// Authorization header, so the access token goes in the query string. The server ends the
+// stream when the token expires, and the browser's own reconnect would reuse the expired token,
+// get a 401 and give up. So shortly before expiry, or once the connection is closed for good,
+// `onExpired` is called to refresh the tokens; the caller then subscribes again with the new
+// access token. Returns an unsubscribe.
+const subscribeToApplicationEvents = (token, onEvent, onExpired = () => {}) => {
+  if (!token || typeof EventSource === 'undefined') {
+    return () => {};
+  }
+  const source = new EventSource(`${backendUrl}/events/?token=${encodeURIComponent(token)}`);
+  APPLICATION_EVENTS.forEach((type) => {
+    source.addEventListener(type, (message) => onEvent(JSON.parse(message.data)));
+  });
+
+  let expired = false;
+  const expire = () => {
+    if (expired) {
+      return;
+    }
+    expired = true;
+    source.close();
+    onExpired();
+  };
+  source.onerror = () => {
+    // CONNECTING means the browser is retrying by itself; CLOSED means it stopped (e.g. a 401).
+    if (source.readyState === EventSource.CLOSED) {
+      expire();
+    }
+  };
+  const timer = setTimeout(expire, Math.max(tokenExpiry(token) - Date.now() - RENEW_MARGIN_MS, 0));
+
+  return () => {
+    expired = true;
+    clearTimeout(timer);
+    source.close();
+  };
+};
+
+export default subscribeToApplicationEvents;
@@ -0,0 +1,24 @@
+import axios from 'axios';
+import { backendUrl } from '../const';
+import { setUserSignIn } from '../redux/authSlice';
+
+// Exchange a refresh token for new tokens: { access, refresh, user }, the shape setUserSignIn expects.
+export const refreshTokens = async (refreshToken) => {
+  const response = await axios.post(`${backendUrl}/token/refresh/`, { refresh: refreshToken });
+  return response.data;
+};
+
+// Milliseconds since the epoch at which a JWT expires, read from its unverified payload.
+export const tokenExpiry = (token) => {
+  const payload = token.split('.')[1].replace(/-/g, '+').replace(/_/g, '/');
+  return JSON.parse(atob(payload)).exp * 1000;
+};
+
+// Thunk: refresh the signed-in user's tokens in the store, e.g. for an event stream about to expire.
+export const renewTokens = () => async (dispatch, getState) => {
+  try {
+    dispatch(setUserSignIn(await refreshTokens(getState().auth.refreshToken)));
+  } catch (error) {
+    console.error('Failed to refresh token:', error);
+  }
+};
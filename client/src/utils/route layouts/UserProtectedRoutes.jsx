@@ -4,6 +4,7 @@ import { Outlet, useNavigate } from 'react-router-dom';
 import { backendUrl } from '../const';
 import axios from 'axios';
 import { setUserSignIn, setUserSignOut } from '../redux/authSlice';
+import { refreshTokens } from '../api/tokens';
 
 const UserProtectedRoutes = () => {
   const isAuthenticated = useSelector(state => state.auth.isAuthenticated);
@@ -15,13 +16,9 @@ const UserProtectedRoutes = () => {
     console.log("updateToken triggered");
 
     try {
-      const response = await axios.post(`${backendUrl}/token/refresh/`, { refresh: refreshToken });
-      if (response.status === 200) {
-        console.log('Token refreshed successfully:', response.data);
-        dispatch(setUserSignIn(response.data));
-      } else {
-        throw new Error('Token refresh failed');
-      }
+      const data = await refreshTokens(refreshToken);
+      console.log('Token refreshed successfully:', data);
+      dispatch(setUserSignIn(data));
     } catch (error) {
       console.error('Failed to refresh token:', error);
       dispatch(setUserSignOut());
@@ -34,6 +34,9 @@ ALLOWED_HOSTS = os.getenv('ALLOWED_HOSTS').split(',')
 
 CORS_ALLOWED_ORIGINS = os.getenv('CORS_ALLOWED_ORIGINS').split(',')
 
+# Let the client read list/report validators for If-None-Match requests.
+CORS_EXPOSE_HEADERS = ['ETag']
+
 
 # Application definition 
   
@@ -49,6 +52,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'users.instrumentation.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -91,13 +95,83 @@ DATABASES = {
         'PORT' : os.getenv('PORT'),
         'USER' : os.getenv('USR'),
         'PASSWORD' : os.getenv('PASSWORD'),
+        # Seconds to keep a connection open across requests (0 closes it after every request).
+        # Under ASGI each request may run on another thread, so prefer the pool there.
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 0)),
+        # Check a reused connection before the request runs on it.
+        'CONN_HEALTH_CHECKS': bool(os.getenv('DB_CONN_HEALTH_CHECKS')),
     }
 }
 
+# SQLite locks the whole database for writes. A transaction that reads first cannot take the write
+# lock while another one holds it and fails with "database is locked" instead of waiting, so begin
+# transactions as writers: they then queue on the lock, for up to the busy timeout.
+if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+    DATABASES['default']['OPTIONS'] = {'transaction_mode': 'IMMEDIATE'}
+
+# PostgreSQL connection pool (psycopg 3), shared by the threads of one server process. Pooled
+# connections are returned after every request, so keep DB_CONN_MAX_AGE at 0 when enabling it.
+# Compare the modes with `manage.py bench_connections`.
+if bool(os.getenv('DB_POOL')):
+    DATABASES['default']['OPTIONS'] = {
+        'pool': {
+            'min_size': int(os.getenv('DB_POOL_MIN_SIZE', 2)),
+            'max_size': int(os.getenv('DB_POOL_MAX_SIZE', 10)),
+            'timeout': float(os.getenv('DB_POOL_TIMEOUT', 10)),
+        },
+    }
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# 'dashboard' holds per-manager responses, see users.cache. Use a shared backend
+# (e.g. redis or memcached) when running several server processes.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'dashboard': {
+        'BACKEND': os.getenv('DASHBOARD_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('DASHBOARD_CACHE_LOCATION', 'dashboard'),
+        'TIMEOUT': int(os.getenv('DASHBOARD_CACHE_TIMEOUT', 300)),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv('DASHBOARD_CACHE_MAX_ENTRIES', 1000)),
+        },
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
+# Hashing cost of new and rehashed passwords, see users.hashers. Stored hashes move to the
+# current cost on each user's next sign-in. Unset keeps Django's default PBKDF2 iterations.
+PASSWORD_HASH_ITERATIONS = int(os.getenv('PASSWORD_HASH_ITERATIONS', 0)) or None
+
+# Django's defaults with users.hashers handling pbkdf2_sha256.
+PASSWORD_HASHERS = [
+    'users.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+
+AUTHENTICATION_BACKENDS = ['users.backends.SignInBackend']
+
+# Password hashing for sign-ins runs on this many threads, with at most SIGNIN_HASH_QUEUE more
+# waiting; beyond that sign-in answers 503 instead of taking CPU from other requests.
+SIGNIN_HASH_WORKERS = int(os.getenv('SIGNIN_HASH_WORKERS', max(1, (os.cpu_count() or 2) // 2)))
+SIGNIN_HASH_QUEUE = int(os.getenv('SIGNIN_HASH_QUEUE', 32))
+
+# Failed sign-ins allowed per username and per client address, as token buckets refilling at
+# the same rate (see users.throttling). Successful sign-ins are not counted.
+SIGNIN_THROTTLE_RATES = {
+    'username': os.getenv('SIGNIN_USERNAME_RATE', '5/minute'),
+    'address': os.getenv('SIGNIN_ADDRESS_RATE', '30/minute'),
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -141,10 +215,66 @@ AUTH_USER_MODEL = 'users.User'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
-    )
+        'users.authentication.ClaimsAuthentication',
+    ),
+    # In-memory token buckets per server process, see users.throttling. An empty rate disables one.
+    'DEFAULT_THROTTLE_CLASSES': (
+        'users.throttling.UserBucketThrottle',
+        'users.throttling.EndpointBucketThrottle',
+    ),
+    'DEFAULT_THROTTLE_RATES': {
+        'anon': os.getenv('API_ANON_RATE', '120/minute'),
+        'user': os.getenv('API_USER_RATE', '600/minute'),
+        # Per user and endpoint, for views naming a throttle_scope.
+        'subordinate-applications': os.getenv('DASHBOARD_RATE', '120/minute'),
+        'total-leaves-report': os.getenv('DASHBOARD_RATE', '120/minute'),
+        'exports': os.getenv('EXPORT_RATE', '30/minute'),
+    },
+    # Reverse proxies in front of the server. Throttles key anonymous clients on the address that many
+    # X-Forwarded-For entries from the right; 0 ignores the client-supplied header and uses REMOTE_ADDR.
+    'NUM_PROXIES': int(os.getenv('NUM_PROXIES', 0)),
 }
 
+# Opt-in keyset pagination for list endpoints, see users.pagination.KeysetPagination
+KEYSET_PAGE_SIZE = int(os.getenv('KEYSET_PAGE_SIZE', 50))
+KEYSET_MAX_PAGE_SIZE = int(os.getenv('KEYSET_MAX_PAGE_SIZE', 500))
+
+# Requests running more queries than this are logged and flagged with X-Query-Budget-Exceeded (0 disables)
+REQUEST_QUERY_BUDGET = int(os.getenv('REQUEST_QUERY_BUDGET', 20))
+
+# Largest batch accepted by the bulk application endpoints
+BULK_MAX_ITEMS = int(os.getenv('BULK_MAX_ITEMS', 500))
+
+# Longest single application in days; also bounds the index range scanned for overlapping leave
+MAX_LEAVE_DAYS = int(os.getenv('MAX_LEAVE_DAYS', 366))
+
+# Years precomputed in the CalendarDay table used by leave analytics, see users.calendar
+LEAVE_CALENDAR_FIRST_YEAR = int(os.getenv('LEAVE_CALENDAR_FIRST_YEAR', 2000))
+LEAVE_CALENDAR_LAST_YEAR = int(os.getenv('LEAVE_CALENDAR_LAST_YEAR', 2050))
+
+# Leave is counted in working days: weekend days (date.weekday() numbers, Monday is 0) and the
+# users.Holiday rows of this region are excluded. Run `manage.py build_calendar` after changes.
+LEAVE_WEEKEND_DAYS = [int(day) for day in os.getenv('LEAVE_WEEKEND_DAYS', '5,6').split(',') if day.strip()]
+LEAVE_CALENDAR_REGION = os.getenv('LEAVE_CALENDAR_REGION', '')
+
+# Approved and rejected applications that ended before the last ARCHIVE_HOT_YEARS calendar years
+# (the current one included) are moved to the archive table by `manage.py archive_applications`
+ARCHIVE_HOT_YEARS = int(os.getenv('ARCHIVE_HOT_YEARS', 2))
+ARCHIVE_BATCH_SIZE = int(os.getenv('ARCHIVE_BATCH_SIZE', 1000))
+
+# Background total leave reports, see users.jobs and `manage.py run_report_jobs`. A job running
+# longer than REPORT_JOB_TIMEOUT seconds is assumed abandoned and retried, up to REPORT_JOB_MAX_ATTEMPTS times.
+REPORT_JOB_TIMEOUT = int(os.getenv('REPORT_JOB_TIMEOUT', 600))
+REPORT_JOB_MAX_ATTEMPTS = int(os.getenv('REPORT_JOB_MAX_ATTEMPTS', 3))
+REPORT_JOB_POLL_SECONDS = float(os.getenv('REPORT_JOB_POLL_SECONDS', 2))
+REPORT_JOB_RETENTION_DAYS = int(os.getenv('REPORT_JOB_RETENTION_DAYS', 7))
+
+# Application change events streamed to browsers (ASGI only), see users.events. The in-process
+# broker only reaches clients of the same server process.
+EVENTS_BROKER = os.getenv('EVENTS_BROKER', 'users.events.InProcessBroker')
+EVENTS_KEEPALIVE_SECONDS = float(os.getenv('EVENTS_KEEPALIVE_SECONDS', 15))
+EVENTS_RETRY_MILLISECONDS = int(os.getenv('EVENTS_RETRY_MILLISECONDS', 5000))
+
 from datetime import timedelta
 
 
@@ -157,4 +287,5 @@ SIMPLE_JWT = {
     "SIGNING_KEY": SECRET_KEY, 
     "AUTH_HEADER_TYPES": ("Bearer",),
     "AUTH_TOKEN_CLASSES": ("rest_framework_simplejwt.tokens.AccessToken",),
+    "TOKEN_USER_CLASS": "users.authentication.ClaimsUser",
 }
@@ -0,0 +1,59 @@
+"""
+Hot/cold split of applications. Closed (approved or rejected) applications that ended before the
+horizon move, ids and all, from Application to ArchivedApplication in short batches, each its own
+transaction, so a move can be stopped at any point and resumed by running it again. Everything
+reads the hot table unless asked for the archive; the LeaveBalance ledger counts both.
+"""
+from datetime import date
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from . import models, signals
+
+FIELDS = ['id', 'user_id', 'leave_type_id', 'start_date', 'end_date', 'reason', 'status', 'manager_id']
+
+
+def horizon(today=None):
+    """The first day that stays hot: January 1st of the oldest of the last ARCHIVE_HOT_YEARS years."""
+    today = today or timezone.now().date()
+    return date(today.year - max(settings.ARCHIVE_HOT_YEARS, 1) + 1, 1, 1)
+
+
+def candidates(before):
+    return models.Application.objects.filter(end_date__lt=before).exclude(status=models.Status.PENDING)
+
+
+def source(archived):
+    """The table list and export endpoints read: the archive only when asked for it."""
+    return models.ArchivedApplication if archived else models.Application
+
+
+def move_batch(before, batch_size=None):
+    """Move up to `batch_size` of the oldest archivable applications; returns how many moved."""
+    batch_size = batch_size or settings.ARCHIVE_BATCH_SIZE
+    with transaction.atomic():
+        rows = list(
+            candidates(before).select_for_update().order_by('id').values(*FIELDS)[:batch_size]
+        )
+        if not rows:
+            return 0
+        models.ArchivedApplication.objects.bulk_create(models.ArchivedApplication(**row) for row in rows)
+        token = signals.archiving.set(True)
+        try:
+            models.Application.objects.filter(id__in=[row['id'] for row in rows]).delete()
+        finally:
+            signals.archiving.reset(token)
+        # The ledger is unchanged, but the rows left the default listings.
+        signals.listings_changed({(row['user_id'], row['manager_id']) for row in rows})
+    return len(rows)
+
+
+def move(before, batch_size=None, max_batches=None):
+    """Move archivable applications batch by batch, yielding each batch's count."""
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        moved = move_batch(before, batch_size)
+        if not moved:
+            return
+        batches += 1
+        yield moved
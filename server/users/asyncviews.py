@@ -0,0 +1,52 @@
+from asgiref.sync import sync_to_async
+
+
+class AsyncGetMixin:
+    """
+    Serve GET from the view's `aget` coroutine so dashboard polls wait on the async ORM instead
+    of holding a worker thread under ASGI. Authentication, permissions, throttling, exception
+    handling and rendering stay DRF's own; the stateless JWT authentication reads no database,
+    so they are safe to run in the event loop. Other methods, and HEAD, go through the regular
+    synchronous dispatch in a worker thread.
+    """
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        sync_view = sync_to_async(super().as_view(**initkwargs))
+
+        async def view(request, *args, **kwargs):
+            if request.method != 'GET':
+                return await sync_view(request, *args, **kwargs)
+            self = cls(**initkwargs)
+            self.setup(request, *args, **kwargs)
+            return await self.adispatch(request, *args, **kwargs)
+
+        view.cls = cls
+        view.initkwargs = initkwargs
+        # Like APIView.as_view: authentication is by token, not by session cookie.
+        view.csrf_exempt = True
+        return view
+
+    async def adispatch(self, request, *args, **kwargs):
+        """APIView.dispatch for the `aget` coroutine."""
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+        try:
+            self.initial(request, *args, **kwargs)
+            response = await self.aget(request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+    async def apaginate_queryset(self, queryset):
+        """
+        paginate_queryset for coroutines. Unpaginated requests (the default) need no query here;
+        DRF's cursor pagination has no async form, so paginated ones run it in a worker thread.
+        """
+        if self.paginator is None or self.paginator.get_page_size(self.request) is None:
+            return None
+        return await sync_to_async(self.paginate_queryset)(queryset)
@@ -0,0 +1,61 @@
+from django.utils.functional import cached_property
+from rest_framework_simplejwt.authentication import JWTStatelessUserAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.tokens import RefreshToken
+from . import models
+
+# Profile fields copied into every token, so requests can be authenticated without loading the User row.
+USER_CLAIMS = ['name', 'username', 'email', 'is_staff']
+
+
+def tokens_for_user(user):
+    """A refresh token carrying USER_CLAIMS; each refresh re-reads them (see CustomTokenRefreshSerializer)."""
+    refresh = RefreshToken.for_user(user)
+    for claim in USER_CLAIMS:
+        refresh[claim] = getattr(user, claim)
+    return refresh
+
+
+def user_from_claims(token):
+    return {'id': token['user_id'], **{claim: token[claim] for claim in USER_CLAIMS if claim != 'is_staff'}}
+
+
+class ClaimsAuthentication(JWTStatelessUserAuthentication):
+    """
+    Stateless JWT authentication that refuses access tokens issued before USER_CLAIMS existed.
+    Reading those users from the database would be a synchronous query, which async views
+    (see AsyncGetMixin) cannot make; refreshing the token, or signing in again, adds the claims.
+    """
+
+    def get_user(self, validated_token):
+        if any(claim not in validated_token for claim in USER_CLAIMS):
+            raise InvalidToken({'detail': 'Token has no profile claims, refresh it or sign in again', 'code': 'token_not_valid'})
+        return super().get_user(validated_token)
+
+
+class ClaimsUser(TokenUser):
+    """
+    request.user for ClaimsAuthentication (see SIMPLE_JWT['TOKEN_USER_CLASS']).
+    Profile attributes come from the token; `instance` loads the full User only when a view needs it.
+    """
+
+    @cached_property
+    def instance(self):
+        return models.User.objects.get(pk=self.id)
+
+    @cached_property
+    def username(self):
+        return self.token['username']
+
+    @cached_property
+    def name(self):
+        return self.token['name']
+
+    @cached_property
+    def email(self):
+        return self.token['email']
+
+    @cached_property
+    def is_staff(self):
+        return self.token['is_staff']
@@ -0,0 +1,82 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.contrib.auth import get_user_model, hashers
+from django.contrib.auth.backends import ModelBackend
+from rest_framework.exceptions import APIException
+
+
+class SignInBusy(APIException):
+    status_code = 503
+    default_detail = 'Too many sign-ins in progress, try again shortly.'
+    default_code = 'sign_in_busy'
+    # Seconds, sent as Retry-After.
+    wait = 1
+
+
+_pool = None
+_slots = None
+_lock = threading.Lock()
+
+
+def _executor():
+    global _pool, _slots
+    with _lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=settings.SIGNIN_HASH_WORKERS, thread_name_prefix='password-hashing')
+            _slots = threading.BoundedSemaphore(settings.SIGNIN_HASH_WORKERS + settings.SIGNIN_HASH_QUEUE)
+        return _pool, _slots
+
+
+def reset():
+    """Drop the pool so the next sign-in sizes a new one from the settings."""
+    global _pool, _slots
+    with _lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False)
+        _pool = _slots = None
+
+
+def hash_in_pool(function, *args):
+    """Run a password hashing function on the bounded pool; raise SignInBusy when it is full."""
+    pool, slots = _executor()
+    if not slots.acquire(blocking=False):
+        raise SignInBusy()
+    try:
+        return pool.submit(function, *args).result()
+    finally:
+        slots.release()
+
+
+def check_password(user, raw_password):
+    """user.check_password with the hashing on the pool; a rehash at the current cost is saved here."""
+    rehashed = []
+    valid = hash_in_pool(hashers.check_password, raw_password, user.password, lambda raw: rehashed.append(hashers.make_password(raw)))
+    if rehashed:
+        user.password = rehashed[0]
+        user.save(update_fields=['password'])
+    return valid
+
+
+class SignInBackend(ModelBackend):
+    """
+    ModelBackend with password hashing on a bounded worker pool, so a sign-in spike queues
+    for SIGNIN_HASH_WORKERS threads instead of taking every core from the other requests.
+    The database work stays on the request's thread and connection.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        UserModel = get_user_model()
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = UserModel._default_manager.get_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            # Hash anyway, like ModelBackend, so unknown usernames take as long as wrong passwords.
+            hash_in_pool(hashers.make_password, password)
+            return None
+        if check_password(user, password) and self.user_can_authenticate(user):
+            return user
+        return None
@@ -0,0 +1,108 @@
+import hashlib
+import threading
+import time
+from collections import Counter
+from django.core.cache import caches
+from .singleflight import Group
+
+# Per-process hit/miss/invalidation counters for the dashboard cache, see DashboardCacheStats.
+# `coalesced` counts misses answered by a computation another request already had running.
+stats = Counter()
+_stats_lock = threading.Lock()
+
+# Identical dashboard requests arriving together compute once, see users.singleflight.
+flights = Group()
+
+
+def _count(name):
+    with _stats_lock:
+        stats[name] += 1
+
+
+def dashboard_cache():
+    return caches['dashboard']
+
+
+def _version_key(manager_id):
+    return f'dashboard:version:{manager_id}'
+
+
+def _version(manager_id):
+    """
+    The manager's current cache generation. A missing (expired or culled) generation restarts at the
+    current time, so it can never collide with entries written under an earlier one.
+    """
+    cache = dashboard_cache()
+    version = cache.get(_version_key(manager_id))
+    if version is None:
+        cache.add(_version_key(manager_id), time.time_ns(), timeout=None)
+        version = cache.get(_version_key(manager_id))
+    return version
+
+
+def invalidate(*manager_ids):
+    """Drop every cached dashboard response of the given managers by moving them to a new generation."""
+    cache = dashboard_cache()
+    for manager_id in set(manager_ids):
+        try:
+            cache.incr(_version_key(manager_id))
+        except ValueError:
+            pass
+        _count('invalidations')
+
+
+def _key(view_name, manager_id, version, params):
+    query = hashlib.md5(params.urlencode().encode()).hexdigest()
+    return f'dashboard:{view_name}:{manager_id}:{version}:{query}'
+
+
+def get_or_compute(view_name, manager_id, params, compute):
+    """
+    Return the cached response data for (view, manager, query params), computing and storing it on
+    a miss. Concurrent misses for the same key and cache generation share one computation.
+    """
+    key = _key(view_name, manager_id, _version(manager_id), params)
+    cache = dashboard_cache()
+
+    data = cache.get(key)
+    if data is not None:
+        _count('hits')
+        return data
+
+    def compute_and_store():
+        data = compute()
+        cache.set(key, data)
+        return data
+
+    data, shared = flights.do(key, compute_and_store)
+    _count('coalesced' if shared else 'misses')
+    return data
+
+
+async def _aversion(manager_id):
+    cache = dashboard_cache()
+    version = await cache.aget(_version_key(manager_id))
+    if version is None:
+        await cache.aadd(_version_key(manager_id), time.time_ns(), timeout=None)
+        version = await cache.aget(_version_key(manager_id))
+    return version
+
+
+async def aget_or_compute(view_name, manager_id, params, compute):
+    """get_or_compute for async views: `compute` is a coroutine function and the cache is used through its async API."""
+    key = _key(view_name, manager_id, await _aversion(manager_id), params)
+    cache = dashboard_cache()
+
+    data = await cache.aget(key)
+    if data is not None:
+        _count('hits')
+        return data
+
+    async def compute_and_store():
+        data = await compute()
+        await cache.aset(key, data)
+        return data
+
+    data, shared = await flights.ado(key, compute_and_store)
+    _count('coalesced' if shared else 'misses')
+    return data
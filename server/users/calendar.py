@@ -0,0 +1,132 @@
+import threading
+import time
+from array import array
+from datetime import date, timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import ExpressionWrapper, IntegerField, OuterRef, Subquery
+from . import cache, conditional, models
+
+
+def configured_range():
+    return date(settings.LEAVE_CALENDAR_FIRST_YEAR, 1, 1), date(settings.LEAVE_CALENDAR_LAST_YEAR, 12, 31)
+
+
+def covers(start_date, end_date):
+    first, last = configured_range()
+    return first <= start_date and end_date <= last
+
+
+class WorkingDayCalendar:
+    """
+    Working days of one region over [first, last], stored as a cumulative count array:
+    through[i] is the number of working days from `first` up to, but excluding, first + i days.
+    Counting the working days between two dates is then two array reads.
+    """
+
+    def __init__(self, first, last, weekend, holidays):
+        self.first = first
+        self.last = last
+        self.weekend = frozenset(weekend)
+        self.holidays = frozenset(holidays)
+        self.through = array('l', [0])
+        day = first
+        while day <= last:
+            self.through.append(self.through[-1] + self.is_working_day(day))
+            day += timedelta(days=1)
+
+    def is_working_day(self, day):
+        return day.weekday() not in self.weekend and day not in self.holidays
+
+    def working_days(self, start_date, end_date):
+        """Working days in [start_date, end_date]; O(1) inside the precomputed range."""
+        if end_date < start_date:
+            return 0
+        if self.first <= start_date and end_date <= self.last:
+            return self.through[(end_date - self.first).days + 1] - self.through[(start_date - self.first).days]
+        return sum(self.is_working_day(start_date + timedelta(days=i)) for i in range((end_date - start_date).days + 1))
+
+
+_calendars = {}
+_calendars_lock = threading.Lock()
+
+_VERSION_KEY = 'calendar:version'
+
+
+def _version():
+    """
+    The calendar generation, shared by every process through the dashboard cache and moved on by
+    build(), so running workers stop counting ledger days with holidays from before a rebuild.
+    """
+    store = cache.dashboard_cache()
+    version = store.get(_VERSION_KEY)
+    if version is None:
+        store.add(_VERSION_KEY, time.time_ns(), timeout=None)
+        version = store.get(_VERSION_KEY)
+    return version
+
+
+def get_calendar(region=None):
+    """The process-wide calendar of `region` (default LEAVE_CALENDAR_REGION), built on first use of a generation."""
+    region = settings.LEAVE_CALENDAR_REGION if region is None else region
+    version = _version()
+    with _calendars_lock:
+        built = _calendars.get(region)
+        if built is None or built[0] != version:
+            first, last = configured_range()
+            holidays = models.Holiday.objects.filter(region=region, date__range=(first, last)).values_list('date', flat=True)
+            built = _calendars[region] = version, WorkingDayCalendar(first, last, settings.LEAVE_WEEKEND_DAYS, holidays)
+        return built[1]
+
+
+def reset():
+    """Forget this process's built calendars, e.g. after holidays or weekend settings change."""
+    with _calendars_lock:
+        _calendars.clear()
+
+
+def working_days(start_date, end_date):
+    return get_calendar().working_days(start_date, end_date)
+
+
+def working_day_span(start='start_date', end='end_date'):
+    """
+    Database-side working days between two date columns, read from the CalendarDay cumulative
+    counts with two primary-key lookups. Dates outside the calendar count as NULL.
+    """
+    through = models.CalendarDay.objects.filter(date=OuterRef(end)).values('working_days_through')
+    before = models.CalendarDay.objects.filter(date=OuterRef(start)).values('working_days_before')
+    return ExpressionWrapper(Subquery(through) - Subquery(before), output_field=IntegerField())
+
+
+def calendar_days(calendar):
+    day = calendar.first
+    for i in range(len(calendar.through) - 1):
+        yield models.CalendarDay(
+            date=day, year=day.year, month=day.month,
+            is_working_day=calendar.through[i + 1] > calendar.through[i],
+            working_days_before=calendar.through[i],
+            working_days_through=calendar.through[i + 1],
+        )
+        day += timedelta(days=1)
+
+
+def build(batch_size=5000, using='default'):
+    """
+    Replace the CalendarDay rows with the configured region's calendar over configured_range(),
+    the span covers() accepts leave in. The whole range is rewritten because every row carries
+    running totals from the first day.
+    """
+    reset()
+    first, last = configured_range()
+    holidays = models.Holiday.objects.using(using).filter(
+        region=settings.LEAVE_CALENDAR_REGION, date__range=(first, last),
+    ).values_list('date', flat=True)
+    days = WorkingDayCalendar(first, last, settings.LEAVE_WEEKEND_DAYS, holidays)
+    with transaction.atomic(using=using):
+        models.CalendarDay.objects.using(using).all().delete()
+        models.CalendarDay.objects.using(using).bulk_create(calendar_days(days), batch_size=batch_size)
+        # Reports and their snapshots count working days from these rows.
+        conditional.bump_all_watermarks(using=using)
+    # Every process rebuilds its calendar on next use.
+    cache.dashboard_cache().set(_VERSION_KEY, time.time_ns(), timeout=None)
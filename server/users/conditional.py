@@ -0,0 +1,66 @@
+import hashlib
+import inspect
+from functools import wraps
+from django.db.models import F
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from . import models
+
+
+def bump_watermarks(*user_ids):
+    """Mark the listed users' applications and reports as changed, invalidating their ETags."""
+    models.User.objects.filter(pk__in=set(user_ids)).update(leave_watermark=F('leave_watermark') + 1)
+
+
+def bump_all_watermarks(using='default'):
+    """For changes that reach every report at once, like a ledger or calendar rebuild."""
+    models.User.objects.using(using).update(leave_watermark=F('leave_watermark') + 1)
+
+
+def _etag(view_name, request, watermark, extra):
+    query = hashlib.md5(request.query_params.urlencode().encode()).hexdigest()
+    return '"' + ':'.join(str(part) for part in [view_name, request.user.id, watermark, *extra, query]) + '"'
+
+
+def _watermark(request):
+    return models.User.objects.filter(pk=request.user.id).values_list('leave_watermark', flat=True)
+
+
+def etag_for(view_name, request, *extra):
+    return _etag(view_name, request, _watermark(request).first(), extra)
+
+
+async def aetag_for(view_name, request, *extra):
+    return _etag(view_name, request, await _watermark(request).afirst(), extra)
+
+
+def _tag(response, etag):
+    response['ETag'] = etag
+    patch_vary_headers(response, ['Authorization'])
+    return response
+
+
+def conditional_get(view_name, extra=lambda request: ()):
+    """
+    Decorate a GET handler, or an async `aget` one, so a matching If-None-Match is answered with
+    304 after a single watermark lookup, before the handler builds a queryset or serializes anything.
+    """
+    def decorator(handler):
+        if inspect.iscoroutinefunction(handler):
+            @wraps(handler)
+            async def awrapped(self, request, *args, **kwargs):
+                etag = await aetag_for(view_name, request, *extra(request))
+                response = get_conditional_response(request, etag=etag)
+                if response is None:
+                    response = await handler(self, request, *args, **kwargs)
+                return _tag(response, etag)
+            return awrapped
+
+        @wraps(handler)
+        def wrapped(self, request, *args, **kwargs):
+            etag = etag_for(view_name, request, *extra(request))
+            response = get_conditional_response(request, etag=etag)
+            if response is None:
+                response = handler(self, request, *args, **kwargs)
+            return _tag(response, etag)
+        return wrapped
+    return decorator
@@ -0,0 +1,154 @@
+"""
+Application change events pushed to browsers over server-sent events (see views.ApplicationEvents).
+
+Events are published to one channel per user. The broker is chosen by settings.EVENTS_BROKER:
+anything with a synchronous `publish(channel, event)` and a `subscribe(channel)` returning an
+object with `async get()` and `close()` will do. The default InProcessBroker only reaches streams
+served by the same process, so run a single ASGI process or plug in a shared broker (e.g. redis
+pub/sub) when scaling out.
+"""
+import asyncio
+import json
+import threading
+import time
+from collections import defaultdict
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+from . import models
+
+CREATED = 'application.created'
+UPDATED = 'application.updated'
+STATUS_CHANGED = 'application.status_changed'
+DELETED = 'application.deleted'
+# Sent instead of the events a slow subscriber missed: refetch rather than patch.
+RESYNC = 'resync'
+
+
+class Subscription:
+    """A bounded queue of events for one stream, fed from any thread."""
+
+    def __init__(self, broker, channel, max_queued):
+        self.broker = broker
+        self.channel = channel
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(max_queued)
+
+    def deliver(self, event):
+        try:
+            self.loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:
+            # The stream's event loop is gone.
+            self.close()
+
+    def _put(self, event):
+        if self.queue.full():
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            event = {'type': RESYNC}
+        self.queue.put_nowait(event)
+
+    async def get(self):
+        return await self.queue.get()
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class InProcessBroker:
+    def __init__(self, max_queued=100):
+        self.max_queued = max_queued
+        self._subscriptions = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, channel):
+        """Must be called from the event loop the stream runs on."""
+        subscription = Subscription(self, channel, self.max_queued)
+        with self._lock:
+            self._subscriptions[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.channel)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.channel]
+
+    def publish(self, channel, event):
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(channel, ()))
+        for subscription in subscriptions:
+            subscription.deliver(event)
+
+    def subscribers(self, channel):
+        with self._lock:
+            return len(self._subscriptions.get(channel, ()))
+
+
+_brokers = {}
+
+
+def get_broker():
+    path = settings.EVENTS_BROKER
+    if path not in _brokers:
+        _brokers[path] = import_string(path)()
+    return _brokers[path]
+
+
+def reset():
+    _brokers.clear()
+
+
+def channel(user_id):
+    return f'user:{user_id}'
+
+
+def application_event(event_type, application):
+    return {
+        'type': event_type,
+        'id': application.id,
+        'user': application.user_id,
+        'manager': application.manager_id,
+        'leave_type': application.leave_type.name,
+        'start_date': str(application.start_date),
+        'end_date': str(application.end_date),
+        'status': models.STATUS_LABELS[application.status],
+    }
+
+
+def publish(event, *user_ids):
+    """Send `event` to the users' streams once the current transaction commits, if it does."""
+    broker = get_broker()
+    channels = {channel(user_id) for user_id in user_ids if user_id is not None}
+
+    def send():
+        for name in channels:
+            broker.publish(name, event)
+
+    transaction.on_commit(send)
+
+
+def encode(event):
+    return f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+
+async def stream(user_id, expires):
+    """
+    The text/event-stream body for one user: events as they are published, a comment every
+    EVENTS_KEEPALIVE_SECONDS to keep proxies from closing an idle connection, and the end of the
+    stream when the access token expires at `expires` (a UNIX timestamp).
+    """
+    subscription = get_broker().subscribe(channel(user_id))
+    try:
+        yield f'retry: {settings.EVENTS_RETRY_MILLISECONDS}\n\n'
+        while (remaining := expires - time.time()) > 0:
+            try:
+                event = await asyncio.wait_for(subscription.get(), min(settings.EVENTS_KEEPALIVE_SECONDS, remaining))
+            except TimeoutError:
+                yield ': keepalive\n\n'
+                continue
+            yield encode(event)
+    finally:
+        subscription.close()
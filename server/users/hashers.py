@@ -0,0 +1,13 @@
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    """
+    PBKDF2-SHA256 at settings.PASSWORD_HASH_ITERATIONS. Hashes at any other cost report
+    must_update, so check_password rehashes them on the user's next successful sign-in.
+    """
+
+    @property
+    def iterations(self):
+        return settings.PASSWORD_HASH_ITERATIONS or super().iterations
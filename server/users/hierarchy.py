@@ -0,0 +1,47 @@
+from django.db import connection
+from django.db.models.expressions import RawSQL
+from . import models
+
+SCOPES = ['direct', 'subtree']
+
+
+def subtree(manager_id):
+    """
+    Ids of everyone reporting to manager_id directly or indirectly, as a subquery for `__in`
+    lookups, so a subtree filter is one query at any org depth. UNION rather than UNION ALL
+    stops at ids already seen, so even a cycle written around the API terminates.
+    """
+    table = models.User._meta.db_table
+    return RawSQL(f"""
+        WITH RECURSIVE subtree(id) AS (
+            SELECT id FROM {table} WHERE reports_to_id = %s
+            UNION
+            SELECT member.id FROM {table} member INNER JOIN subtree ON member.reports_to_id = subtree.id
+        )
+        SELECT id FROM subtree
+    """, [manager_id])
+
+
+def ancestor_ids(*user_ids):
+    """Everyone above the given users in their reporting lines, with one recursive query."""
+    user_ids = {user_id for user_id in user_ids if user_id is not None}
+    if not user_ids:
+        return set()
+    table = models.User._meta.db_table
+    sql = f"""
+        WITH RECURSIVE ancestors(id) AS (
+            SELECT reports_to_id FROM {table} WHERE id IN ({', '.join(['%s'] * len(user_ids))}) AND reports_to_id IS NOT NULL
+            UNION
+            SELECT boss.reports_to_id FROM {table} boss INNER JOIN ancestors ON boss.id = ancestors.id
+            WHERE boss.reports_to_id IS NOT NULL
+        )
+        SELECT id FROM ancestors
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, list(user_ids))
+        return {row[0] for row in cursor.fetchall()}
+
+
+def creates_cycle(user_id, reports_to_id):
+    """Whether making user_id report to reports_to_id would put user_id above itself."""
+    return reports_to_id is not None and (reports_to_id == user_id or user_id in ancestor_ids(reports_to_id))
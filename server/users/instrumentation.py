@@ -0,0 +1,198 @@
+import logging
+import threading
+import time
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100)
+
+# Histogram name -> bucket upper bounds.
+METRICS = {
+    'request_seconds': SECONDS_BUCKETS,
+    'db_seconds': SECONDS_BUCKETS,
+    'queries': QUERY_BUCKETS,
+    'serialize_seconds': SECONDS_BUCKETS,
+    'render_seconds': SECONDS_BUCKETS,
+}
+
+STAGES = ['serialize_seconds', 'render_seconds']
+
+
+class Histogram:
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def buckets(self):
+        """Cumulative (upper bound, count) pairs, ending with ('+Inf', count)."""
+        total = 0
+        for bound, count in zip([*self.bounds, '+Inf'], self.counts):
+            total += count
+            yield bound, total
+
+
+class RouteStats:
+    def __init__(self):
+        self.histograms = {name: Histogram(bounds) for name, bounds in METRICS.items()}
+        self.over_budget = 0
+
+
+# Per-process statistics by URL name, like users.cache.stats.
+_routes = defaultdict(RouteStats)
+_lock = threading.Lock()
+
+
+def record(route, over_budget=False, **observations):
+    with _lock:
+        stats = _routes[route]
+        for name, value in observations.items():
+            stats.histograms[name].observe(value)
+        stats.over_budget += over_budget
+
+
+def reset():
+    with _lock:
+        _routes.clear()
+
+
+def snapshot():
+    with _lock:
+        return {
+            route: {
+                'over_budget': stats.over_budget,
+                **{
+                    name: {
+                        'count': histogram.count,
+                        'sum': histogram.sum,
+                        'buckets': {str(bound): count for bound, count in histogram.buckets()},
+                    }
+                    for name, histogram in stats.histograms.items()
+                },
+            }
+            for route, stats in sorted(_routes.items())
+        }
+
+
+def prometheus(extra_counters=()):
+    """The statistics in the Prometheus text exposition format; extra_counters are (name, labels, value)."""
+    lines = []
+    with _lock:
+        routes = sorted(_routes.items())
+        for name in METRICS:
+            lines.append(f'# TYPE quickleave_{name} histogram')
+            for route, stats in routes:
+                histogram = stats.histograms[name]
+                for bound, count in histogram.buckets():
+                    lines.append(f'quickleave_{name}_bucket{{route="{route}",le="{bound}"}} {count}')
+                lines.append(f'quickleave_{name}_sum{{route="{route}"}} {histogram.sum}')
+                lines.append(f'quickleave_{name}_count{{route="{route}"}} {histogram.count}')
+        lines.append('# TYPE quickleave_over_query_budget_total counter')
+        for route, stats in routes:
+            lines.append(f'quickleave_over_query_budget_total{{route="{route}"}} {stats.over_budget}')
+    for name, labels, value in extra_counters:
+        label_text = ','.join(f'{key}="{label}"' for key, label in labels.items())
+        lines.append(f'quickleave_{name}{{{label_text}}} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+@contextmanager
+def timed(request, stage='serialize_seconds'):
+    """Add the time spent in the block to the current request's `stage` timer."""
+    request = getattr(request, '_request', request)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timers = getattr(request, '_stage_timers', None)
+        if timers is not None:
+            timers[stage] += time.perf_counter() - started
+
+
+class QueryTimer:
+    """connection.execute_wrapper that counts queries and the time spent executing them."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - started
+
+
+class RequestMetricsMiddleware:
+    """
+    Record wall time, query count, database time and serializer/render time of every request
+    per URL name, and flag requests over the REQUEST_QUERY_BUDGET. Streaming bodies are
+    produced after the response leaves the middleware, so only their setup is timed.
+    Async-capable, so it does not pin async views to a thread under ASGI.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        queries, started = self.start(request)
+        with connection.execute_wrapper(queries):
+            response = self.get_response(request)
+        return self.finish(request, response, queries, started)
+
+    async def __acall__(self, request):
+        queries, started = self.start(request)
+        with connection.execute_wrapper(queries):
+            response = await self.get_response(request)
+        return self.finish(request, response, queries, started)
+
+    def start(self, request):
+        request._stage_timers = defaultdict(float)
+        return QueryTimer(), time.perf_counter()
+
+    def finish(self, request, response, queries, started):
+        elapsed = time.perf_counter() - started
+        match = request.resolver_match
+        route = match.view_name if match else 'unmatched'
+        budget = settings.REQUEST_QUERY_BUDGET
+        over_budget = bool(budget) and queries.count > budget
+        if over_budget:
+            logger.warning('%s %s ran %d queries, over the budget of %d', request.method, route, queries.count, budget)
+            response['X-Query-Budget-Exceeded'] = f'{queries.count}/{budget}'
+
+        record(
+            route, over_budget=over_budget, request_seconds=elapsed, db_seconds=queries.seconds,
+            queries=queries.count, **{stage: request._stage_timers[stage] for stage in STAGES},
+        )
+        return response
+
+    def process_template_response(self, request, response):
+        # DRF responses render after the view returns; time it through a post-render callback.
+        started = time.perf_counter()
+
+        def rendered(response):
+            request._stage_timers['render_seconds'] += time.perf_counter() - started
+
+        response.add_post_render_callback(rendered)
+        return response
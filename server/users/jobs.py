@@ -0,0 +1,104 @@
+"""
+Background building of total leave reports, on a queue kept in the ReportJob table: no broker,
+just `manage.py run_report_jobs` workers. A worker claims the oldest queued job with a
+conditional UPDATE, so any number of them can share the queue. A finished job doubles as a
+snapshot of the report, served to the dashboard while the manager's leave_watermark is unchanged.
+"""
+import logging
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+from . import models, reports, serializers
+
+logger = logging.getLogger(__name__)
+
+JobStatus = models.JobStatus
+
+
+def enqueue(manager_id, scope, year):
+    """Queue a report unless the same one is already queued or running; returns the job."""
+    pending = models.ReportJob.objects.filter(
+        manager_id=manager_id, scope=scope, year=year, status__in=[JobStatus.QUEUED, JobStatus.RUNNING],
+    ).order_by('id').first()
+    return pending or models.ReportJob.objects.create(manager_id=manager_id, scope=scope, year=year)
+
+
+def claim():
+    """Take the oldest queued job for this worker, or None when the queue is empty."""
+    queued = models.ReportJob.objects.filter(status=JobStatus.QUEUED)
+    while (pk := queued.order_by('id').values_list('id', flat=True).first()) is not None:
+        # Another worker may take the same job between the two queries; only one UPDATE matches.
+        if queued.filter(pk=pk).update(status=JobStatus.RUNNING, started_at=timezone.now(), attempts=F('attempts') + 1):
+            return models.ReportJob.objects.get(pk=pk)
+    return None
+
+
+def requeue_stale():
+    """
+    Put jobs that have been running longer than REPORT_JOB_TIMEOUT, whose worker presumably died,
+    back in the queue; fail them once they have been tried REPORT_JOB_MAX_ATTEMPTS times.
+    """
+    stale = models.ReportJob.objects.filter(
+        status=JobStatus.RUNNING, started_at__lt=timezone.now() - timedelta(seconds=settings.REPORT_JOB_TIMEOUT),
+    )
+    stale.filter(attempts__gte=settings.REPORT_JOB_MAX_ATTEMPTS).update(
+        status=JobStatus.FAILED, finished_at=timezone.now(), error='The worker running the job stopped.',
+    )
+    return stale.update(status=JobStatus.QUEUED)
+
+
+def build(manager_id, scope, year):
+    """The total leave report payload, exactly as TotalLeaveReport renders it."""
+    result = reports.balance_report(*reports.manager_balances(manager_id, scope, year))
+    return serializers.TotalLeaveReportSerializer(result, many=True).data
+
+
+def run(job):
+    """Build a claimed job's report and store it; returns whether it succeeded."""
+    running = models.ReportJob.objects.filter(pk=job.pk, status=JobStatus.RUNNING)
+    try:
+        # Read before building, so a change made meanwhile leaves the snapshot already stale.
+        watermark = models.User.objects.values_list('leave_watermark', flat=True).get(pk=job.manager_id)
+        result = build(job.manager_id, job.scope, job.year)
+    except Exception as exc:
+        logger.exception('Report job %s failed', job.pk)
+        running.update(status=JobStatus.FAILED, finished_at=timezone.now(), error=f'{type(exc).__name__}: {exc}')
+        return False
+    running.update(status=JobStatus.DONE, finished_at=timezone.now(), watermark=watermark, result=result)
+    return True
+
+
+def _snapshots(manager_id, scope, year):
+    return models.ReportJob.objects.filter(
+        manager_id=manager_id, scope=scope, year=year, status=JobStatus.DONE,
+        watermark=F('manager__leave_watermark'),
+    ).order_by('-id').values_list('result', flat=True)
+
+
+def snapshot(manager_id, scope, year):
+    """The latest stored report that is still current, or None."""
+    return _snapshots(manager_id, scope, year).first()
+
+
+async def asnapshot(manager_id, scope, year):
+    return await _snapshots(manager_id, scope, year).afirst()
+
+
+def prune(days=None):
+    """Delete finished jobs older than `days` (REPORT_JOB_RETENTION_DAYS); returns how many."""
+    days = settings.REPORT_JOB_RETENTION_DAYS if days is None else days
+    deleted, _ = models.ReportJob.objects.filter(
+        status__in=[JobStatus.DONE, JobStatus.FAILED], finished_at__lt=timezone.now() - timedelta(days=days),
+    ).delete()
+    return deleted
+
+
+def report_owners():
+    """
+    Ids of everyone with a report to precompute, per scope: the managers named on this or
+    earlier ledger rows for the direct report, and everyone with reports for the subtree one.
+    """
+    leads = set(models.User.objects.filter(direct_reports__isnull=False).values_list('id', flat=True))
+    named = set(models.LeaveBalance.objects.values_list('manager_id', flat=True).distinct())
+    return {'direct': sorted(named | leads), 'subtree': sorted(leads)}
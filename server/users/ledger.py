@@ -0,0 +1,127 @@
+from collections import defaultdict
+from django.db import transaction, IntegrityError
+from django.db.models import F
+from django.db.models.functions import ExtractYear
+from . import models, reports, cache, conditional
+
+COUNTERS = reports.COUNTERS
+
+KEY_FIELDS = ['user_id', 'manager_id', 'year', 'leave_type_id']
+
+
+def _counter_deltas(entries, sign, deltas):
+    for key, status, days in entries:
+        deltas[key]['total_days'] += sign * days
+        deltas[key][reports.counter(status)] += sign * days
+
+
+def _apply(key, counters):
+    balances = models.LeaveBalance.objects.filter(**dict(zip(KEY_FIELDS, key)))
+    changes = {name: F(name) + delta for name, delta in counters.items()}
+    if balances.update(**changes) or not any(delta > 0 for delta in counters.values()):
+        return
+    try:
+        with transaction.atomic():
+            models.LeaveBalance.objects.create(**dict(zip(KEY_FIELDS, key)), **counters)
+    except IntegrityError:
+        balances.update(**changes)
+
+
+def record(removed=(), added=()):
+    """
+    Move ledger entries (see models.ledger_entry) out of and into the LeaveBalance counters.
+    Deltas are merged per key first, so a status change touches a single balance row, and
+    changes spanning many keys are written with one bulk UPDATE and one bulk INSERT.
+    """
+    merged = defaultdict(lambda: defaultdict(int))
+    _counter_deltas(removed, -1, merged)
+    _counter_deltas(added, 1, merged)
+    deltas = {}
+    for key, counters in merged.items():
+        counters = {name: delta for name, delta in counters.items() if delta}
+        if counters:
+            deltas[key] = counters
+
+    with transaction.atomic():
+        if len(deltas) <= 1:
+            for key, counters in deltas.items():
+                _apply(key, counters)
+            return
+
+        existing = {}
+        candidates = models.LeaveBalance.objects.filter(**{
+            f'{field}__in': {key[index] for key in deltas} for index, field in enumerate(KEY_FIELDS)
+        })
+        for pk, *key in candidates.values_list('pk', *KEY_FIELDS):
+            if tuple(key) in deltas:
+                existing[tuple(key)] = pk
+
+        changed = []
+        for key, pk in existing.items():
+            balance = models.LeaveBalance(pk=pk)
+            for name in COUNTERS:
+                setattr(balance, name, F(name) + deltas[key].get(name, 0))
+            changed.append(balance)
+        models.LeaveBalance.objects.bulk_update(changed, COUNTERS)
+
+        missing = [
+            (key, counters) for key, counters in deltas.items()
+            if key not in existing and any(delta > 0 for delta in counters.values())
+        ]
+        if not missing:
+            return
+        try:
+            with transaction.atomic():
+                models.LeaveBalance.objects.bulk_create(
+                    models.LeaveBalance(**dict(zip(KEY_FIELDS, key)), **counters) for key, counters in missing
+                )
+        except IntegrityError:
+            # Another request created some of the rows meanwhile.
+            for key, counters in missing:
+                _apply(key, counters)
+
+
+def expected_balances():
+    """Ledger rows recomputed from the raw applications, current and archived, keyed like LeaveBalance."""
+    expected = {}
+    for model in [models.Application, models.ArchivedApplication]:
+        applications = model.objects.annotate(year=ExtractYear('start_date'))
+        for row in reports.leave_totals(applications, *KEY_FIELDS):
+            counters = expected.setdefault(tuple(row[field] for field in KEY_FIELDS), dict.fromkeys(COUNTERS, 0))
+            for name in COUNTERS:
+                counters[name] += row[name]
+    return expected
+
+
+def stored_balances():
+    return {
+        tuple(row[field] for field in KEY_FIELDS): {name: row[name] for name in COUNTERS}
+        for row in models.LeaveBalance.objects.exclude(total_days=0).values(*KEY_FIELDS, *COUNTERS)
+    }
+
+
+def differences():
+    """Keys whose stored counters disagree with the raw applications, as (key, stored, expected)."""
+    expected = expected_balances()
+    stored = stored_balances()
+    return [
+        (key, stored.get(key), expected.get(key))
+        for key in sorted(expected.keys() | stored.keys(), key=str)
+        if stored.get(key) != expected.get(key)
+    ]
+
+
+def rebuild(batch_size=1000):
+    with transaction.atomic():
+        models.LeaveBalance.objects.all().delete()
+        models.LeaveBalance.objects.bulk_create(
+            (
+                models.LeaveBalance(**dict(zip(KEY_FIELDS, key)), **counters)
+                for key, counters in expected_balances().items()
+            ),
+            batch_size=batch_size,
+        )
+        # Stored report snapshots (see users.jobs) and ETags were built from the old rows.
+        models.ReportJob.objects.filter(status=models.JobStatus.DONE).update(watermark=None)
+        conditional.bump_all_watermarks()
+    cache.dashboard_cache().clear()
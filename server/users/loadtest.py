@@ -0,0 +1,167 @@
+import json
+import math
+import os
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import date, timedelta
+from django.db import connections
+from django.test.utils import setup_databases, teardown_databases
+from django.urls import reverse
+
+# Submitted leave starts here, one week per submission, clear of the seeded years.
+FIRST_SUBMISSION = date(2030, 1, 7)
+
+
+@contextmanager
+def test_database(keepdb=False):
+    """A throwaway test copy of the default database that server and client threads can share."""
+    database = connections['default'].settings_dict
+    if database['ENGINE'].endswith('sqlite3') and not database['TEST'].get('NAME'):
+        # The default in-memory test database cannot be shared between threads.
+        database['TEST']['NAME'] = os.path.join(tempfile.mkdtemp(), 'load-test.sqlite3')
+    old_config = setup_databases(verbosity=0, interactive=False, keepdb=keepdb, aliases={'default'})
+    try:
+        yield
+    finally:
+        teardown_databases(old_config, verbosity=0, keepdb=keepdb)
+
+
+class Results:
+    """Latencies and status codes per endpoint label, shared by all client threads."""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+        self._lock = threading.Lock()
+
+    def add(self, label, seconds, status):
+        with self._lock:
+            self.latencies[label].append(seconds)
+            self.statuses[label][status] += 1
+
+
+class Client:
+    """One simulated user speaking JSON to the API over HTTP."""
+
+    def __init__(self, base_url, results):
+        self.base_url = base_url
+        self.results = results
+        self.access = None
+
+    def request(self, label, method, path, data=None):
+        headers = {'Content-Type': 'application/json'}
+        if self.access:
+            headers['Authorization'] = f'Bearer {self.access}'
+        request = urllib.request.Request(
+            self.base_url + path, data=None if data is None else json.dumps(data).encode(), method=method, headers=headers,
+        )
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request, timeout=60) as response:
+                status, body = response.status, response.read()
+        except urllib.error.HTTPError as error:
+            status, body = error.code, error.read()
+        except OSError:
+            status, body = 0, b''
+        self.results.add(label, time.perf_counter() - started, status)
+        return status, json.loads(body) if 200 <= status < 300 and body else None
+
+    def sign_in(self, username, password):
+        status, data = self.request('signin', 'POST', reverse('signin'), {'username': username, 'password': password})
+        self.access = data['access'] if status == 200 else None
+        return self.access is not None
+
+
+def employee_session(client, employee, password, deadline):
+    """List own applications and submit a new one, each a week after the previous."""
+    if not client.sign_in(employee.username, password):
+        return
+    week = 0
+    while time.perf_counter() < deadline:
+        client.request('applications list', 'GET', reverse('application-list') + '?page_size=50')
+        start_date = FIRST_SUBMISSION + timedelta(weeks=week)
+        client.request('applications submit', 'POST', reverse('application-list'), {
+            'leave_type': 'Annual', 'start_date': start_date.isoformat(),
+            'end_date': (start_date + timedelta(days=1)).isoformat(),
+            'reason': 'Load test', 'status': 'Pending', 'manager': employee.reports_to_id,
+        })
+        week += 1
+
+
+def manager_session(client, manager, password, deadline):
+    """Fetch the dashboard (subordinate list and report) and approve one pending application."""
+    if not client.sign_in(manager.username, password):
+        return
+    while time.perf_counter() < deadline:
+        _, page = client.request(
+            'subordinate list', 'GET', reverse('subordinate-applications-list') + '?page_size=50',
+        )
+        client.request('leave report', 'GET', reverse('total-leaves-report'))
+        pending = [row['id'] for row in (page or {}).get('results', []) if row['status'] == 'Pending']
+        if pending:
+            client.request('approve', 'PATCH', reverse('application-detail', args=[pending[0]]), {'status': 'Approved'})
+
+
+def run(base_url, employees, managers, password, clients, duration, manager_share=0.2):
+    """
+    Drive `clients` concurrent sessions for `duration` seconds; about `manager_share` of them
+    are managers. Every employee session uses its own account so submissions never overlap.
+    Returns (Results, elapsed seconds).
+    """
+    results = Results()
+    manager_clients = min(len(managers), max(1, round(clients * manager_share)))
+    started = time.perf_counter()
+    deadline = started + duration
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        futures = [
+            pool.submit(manager_session, Client(base_url, results), managers[i], password, deadline)
+            for i in range(manager_clients)
+        ]
+        futures += [
+            pool.submit(employee_session, Client(base_url, results), employees[i], password, deadline)
+            for i in range(clients - manager_clients)
+        ]
+        for future in futures:
+            future.result()
+    return results, time.perf_counter() - started
+
+
+def percentile(ordered, p):
+    """Nearest-rank percentile of an already sorted list."""
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+def _stats(latencies, statuses, elapsed):
+    ordered = sorted(latencies)
+    return {
+        'requests': len(ordered),
+        'errors': sum(count for status, count in statuses.items() if not 200 <= status < 300),
+        'statuses': {str(status): count for status, count in sorted(statuses.items())},
+        'throughput_rps': round(len(ordered) / elapsed, 2),
+        'mean_ms': round(sum(ordered) / len(ordered) * 1000, 2),
+        **{f'p{p}_ms': round(percentile(ordered, p) * 1000, 2) for p in (50, 95, 99)},
+        'max_ms': round(ordered[-1] * 1000, 2),
+    }
+
+
+def summarize(results, elapsed):
+    """Per-endpoint and overall throughput and latency percentiles, ready for json.dump."""
+    endpoints = {
+        label: _stats(latencies, results.statuses[label], elapsed)
+        for label, latencies in sorted(results.latencies.items())
+    }
+    everything = [seconds for latencies in results.latencies.values() for seconds in latencies]
+    overall = Counter()
+    for statuses in results.statuses.values():
+        overall.update(statuses)
+    return {
+        'elapsed_seconds': round(elapsed, 2),
+        'endpoints': endpoints,
+        'total': _stats(everything, overall, elapsed) if everything else None,
+    }
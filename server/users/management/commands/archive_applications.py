@@ -0,0 +1,42 @@
+import time
+from datetime import date
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from users import archive
+
+
+class Command(BaseCommand):
+    help = (
+        'Move approved and rejected applications that ended before the hot horizon (the last '
+        'ARCHIVE_HOT_YEARS years) to the archive table, in batches that each commit on their own. '
+        'Safe to interrupt: run it again to continue where it stopped.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--before', type=date.fromisoformat, help='Archive leave ending before this date (YYYY-MM-DD) instead.')
+        parser.add_argument('--batch-size', type=int, default=settings.ARCHIVE_BATCH_SIZE)
+        parser.add_argument('--max-batches', type=int, help='Stop after this many batches.')
+        parser.add_argument('--pause', type=float, default=0, help='Seconds to sleep between batches.')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the applications that would move.')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1.')
+        before = options['before'] or archive.horizon()
+        if before > archive.horizon():
+            raise CommandError(f'--before cannot be later than the hot horizon {archive.horizon()}.')
+
+        if options['dry_run']:
+            self.stdout.write(f'{archive.candidates(before).count()} application(s) ended before {before} and would move.')
+            return
+
+        total = 0
+        for moved in archive.move(before, options['batch_size'], options['max_batches']):
+            total += moved
+            self.stdout.write(f'Moved {moved} application(s), {total} so far.')
+            if options['pause']:
+                time.sleep(options['pause'])
+        remaining = archive.candidates(before).count()
+        self.stdout.write(self.style.SUCCESS(
+            f'Archived {total} application(s) that ended before {before}; {remaining} left to move.'
+        ))
@@ -0,0 +1,119 @@
+import importlib.util
+import time
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.test import RequestFactory
+from django.test.utils import modify_settings
+from django.urls import reverse
+from users import loadtest, models
+from users.authentication import tokens_for_user
+
+
+class Command(BaseCommand):
+    help = (
+        'Serve a small authenticated request (by default GET users/<id>/, one query) through the WSGI '
+        'handler against the configured database once per connection mode: a new connection per request, '
+        'persistent connections with and without health checks, and the psycopg 3 pool on PostgreSQL. '
+        'Reports per-request latency and connections opened. Read-only.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Timed requests per mode.')
+        parser.add_argument('--warmup', type=int, default=10, help='Untimed requests per mode.')
+        parser.add_argument('--path', help='Request path; defaults to the detail of the first user.')
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1:
+            raise CommandError('--requests must be at least 1.')
+        user = models.User.objects.order_by('pk').first()
+        if user is None:
+            raise CommandError('The benchmark signs requests as the first user: create one first.')
+        path = options['path'] or reverse('user-detail', args=[user.pk])
+        authorization = f'Bearer {tokens_for_user(user).access_token}'
+
+        connection = connections['default']
+        saved = {name: connection.settings_dict[name] for name in ['CONN_MAX_AGE', 'CONN_HEALTH_CHECKS', 'OPTIONS']}
+        results = {}
+        try:
+            with modify_settings(ALLOWED_HOSTS={'append': 'testserver'}):
+                for label, mode in self.modes(connection).items():
+                    self.configure(connection, saved, mode)
+                    results[label] = self.measure(path, authorization, options['requests'], options['warmup'])
+        finally:
+            self.disconnect(connection)
+            connection.settings_dict.update(saved)
+
+        for label, stats in results.items():
+            self.stdout.write(
+                f"{label:28} {stats['connections']:>5} connections  mean {stats['mean_ms']:7.2f}  "
+                f"p50 {stats['p50_ms']:7.2f}  p95 {stats['p95_ms']:7.2f} ms"
+            )
+        per_request = results['new connection per request']['mean_ms'] - results['persistent']['mean_ms']
+        self.stdout.write(self.style.SUCCESS(
+            f'Opening a connection adds {per_request:.2f} ms to every request on {connection.vendor}.'
+        ))
+
+    def modes(self, connection):
+        modes = {
+            'new connection per request': {'CONN_MAX_AGE': 0},
+            'persistent': {'CONN_MAX_AGE': 600},
+            'persistent + health checks': {'CONN_MAX_AGE': 600, 'CONN_HEALTH_CHECKS': True},
+        }
+        if connection.vendor == 'postgresql' and importlib.util.find_spec('psycopg_pool'):
+            pool = connection.settings_dict['OPTIONS'].get('pool')
+            modes['pool'] = {'CONN_MAX_AGE': 0, 'pool': pool if isinstance(pool, dict) else True}
+        return modes
+
+    def disconnect(self, connection):
+        connection.close()
+        if hasattr(connection, 'close_pool'):
+            connection.close_pool()
+
+    def configure(self, connection, saved, mode):
+        self.disconnect(connection)
+        options = {name: value for name, value in saved['OPTIONS'].items() if name != 'pool'}
+        if 'pool' in mode:
+            options['pool'] = mode['pool']
+        connection.settings_dict.update(
+            CONN_MAX_AGE=mode.get('CONN_MAX_AGE', saved['CONN_MAX_AGE']),
+            CONN_HEALTH_CHECKS=mode.get('CONN_HEALTH_CHECKS', False),
+            OPTIONS=options,
+        )
+
+    def measure(self, path, authorization, requests, warmup):
+        handler = WSGIHandler()
+        factory = RequestFactory()
+        opened = []
+
+        def created(sender, connection, **kwargs):
+            opened.append(connection.alias)
+
+        def start_response(status, headers):
+            if not status.startswith('200'):
+                raise CommandError(f'GET {path} answered {status}.')
+
+        latencies = []
+        connection_created.connect(created)
+        try:
+            for i in range(warmup + requests):
+                environ = factory.get(path, HTTP_AUTHORIZATION=authorization).environ
+                started = time.perf_counter()
+                response = handler(environ, start_response)
+                b''.join(response)
+                # Sends request_finished, which closes or keeps the connection like a real server.
+                response.close()
+                if i >= warmup:
+                    latencies.append(time.perf_counter() - started)
+                if i == warmup - 1:
+                    opened.clear()
+        finally:
+            connection_created.disconnect(created)
+
+        ordered = sorted(latencies)
+        return {
+            'connections': len(opened),
+            'mean_ms': sum(ordered) / len(ordered) * 1000,
+            **{f'p{p}_ms': loadtest.percentile(ordered, p) * 1000 for p in (50, 95)},
+        }
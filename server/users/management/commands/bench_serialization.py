@@ -0,0 +1,58 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from users import models, seed, serializers
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare per-row cost of rendering the application list with ApplicationSerializer '
+        'and with values() rows. Seeds data inside a transaction that is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000)
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        rows, repeat = options['rows'], options['repeat']
+        try:
+            with transaction.atomic():
+                managers, _ = seed.seed(employees=200, managers=1, applications=rows, prefix='bench')
+                applications = models.Application.objects.filter(manager=managers[0])
+                # (label, render, most queries allowed); the last two must not query per row.
+                strategies = [
+                    ('ApplicationSerializer (before)', lambda: serializers.ApplicationSerializer(
+                        applications.all(), many=True).data, None),
+                    ('ApplicationSerializer + select_related', lambda: serializers.ApplicationSerializer(
+                        applications.select_related('user', 'leave_type'), many=True).data, 1),
+                    ('values() rows (after)', lambda: [
+                        serializers.application_row(row)
+                        for row in applications.values(*serializers.APPLICATION_LIST_FIELDS)
+                    ], 1),
+                ]
+                for label, render, max_queries in strategies:
+                    self.report(label, render, rows, repeat, max_queries)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def report(self, label, render, rows, repeat, max_queries=None):
+        best = None
+        for _ in range(repeat):
+            queries = []
+            with connection.execute_wrapper(lambda execute, *args: queries.append(1) or execute(*args)):
+                started = time.perf_counter()
+                data = render()
+                elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        self.stdout.write(
+            f'{label:40} {len(data):>7} rows  {best * 1000:9.1f} ms  '
+            f'{best / max(len(data), 1) * 1e6:7.1f} us/row  {len(queries)} queries'
+        )
+        if max_queries is not None and len(queries) > max_queries:
+            raise CommandError(f'{label} made {len(queries)} queries, expected at most {max_queries}.')
@@ -0,0 +1,87 @@
+import json
+import os
+import threading
+import time
+from django.conf import settings
+from django.contrib.auth.hashers import get_hasher, make_password
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import RequestFactory
+from django.test.utils import modify_settings, override_settings
+from django.urls import reverse
+from users import loadtest, models, throttling
+
+
+class Command(BaseCommand):
+    help = (
+        'Sign in from concurrent threads through the WSGI handler on a throwaway test database, once per '
+        'PBKDF2 iteration count, and report logins per second in total and per hashing core '
+        '(min(SIGNIN_HASH_WORKERS, CPUs)) with p50/p95 latency.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, nargs='+', help='Iteration counts to compare; defaults to the configured one.')
+        parser.add_argument('--clients', type=int, default=2 * settings.SIGNIN_HASH_WORKERS, help='Concurrent signing-in threads.')
+        parser.add_argument('--duration', type=float, default=10, help='Seconds per iteration count.')
+        parser.add_argument('--users', type=int, default=50)
+
+    def handle(self, *args, **options):
+        if options['clients'] < 1 or options['users'] < 1:
+            raise CommandError('--clients and --users must be at least 1.')
+        iterations = options['iterations'] or [get_hasher().iterations]
+        cores = min(settings.SIGNIN_HASH_WORKERS, os.cpu_count() or 1)
+        password = 'signin-bench'
+
+        with loadtest.test_database(), modify_settings(ALLOWED_HOSTS={'append': 'testserver'}):
+            usernames = [f'signin{i}' for i in range(options['users'])]
+            models.User.objects.bulk_create(
+                models.User(username=username, email=f'{username}@example.com', name=username) for username in usernames
+            )
+            for count in iterations:
+                with override_settings(PASSWORD_HASH_ITERATIONS=count):
+                    models.User.objects.filter(username__in=usernames).update(password=make_password(password))
+                    throttling.reset()
+                    results, elapsed = self.replay(usernames, password, options['clients'], options['duration'])
+                stats = loadtest.summarize(results, elapsed)['endpoints'].get('signin')
+                if stats is None:
+                    raise CommandError('No sign-in completed.')
+                self.stdout.write(
+                    f"{count:>9} iterations  {stats['throughput_rps']:8.1f} logins/s  "
+                    f"{stats['throughput_rps'] / cores:8.1f} per core  p50 {stats['p50_ms']:7.1f}  "
+                    f"p95 {stats['p95_ms']:7.1f} ms  {stats['errors']} errors"
+                )
+        self.stdout.write(self.style.SUCCESS(f'{cores} hashing core(s), {options["clients"]} clients.'))
+
+    def replay(self, usernames, password, clients, duration):
+        handler = WSGIHandler()
+        factory = RequestFactory()
+        results = loadtest.Results()
+        path = reverse('signin')
+        deadline = time.perf_counter() + duration
+
+        def client(index):
+            try:
+                sent = 0
+                while time.perf_counter() < deadline:
+                    username = usernames[(index + sent * clients) % len(usernames)]
+                    environ = factory.post(
+                        path, json.dumps({'username': username, 'password': password}), content_type='application/json',
+                    ).environ
+                    statuses = []
+                    started = time.perf_counter()
+                    response = handler(environ, lambda status, headers: statuses.append(int(status.split()[0])))
+                    b''.join(response)
+                    response.close()
+                    results.add('signin', time.perf_counter() - started, statuses[0])
+                    sent += 1
+            finally:
+                connections.close_all()
+
+        started = time.perf_counter()
+        threads = [threading.Thread(target=client, args=[index]) for index in range(clients)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results, time.perf_counter() - started
@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from users import calendar, ledger
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuild the CalendarDay rows for LEAVE_CALENDAR_FIRST_YEAR to LEAVE_CALENDAR_LAST_YEAR from '
+        'LEAVE_WEEKEND_DAYS and the holidays of LEAVE_CALENDAR_REGION, then recount the leave ledger in '
+        'working days. Run after editing holidays or those settings.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--skip-ledger', action='store_true', help='Leave LeaveBalance rows as they are.')
+
+    def handle(self, *args, **options):
+        calendar.build()
+        if not options['skip_ledger']:
+            ledger.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'Calendar covers {settings.LEAVE_CALENDAR_FIRST_YEAR}-{settings.LEAVE_CALENDAR_LAST_YEAR}.'
+        ))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from users import hierarchy, jobs
+
+
+class Command(BaseCommand):
+    help = (
+        "Queue this year's total leave report of every manager for the background workers, so "
+        'dashboards open on a stored snapshot. Schedule nightly, e.g. from cron, and prune old jobs.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scope', choices=hierarchy.SCOPES, nargs='+', default=hierarchy.SCOPES)
+        parser.add_argument('--year', type=int, default=timezone.now().year)
+        parser.add_argument('--keep-days', type=int, help='Delete finished jobs older than this (default REPORT_JOB_RETENTION_DAYS).')
+
+    def handle(self, *args, **options):
+        pruned = jobs.prune(options['keep_days'])
+        owners = jobs.report_owners()
+        for scope in options['scope']:
+            for manager_id in owners[scope]:
+                jobs.enqueue(manager_id, scope, options['year'])
+            self.stdout.write(f'Queued {len(owners[scope])} {scope} report(s) for {options["year"]}.')
+        self.stdout.write(self.style.SUCCESS(f'Pruned {pruned} finished job(s).'))
@@ -0,0 +1,88 @@
+import json
+import platform
+from datetime import datetime, timezone
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test.testcases import LiveServerThread, _StaticFilesHandler
+from django.test.utils import modify_settings, override_settings
+from users import cache, instrumentation, loadtest, seed, throttling
+
+
+class Command(BaseCommand):
+    help = (
+        'Replay sign-in, listing, submission, dashboard and approval traffic from concurrent HTTP clients '
+        'against a live server on a freshly seeded test database, and write throughput and p50/p95/p99 '
+        'latency per endpoint as JSON. Works with SQLite and PostgreSQL; the test database is dropped afterwards.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=10, help='Concurrent simulated users.')
+        parser.add_argument('--duration', type=float, default=30, help='Seconds of traffic.')
+        parser.add_argument('--manager-share', type=float, default=0.2, help='Fraction of clients acting as managers.')
+        parser.add_argument('--employees', type=int, default=500)
+        parser.add_argument('--managers', type=int, default=25)
+        parser.add_argument('--applications', type=int, default=50000)
+        parser.add_argument('--output', default='load-test.json', help='Where to write the JSON results.')
+        parser.add_argument('--keepdb', action='store_true', help='Reuse and keep the test database.')
+        parser.add_argument(
+            '--throttle', action='store_true',
+            help='Keep the API rate limits; by default they are lifted to measure what the server can serve.',
+        )
+
+    def handle(self, *args, **options):
+        if options['clients'] < 1:
+            raise CommandError('--clients must be at least 1.')
+        if options['clients'] > options['employees']:
+            raise CommandError('Every employee client needs its own account: use --employees >= --clients.')
+
+        with loadtest.test_database(keepdb=options['keepdb']):
+            password = 'loadtest123'
+            managers, employees = seed.seed(
+                employees=options['employees'], managers=options['managers'],
+                applications=options['applications'], password=password, prefix='load',
+            )
+            cache.dashboard_cache().clear()
+            instrumentation.reset()
+            throttling.reset()
+            rates = settings.REST_FRAMEWORK.get('DEFAULT_THROTTLE_RATES', {}) if options['throttle'] else {}
+            with override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': rates}):
+                summary = self.replay(employees, managers, password, options)
+
+        with open(options['output'], 'w') as output:
+            json.dump(summary, output, indent=2)
+        for label, stats in summary['endpoints'].items():
+            self.stdout.write(
+                f"{label:22} {stats['requests']:>7} req  {stats['throughput_rps']:8.1f} req/s  "
+                f"p50 {stats['p50_ms']:8.1f}  p95 {stats['p95_ms']:8.1f}  p99 {stats['p99_ms']:8.1f} ms  "
+                f"{stats['errors']} errors"
+            )
+        self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}."))
+
+    def replay(self, employees, managers, password, options):
+        server = LiveServerThread('localhost', _StaticFilesHandler)
+        server.daemon = True
+        with modify_settings(ALLOWED_HOSTS={'append': 'localhost'}):
+            server.start()
+            server.is_ready.wait()
+            if server.error:
+                raise server.error
+            try:
+                results, elapsed = loadtest.run(
+                    f'http://localhost:{server.port}', employees, managers, password,
+                    clients=options['clients'], duration=options['duration'], manager_share=options['manager_share'],
+                )
+            finally:
+                server.terminate()
+
+        return {
+            'started_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'database': connections['default'].vendor,
+            'python': platform.python_version(),
+            'settings': {
+                name: options[name] for name in ['clients', 'duration', 'manager_share', 'employees', 'managers', 'applications']
+            },
+            **loadtest.summarize(results, elapsed),
+            # Server-side view of the same traffic from users.instrumentation, keyed by URL name.
+            'server': instrumentation.snapshot(),
+        }
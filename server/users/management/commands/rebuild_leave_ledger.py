@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+from users import ledger, models
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the LeaveBalance ledger from the raw applications and verify it.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Only compare the ledger with the raw applications; do not rebuild.',
+        )
+
+    def handle(self, *args, **options):
+        if not options['check']:
+            ledger.rebuild()
+            self.stdout.write('Ledger rebuilt.')
+
+        differences = ledger.differences()
+        leave_types = dict(models.LeaveType.objects.values_list('id', 'name'))
+        for key, stored, expected in differences:
+            user_id, manager_id, year, leave_type_id = key
+            self.stderr.write(
+                f'user={user_id} manager={manager_id} year={year} leave_type={leave_types.get(leave_type_id)}: '
+                f'ledger={stored} applications={expected}'
+            )
+        if differences:
+            raise CommandError(f'{len(differences)} ledger row(s) out of sync.')
+        self.stdout.write(self.style.SUCCESS('Ledger matches applications.'))
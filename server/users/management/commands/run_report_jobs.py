@@ -0,0 +1,44 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from users import jobs
+
+
+class Command(BaseCommand):
+    help = (
+        'Work through the queue of background total leave reports. Runs until interrupted, polling '
+        'every REPORT_JOB_POLL_SECONDS while the queue is empty; start as many workers as needed.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Exit when the queue is empty.')
+        parser.add_argument('--max-jobs', type=int, help='Exit after this many jobs.')
+        parser.add_argument('--poll', type=float, default=settings.REPORT_JOB_POLL_SECONDS)
+
+    def handle(self, *args, **options):
+        done = failed = 0
+        try:
+            while options['max_jobs'] is None or done + failed < options['max_jobs']:
+                close_old_connections()
+                jobs.requeue_stale()
+                job = jobs.claim()
+                if job is None:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll'])
+                    continue
+                started = time.perf_counter()
+                if jobs.run(job):
+                    done += 1
+                    outcome = 'done'
+                else:
+                    failed += 1
+                    outcome = self.style.ERROR('failed')
+                self.stdout.write(
+                    f'Job {job.pk} ({job.scope} report of manager {job.manager_id}, {job.year}) '
+                    f'{outcome} in {time.perf_counter() - started:.2f}s.'
+                )
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS(f'{done} report(s) built, {failed} failed.'))
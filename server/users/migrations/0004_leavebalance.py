@@ -0,0 +1,33 @@
+# Generated by Django 5.1.1 on 2026-10-18 09:16
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_alter_application_options_remove_user_manager'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaveBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveSmallIntegerField()),
+                ('leave_type', models.CharField(max_length=255)),
+                ('total_days', models.IntegerField(default=0)),
+                ('pending_days', models.IntegerField(default=0)),
+                ('approved_days', models.IntegerField(default=0)),
+                ('rejected_days', models.IntegerField(default=0)),
+                ('manager', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='subordinate_leave_balances', to=settings.AUTH_USER_MODEL)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='leave_balances', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['user_id', 'leave_type'],
+                'constraints': [models.UniqueConstraint(fields=('manager', 'year', 'user', 'leave_type'), name='unique_leave_balance')],
+            },
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.1.1 on 2026-10-18 09:19
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_leavebalance'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='application',
+            index=models.Index(fields=['user', '-id'], name='application_user_id'),
+        ),
+        migrations.AddIndex(
+            model_name='application',
+            index=models.Index(fields=['manager', '-id'], name='application_manager_id'),
+        ),
+        migrations.AddIndex(
+            model_name='application',
+            index=models.Index(fields=['manager', 'start_date'], name='application_manager_start'),
+        ),
+        migrations.AddIndex(
+            model_name='application',
+            index=models.Index(fields=['manager', 'status'], name='application_manager_status'),
+        ),
+        migrations.AlterField(
+            model_name='application',
+            name='manager',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='subordinate_applications', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='application',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.1 on 2026-10-18 09:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0005_application_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='leave_watermark',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.1 on 2026-10-18 09:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0006_user_leave_watermark'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='application',
+            index=models.Index(fields=['user', 'start_date'], name='application_user_start'),
+        ),
+    ]
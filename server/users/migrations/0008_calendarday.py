@@ -0,0 +1,22 @@
+# Generated by Django 5.1.1 on 2026-10-18 09:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0007_application_user_start'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CalendarDay',
+            fields=[
+                ('date', models.DateField(primary_key=True, serialize=False)),
+                ('year', models.PositiveSmallIntegerField()),
+                ('month', models.PositiveSmallIntegerField()),
+                ('is_working_day', models.BooleanField()),
+            ],
+        ),
+    ]
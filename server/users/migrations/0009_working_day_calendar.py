@@ -0,0 +1,60 @@
+# Generated by Django 5.1.1 on 2026-10-18 09:44
+
+from datetime import date, timedelta
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fill_running_counts(apps, schema_editor):
+    """
+    Rows built under 0008 have no running counts yet, and reports would count 0 working days.
+    Rebuild the configured range with them; there are no holidays before this migration.
+    """
+    CalendarDay = apps.get_model('users', 'CalendarDay')
+    db = schema_editor.connection.alias
+    day, last = date(settings.LEAVE_CALENDAR_FIRST_YEAR, 1, 1), date(settings.LEAVE_CALENDAR_LAST_YEAR, 12, 31)
+    rows, before = [], 0
+    while day <= last:
+        working = day.weekday() not in settings.LEAVE_WEEKEND_DAYS
+        rows.append(CalendarDay(
+            date=day, year=day.year, month=day.month, is_working_day=working,
+            working_days_before=before, working_days_through=before + working,
+        ))
+        before += working
+        day += timedelta(days=1)
+    CalendarDay.objects.using(db).all().delete()
+    CalendarDay.objects.using(db).bulk_create(rows, batch_size=5000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0008_calendarday'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='calendarday',
+            name='working_days_before',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='calendarday',
+            name='working_days_through',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='Holiday',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('region', models.CharField(blank=True, default='', max_length=32)),
+                ('date', models.DateField()),
+                ('name', models.CharField(max_length=100)),
+            ],
+            options={
+                'ordering': ['region', 'date'],
+                'constraints': [models.UniqueConstraint(fields=('region', 'date'), name='unique_holiday')],
+            },
+        ),
+        migrations.RunPython(fill_running_counts, migrations.RunPython.noop),
+    ]
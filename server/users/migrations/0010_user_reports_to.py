@@ -0,0 +1,25 @@
+# Generated by Django 5.1.1 on 2026-10-18 09:53
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('users', '0009_working_day_calendar'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='reports_to',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='direct_reports', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddConstraint(
+            model_name='user',
+            constraint=models.CheckConstraint(condition=models.Q(('reports_to', models.F('id')), _negated=True), name='user_not_own_manager'),
+        ),
+    ]
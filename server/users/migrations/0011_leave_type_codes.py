@@ -0,0 +1,66 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """
+    Leave types and statuses as codes, step 1 of 3: add the code columns next to the free-text ones.
+    The data moves in 0012 and the old columns go in 0013, each in its own transaction: PostgreSQL
+    cannot alter a table in the transaction that updated its rows.
+    """
+
+    dependencies = [
+        ('users', '0010_user_reports_to'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaveType',
+            fields=[
+                ('id', models.SmallAutoField(primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=255, unique=True)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.RemoveIndex(
+            model_name='application',
+            name='application_manager_status',
+        ),
+        migrations.RemoveConstraint(
+            model_name='leavebalance',
+            name='unique_leave_balance',
+        ),
+        migrations.AddField(
+            model_name='application',
+            name='leave_type_code',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='users.leavetype'),
+        ),
+        migrations.AddField(
+            model_name='application',
+            name='status_code',
+            field=models.PositiveSmallIntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='leavebalance',
+            name='leave_type_code',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='users.leavetype'),
+        ),
+        # Nullable on the way out, so reversing can re-add them before to_names fills them in.
+        migrations.AlterField(
+            model_name='application',
+            name='leave_type',
+            field=models.CharField(max_length=255, null=True),
+        ),
+        migrations.AlterField(
+            model_name='application',
+            name='status',
+            field=models.CharField(max_length=255, null=True),
+        ),
+        migrations.AlterField(
+            model_name='leavebalance',
+            name='leave_type',
+            field=models.CharField(max_length=255, null=True),
+        ),
+    ]
@@ -0,0 +1,46 @@
+from django.db import migrations
+
+STATUSES = [(1, 'Pending'), (2, 'Approved'), (3, 'Rejected')]
+
+
+def to_codes(apps, schema_editor):
+    Application = apps.get_model('users', 'Application')
+    LeaveBalance = apps.get_model('users', 'LeaveBalance')
+    LeaveType = apps.get_model('users', 'LeaveType')
+
+    names = set(Application.objects.values_list('leave_type', flat=True).distinct())
+    names |= set(LeaveBalance.objects.values_list('leave_type', flat=True).distinct())
+    LeaveType.objects.bulk_create([LeaveType(name=name) for name in sorted(names)])
+    for leave_type in LeaveType.objects.all():
+        Application.objects.filter(leave_type=leave_type.name).update(leave_type_code=leave_type)
+        LeaveBalance.objects.filter(leave_type=leave_type.name).update(leave_type_code=leave_type)
+
+    for value, label in STATUSES:
+        Application.objects.filter(status__iexact=label).update(status_code=value)
+    # Any other free-text status was awaiting a decision in all but name; fill_ledger in 0013
+    # counts those rows as pending.
+    Application.objects.filter(status_code__isnull=True).update(status_code=1)
+
+
+def to_names(apps, schema_editor):
+    Application = apps.get_model('users', 'Application')
+    LeaveBalance = apps.get_model('users', 'LeaveBalance')
+    LeaveType = apps.get_model('users', 'LeaveType')
+
+    for leave_type in LeaveType.objects.all():
+        Application.objects.filter(leave_type_code=leave_type).update(leave_type=leave_type.name)
+        LeaveBalance.objects.filter(leave_type_code=leave_type).update(leave_type=leave_type.name)
+    for value, label in STATUSES:
+        Application.objects.filter(status_code=value).update(status=label)
+
+
+class Migration(migrations.Migration):
+    """Leave types and statuses as codes, step 2 of 3: fill the code columns from the free text."""
+
+    dependencies = [
+        ('users', '0011_leave_type_codes'),
+    ]
+
+    operations = [
+        migrations.RunPython(to_codes, to_names),
+    ]
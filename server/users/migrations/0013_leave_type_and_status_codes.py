@@ -0,0 +1,117 @@
+from collections import defaultdict
+from datetime import timedelta
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+STATUSES = [(1, 'Pending'), (2, 'Approved'), (3, 'Rejected')]
+
+
+def fill_ledger(apps, schema_editor):
+    """
+    Rebuild LeaveBalance from the applications, like ledger.rebuild: 0004 added the ledger
+    empty and only counted leave saved after it. Days come from the CalendarDay running counts
+    filled by 0009, falling back to weekdays outside the calendar.
+    """
+    Application = apps.get_model('users', 'Application')
+    CalendarDay = apps.get_model('users', 'CalendarDay')
+    LeaveBalance = apps.get_model('users', 'LeaveBalance')
+    db = schema_editor.connection.alias
+
+    counts = {
+        day: (before, through)
+        for day, before, through in CalendarDay.objects.using(db).values_list('date', 'working_days_before', 'working_days_through')
+    }
+
+    def working_days(start_date, end_date):
+        if start_date in counts and end_date in counts:
+            return max(counts[end_date][1] - counts[start_date][0], 0)
+        return sum(
+            (start_date + timedelta(days=i)).weekday() not in settings.LEAVE_WEEKEND_DAYS
+            for i in range((end_date - start_date).days + 1)
+        )
+
+    balances = defaultdict(lambda: defaultdict(int))
+    applications = Application.objects.using(db).values_list(
+        'user_id', 'manager_id', 'leave_type_id', 'status', 'start_date', 'end_date',
+    )
+    for user_id, manager_id, leave_type_id, status, start_date, end_date in applications.iterator():
+        counters = balances[user_id, manager_id, start_date.year, leave_type_id]
+        days = working_days(start_date, end_date)
+        counters['total_days'] += days
+        counters[f'{dict(STATUSES)[status].lower()}_days'] += days
+
+    LeaveBalance.objects.using(db).all().delete()
+    LeaveBalance.objects.using(db).bulk_create(
+        (
+            LeaveBalance(user_id=user_id, manager_id=manager_id, year=year, leave_type_id=leave_type_id, **counters)
+            for (user_id, manager_id, year, leave_type_id), counters in balances.items()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+    """Leave types and statuses as codes, step 3 of 3: drop the free-text columns and recount the ledger."""
+
+    dependencies = [
+        ('users', '0012_fill_leave_type_codes'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='application',
+            name='leave_type',
+        ),
+        migrations.RemoveField(
+            model_name='application',
+            name='status',
+        ),
+        migrations.RemoveField(
+            model_name='leavebalance',
+            name='leave_type',
+        ),
+        migrations.RenameField(
+            model_name='application',
+            old_name='leave_type_code',
+            new_name='leave_type',
+        ),
+        migrations.RenameField(
+            model_name='application',
+            old_name='status_code',
+            new_name='status',
+        ),
+        migrations.RenameField(
+            model_name='leavebalance',
+            old_name='leave_type_code',
+            new_name='leave_type',
+        ),
+        migrations.AlterField(
+            model_name='application',
+            name='leave_type',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='users.leavetype'),
+        ),
+        migrations.AlterField(
+            model_name='application',
+            name='status',
+            field=models.PositiveSmallIntegerField(choices=[(1, 'Pending'), (2, 'Approved'), (3, 'Rejected')]),
+        ),
+        migrations.AlterField(
+            model_name='leavebalance',
+            name='leave_type',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='users.leavetype'),
+        ),
+        migrations.AlterModelOptions(
+            name='leavebalance',
+            options={'ordering': ['user_id', 'leave_type_id']},
+        ),
+        migrations.AddIndex(
+            model_name='application',
+            index=models.Index(fields=['manager', 'status'], name='application_manager_status'),
+        ),
+        migrations.AddConstraint(
+            model_name='leavebalance',
+            constraint=models.UniqueConstraint(fields=('manager', 'year', 'user', 'leave_type'), name='unique_leave_balance'),
+        ),
+        migrations.RunPython(fill_ledger, migrations.RunPython.noop),
+    ]
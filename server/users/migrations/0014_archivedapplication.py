@@ -0,0 +1,33 @@
+# Generated by Django 5.1.1 on 2026-10-18 10:43
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0013_leave_type_and_status_codes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedApplication',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('start_date', models.DateField()),
+                ('end_date', models.DateField()),
+                ('reason', models.TextField()),
+                ('status', models.PositiveSmallIntegerField(choices=[(1, 'Pending'), (2, 'Approved'), (3, 'Rejected')])),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('leave_type', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='users.leavetype')),
+                ('manager', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('user', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-id'],
+                'indexes': [models.Index(fields=['user', '-id'], name='archived_user_id'), models.Index(fields=['manager', '-id'], name='archived_manager_id'), models.Index(fields=['manager', 'start_date'], name='archived_manager_start')],
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.1.1 on 2026-10-18 10:49
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0014_archivedapplication'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(max_length=16)),
+                ('year', models.PositiveSmallIntegerField()),
+                ('status', models.PositiveSmallIntegerField(choices=[(1, 'Queued'), (2, 'Running'), (3, 'Done'), (4, 'Failed')], default=1)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('watermark', models.PositiveBigIntegerField(blank=True, null=True)),
+                ('result', models.JSONField(blank=True, null=True)),
+                ('error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('manager', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='report_jobs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-id'],
+                'indexes': [models.Index(fields=['status', 'id'], name='report_job_status_id'), models.Index(fields=['manager', 'scope', 'year', '-id'], name='report_job_manager')],
+            },
+        ),
+    ]
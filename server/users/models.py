@@ -1,18 +1,184 @@
+from types import SimpleNamespace
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 
 class User(AbstractUser):
     name = models.CharField(max_length=255)
     email = models.EmailField(unique=True)
+    # Bumped whenever an application this user submitted or manages changes; feeds list/report ETags.
+    leave_watermark = models.PositiveBigIntegerField(default=0)
+    # Reporting line; subtree lookups walk it with the recursive queries in users.hierarchy.
+    reports_to = models.ForeignKey('self', on_delete=models.SET_NULL, null=True, blank=True, related_name='direct_reports')
+
+    class Meta(AbstractUser.Meta):
+        constraints = [
+            models.CheckConstraint(condition=~models.Q(reports_to=models.F('id')), name='user_not_own_manager'),
+        ]
+
+class LeaveType(models.Model):
+    """Reference table of leave type names; applications and ledger rows store its two-byte id."""
+    id = models.SmallAutoField(primary_key=True)
+    name = models.CharField(max_length=255, unique=True)
+
+    class Meta:
+        ordering = ['name']
+
+    def __str__(self):
+        return self.name
+
+def leave_types_named(names, add_missing=True):
+    """LeaveType rows by name for `names`, adding the missing ones unless told not to; one query when all exist."""
+    found = {leave_type.name: leave_type for leave_type in LeaveType.objects.filter(name__in=names)}
+    missing = set(names) - found.keys()
+    if missing and add_missing:
+        LeaveType.objects.bulk_create([LeaveType(name=name) for name in missing], ignore_conflicts=True)
+        found.update((leave_type.name, leave_type) for leave_type in LeaveType.objects.filter(name__in=missing))
+    return found
+
+class Status(models.IntegerChoices):
+    """Application status, stored as a small integer. The API speaks the labels."""
+    PENDING = 1, 'Pending'
+    APPROVED = 2, 'Approved'
+    REJECTED = 3, 'Rejected'
+
+STATUS_LABELS = dict(Status.choices)
 
 class Application(models.Model):
-    user = models.ForeignKey(User, on_delete=models.CASCADE)
-    leave_type = models.CharField(max_length=255)
+    # Both foreign keys are covered by the composite indexes below, so they skip their own.
+    user = models.ForeignKey(User, on_delete=models.CASCADE, db_index=False)
+    # Reports group by it next to the user or manager indexes; no index of its own.
+    leave_type = models.ForeignKey(LeaveType, on_delete=models.PROTECT, related_name='+', db_index=False)
     start_date = models.DateField()
     end_date = models.DateField()
     reason = models.TextField()
-    status = models.CharField(max_length=255)
-    manager = models.ForeignKey(User, on_delete=models.CASCADE, related_name='subordinate_applications')
+    status = models.PositiveSmallIntegerField(choices=Status.choices)
+    manager = models.ForeignKey(User, on_delete=models.CASCADE, related_name='subordinate_applications', db_index=False)
+
+    class Meta:
+        ordering = ['-id']
+        indexes = [
+            models.Index(fields=['user', '-id'], name='application_user_id'),
+            models.Index(fields=['user', 'start_date'], name='application_user_start'),
+            models.Index(fields=['manager', '-id'], name='application_manager_id'),
+            models.Index(fields=['manager', 'start_date'], name='application_manager_start'),
+            models.Index(fields=['manager', 'status'], name='application_manager_status'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the values the ledger counted for this row so an update can move its days between
+        # buckets. Only the raw fields: the entry is worked out if the row is saved or deleted.
+        if LEDGER_FIELDS.issubset(field_names):
+            instance._ledger_fields = {name: value for name, value in zip(field_names, values) if name in LEDGER_FIELDS}
+        return instance
+
+class ArchivedApplication(models.Model):
+    """
+    Closed applications older than the hot horizon, moved here by users.archive with their ids.
+    They keep counting in the LeaveBalance ledger; list endpoints read them with ?archived=true.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+', db_index=False)
+    leave_type = models.ForeignKey(LeaveType, on_delete=models.PROTECT, related_name='+', db_index=False)
+    start_date = models.DateField()
+    end_date = models.DateField()
+    reason = models.TextField()
+    status = models.PositiveSmallIntegerField(choices=Status.choices)
+    manager = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+', db_index=False)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-id']
+        indexes = [
+            models.Index(fields=['user', '-id'], name='archived_user_id'),
+            models.Index(fields=['manager', '-id'], name='archived_manager_id'),
+            models.Index(fields=['manager', 'start_date'], name='archived_manager_start'),
+        ]
+
+class LeaveBalance(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='leave_balances')
+    manager = models.ForeignKey(User, on_delete=models.CASCADE, related_name='subordinate_leave_balances')
+    year = models.PositiveSmallIntegerField()
+    leave_type = models.ForeignKey(LeaveType, on_delete=models.PROTECT, related_name='+', db_index=False)
+    total_days = models.IntegerField(default=0)
+    pending_days = models.IntegerField(default=0)
+    approved_days = models.IntegerField(default=0)
+    rejected_days = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['manager', 'year', 'user', 'leave_type'], name='unique_leave_balance'),
+        ]
+        ordering = ['user_id', 'leave_type_id']
+
+LEDGER_FIELDS = {'user_id', 'manager_id', 'leave_type_id', 'start_date', 'end_date', 'status'}
+
+def ledger_entry(application):
+    """The (key, status, working days) triple an application contributes to the LeaveBalance ledger."""
+    from .calendar import working_days
+    start_date = models.DateField().to_python(application.start_date)
+    end_date = models.DateField().to_python(application.end_date)
+    key = (application.user_id, application.manager_id, start_date.year, application.leave_type_id)
+    return key, application.status, working_days(start_date, end_date)
+
+def loaded_ledger_entry(application):
+    """The ledger entry of `application` as last loaded or saved, or None without the fields (see Application.from_db)."""
+    fields = getattr(application, '_ledger_fields', None)
+    return ledger_entry(SimpleNamespace(**fields)) if fields else None
+
+
+class JobStatus(models.IntegerChoices):
+    QUEUED = 1, 'Queued'
+    RUNNING = 2, 'Running'
+    DONE = 3, 'Done'
+    FAILED = 4, 'Failed'
+
+class ReportJob(models.Model):
+    """
+    A total leave report built in the background by `manage.py run_report_jobs` (see users.jobs).
+    Once done it is a snapshot of the report, current while the manager's leave_watermark matches.
+    """
+    manager = models.ForeignKey(User, on_delete=models.CASCADE, related_name='report_jobs', db_index=False)
+    scope = models.CharField(max_length=16)
+    year = models.PositiveSmallIntegerField()
+    status = models.PositiveSmallIntegerField(choices=JobStatus.choices, default=JobStatus.QUEUED)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    watermark = models.PositiveBigIntegerField(null=True, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-id']
+        indexes = [
+            # Workers claim the oldest queued job; snapshot lookups want a manager's latest one.
+            models.Index(fields=['status', 'id'], name='report_job_status_id'),
+            models.Index(fields=['manager', 'scope', 'year', '-id'], name='report_job_manager'),
+        ]
+
+
+class CalendarDay(models.Model):
+    """One row per date, precomputed by users.calendar so reports can count days with a join."""
+    date = models.DateField(primary_key=True)
+    year = models.PositiveSmallIntegerField()
+    month = models.PositiveSmallIntegerField()
+    is_working_day = models.BooleanField()
+    # Running working-day counts from the first calendar day, before and including this date.
+    working_days_before = models.PositiveIntegerField(default=0)
+    working_days_through = models.PositiveIntegerField(default=0)
+
+
+class Holiday(models.Model):
+    """A non-working day of a region, see settings.LEAVE_CALENDAR_REGION."""
+    region = models.CharField(max_length=32, blank=True, default='')
+    date = models.DateField()
+    name = models.CharField(max_length=100)
 
     class Meta:
-        ordering = ['-id']
\ No newline at end of file
+        ordering = ['region', 'date']
+        constraints = [
+            models.UniqueConstraint(fields=['region', 'date'], name='unique_holiday'),
+        ]
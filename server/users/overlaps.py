@@ -0,0 +1,96 @@
+from bisect import bisect_left, bisect_right, insort
+from datetime import timedelta
+from operator import itemgetter
+from django.conf import settings
+from .models import Application, Status, User
+
+# Rejected applications are not absences and never conflict.
+ACTIVE_STATUSES = [Status.PENDING, Status.APPROVED]
+
+START = itemgetter(0)
+
+
+def candidate_window(start_date, end_date):
+    """
+    Bounds on start_date for applications that can overlap [start_date, end_date]. Because no
+    application is longer than MAX_LEAVE_DAYS, the lower bound is finite and a (user|manager,
+    start_date) index answers the query with a bounded range scan instead of walking all history.
+    """
+    return start_date - timedelta(days=settings.MAX_LEAVE_DAYS - 1), end_date
+
+
+def overlapping(applications, start_date, end_date):
+    return applications.filter(
+        start_date__range=candidate_window(start_date, end_date),
+        end_date__gte=start_date,
+        status__in=ACTIVE_STATUSES,
+    )
+
+
+def lock_users(*user_ids):
+    """
+    The users' rows, held until the transaction ends so concurrent bookings of the same employee
+    run their overlap check and write one after the other. Call it inside transaction.atomic,
+    before the check. SQLite has no row locks; there the transaction must already hold the write
+    lock, which settings.py arranges by starting transactions IMMEDIATE.
+    """
+    return list(User.objects.select_for_update().filter(pk__in=user_ids).order_by('pk'))
+
+
+def reactivation_clashes(applications):
+    """
+    Ids of the given applications that would overlap other pending or approved leave of their
+    employee, or an earlier one of themselves, if made active again. Call lock_users first.
+    """
+    if not applications:
+        return set()
+    existing = overlapping(
+        Application.objects.filter(user_id__in={application.user_id for application in applications})
+        .exclude(pk__in=[application.pk for application in applications]),
+        min(application.start_date for application in applications),
+        max(application.end_date for application in applications),
+    ).values_list('user_id', 'start_date', 'end_date')
+    booked = {}
+    for user_id, start_date, end_date in existing:
+        booked.setdefault(user_id, IntervalIndex()).add(start_date, end_date)
+    clashes = set()
+    for application in sorted(applications, key=lambda application: application.pk):
+        index = booked.setdefault(application.user_id, IntervalIndex())
+        if index.overlapping(application.start_date, application.end_date):
+            clashes.add(application.pk)
+        else:
+            index.add(application.start_date, application.end_date)
+    return clashes
+
+
+class IntervalIndex:
+    """In-memory date intervals sorted by start, queried with the same bounded window as `overlapping`."""
+
+    def __init__(self, intervals=()):
+        self.intervals = sorted(intervals, key=START)
+
+    def add(self, start_date, end_date, value=None):
+        insort(self.intervals, (start_date, end_date, value), key=START)
+
+    def overlapping(self, start_date, end_date):
+        """(start_date, end_date, value) intervals overlapping the given range."""
+        low, high = candidate_window(start_date, end_date)
+        first = bisect_left(self.intervals, low, key=START)
+        last = bisect_right(self.intervals, high, key=START)
+        return [interval for interval in self.intervals[first:last] if interval[1] >= start_date]
+
+
+def conflicts(rows):
+    """
+    Sweep `rows` (dicts with id, user_id, start_date and end_date, ordered by start_date) and
+    yield (first, second, overlap_start, overlap_end) for every pair of different employees
+    whose leave overlaps.
+    """
+    active = []
+    for row in rows:
+        active = [other for other in active if other['end_date'] >= row['start_date']]
+        for other in active:
+            if other['user_id'] != row['user_id']:
+                yield other, row, row['start_date'], min(other['end_date'], row['end_date'])
+        active.append(row)
+
@@ -0,0 +1,25 @@
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Opt-in keyset pagination on `-id`. Requests without `cursor` or `page_size` keep getting the
+    full, unpaginated list; paginated ones seek with `id < last_id` so deep pages cost the same as the first.
+    """
+    ordering = '-id'
+    page_size_query_param = 'page_size'
+
+    def get_page_size(self, request):
+        params = request.query_params
+        if self.cursor_query_param not in params and self.page_size_query_param not in params:
+            return None
+
+        page_size = settings.KEYSET_PAGE_SIZE
+        try:
+            requested = int(params[self.page_size_query_param])
+            if requested > 0:
+                page_size = requested
+        except (KeyError, ValueError):
+            pass
+        return min(page_size, settings.KEYSET_MAX_PAGE_SIZE)
@@ -4,9 +4,9 @@ class IsManagerOrDeleteOnly(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
 
         if request.method in ['GET', 'DELETE']:
-            return obj.user == request.user
+            return obj.user_id == request.user.id
         
         if request.method in ['PUT', 'PATCH']:
-            return obj.manager == request.user
+            return obj.manager_id == request.user.id
 
         return False
\ No newline at end of file
@@ -0,0 +1,171 @@
+from datetime import date, timedelta
+from itertools import groupby
+from . import models, calendar, hierarchy
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q, Sum, Case, When, Value, IntegerField
+
+STATUSES = list(models.Status)
+
+
+def counter(status):
+    """The <status>_days counter of a status, e.g. pending_days."""
+    return f'{models.STATUS_LABELS[status].lower()}_days'
+
+# Working days of an application, e.g. Monday 2024-01-01..Sunday 2024-01-07 is 5 days.
+day_span = calendar.working_day_span()
+
+
+def year_filter(year, field='start_date'):
+    """
+    A `<field>__year=year` lookup spelled as a half-open date range, which composite
+    (manager, start_date) style indexes can seek into.
+    """
+    return Q(**{f'{field}__gte': date(year, 1, 1), f'{field}__lt': date(year + 1, 1, 1)})
+
+
+def sum_days(status=None):
+    if status is None:
+        return Sum(day_span, default=0)
+    return Sum(Case(When(status=status, then=day_span), default=Value(0), output_field=IntegerField()), default=0)
+
+
+def leave_totals(applications, *group_by, chunk_size=None):
+    """
+    Group `applications` by the given fields and sum their working days, split by status,
+    in a single aggregate query. Each row carries total_days plus one <status>_days per status.
+    With `chunk_size`, rows are streamed from the database instead of fetched at once.
+    """
+    annotations = {'total_days': sum_days()}
+    for status in STATUSES:
+        annotations[counter(status)] = sum_days(status)
+
+    rows = applications.order_by().values(*group_by).annotate(**annotations).order_by(*group_by)
+    if chunk_size:
+        rows = rows.iterator(chunk_size=chunk_size)
+    yield from rows
+
+
+def group_report(rows):
+    """Shape rows ordered by employee, carrying leave_type__name and the day counters, into the report payload."""
+    result = []
+    for (_, employee_name), leave_rows in groupby(rows, key=lambda row: (row['user_id'], row['user__name'])):
+        result.append({
+            'employee_name': employee_name,
+            'leave_types': [
+                {
+                    'leave_type': row['leave_type__name'],
+                    'total_days': row['total_days'],
+                    'pending_days': row['pending_days'],
+                    'approved_days': row['approved_days'],
+                    'rejected_days': row['rejected_days'],
+                }
+                for row in leave_rows
+            ],
+        })
+    return result
+
+
+def total_leave_report(applications):
+    """Build the TotalLeaveReportSerializer payload for `applications` with one query."""
+    return group_report(leave_totals(applications, 'user_id', 'user__name', 'leave_type__name'))
+
+
+COUNTERS = ['total_days'] + [counter(status) for status in STATUSES]
+
+
+def balance_rows(balances, across_managers=False):
+    """
+    values() rows of LeaveBalance ledger rows for group_report, ordered by employee. With
+    `across_managers`, an employee's rows kept under different managers are summed; their
+    counters then come back as sum_<counter> (see _unsum), since annotations cannot reuse field names.
+    """
+    balances = balances.exclude(total_days=0)
+    if not across_managers:
+        return balances.values('user_id', 'user__name', 'leave_type__name', *COUNTERS).order_by('user_id', 'leave_type__name')
+    return balances.values('user_id', 'user__name', 'leave_type__name').annotate(
+        **{f'sum_{name}': Sum(name) for name in COUNTERS}
+    ).order_by('user_id', 'leave_type__name')
+
+
+def _unsum(row):
+    for name in COUNTERS:
+        if f'sum_{name}' in row:
+            row[name] = row.pop(f'sum_{name}')
+    return row
+
+
+def manager_balances(manager_id, scope, year):
+    """The ledger rows behind a manager's total leave report, and whether an employee's rows under several managers are summed."""
+    if scope == 'subtree':
+        return models.LeaveBalance.objects.filter(user_id__in=hierarchy.subtree(manager_id), year=year), True
+    return models.LeaveBalance.objects.filter(manager_id=manager_id, year=year), False
+
+
+def balance_report(balances, across_managers=False):
+    """Build the same payload from LeaveBalance ledger rows instead of scanning applications."""
+    return group_report(map(_unsum, balance_rows(balances, across_managers)))
+
+
+async def abalance_report(balances, across_managers=False):
+    return group_report([_unsum(row) async for row in balance_rows(balances, across_managers)])
+
+
+# Grouping dimensions of leave_analytics: name -> (SQL expressions, output keys).
+ANALYTICS_GROUPS = {
+    'month': (['cal.year', 'cal.month'], ['month']),
+    'leave_type': (['lt.name'], ['leave_type']),
+    'status': (['app.status'], ['status']),
+    'employee': (['app.user_id', 'emp.name'], ['employee_id', 'employee_name']),
+}
+
+
+def leave_analytics(start_date, end_date, group_by, manager_id=None, include_archive=False):
+    """
+    Leave days between start_date and end_date (inclusive) per combination of `group_by`
+    dimensions, in one aggregate query. Every application is joined to the CalendarDay rows it
+    covers inside the window, so leave crossing the window edges, months or years is clipped and
+    split, and working days come from the precomputed is_working_day flag. With `include_archive`,
+    the archived applications are read alongside the current ones.
+    """
+    columns = [column for name in group_by for column in ANALYTICS_GROUPS[name][0]]
+    keys = [key for name in group_by for key in ANALYTICS_GROUPS[name][1]]
+
+    where = ['cal.date BETWEEN %s AND %s', 'app.start_date BETWEEN %s AND %s', 'app.end_date >= %s']
+    # No application is longer than MAX_LEAVE_DAYS, which bounds the start_date index range.
+    params = [start_date, end_date, start_date - timedelta(days=settings.MAX_LEAVE_DAYS - 1), end_date, start_date]
+    if manager_id is not None:
+        where.append('app.manager_id = %s')
+        params.append(manager_id)
+
+    applications = models.Application._meta.db_table
+    if include_archive:
+        fields = 'user_id, leave_type_id, start_date, end_date, status, manager_id'
+        applications = f'(SELECT {fields} FROM {applications} UNION ALL SELECT {fields} FROM {models.ArchivedApplication._meta.db_table})'
+
+    sql = f"""
+        SELECT {', '.join(columns + ['COUNT(*)', 'SUM(CASE WHEN cal.is_working_day THEN 1 ELSE 0 END)'])}
+        FROM {applications} app
+        INNER JOIN {models.CalendarDay._meta.db_table} cal ON cal.date BETWEEN app.start_date AND app.end_date
+        {f'INNER JOIN {models.User._meta.db_table} emp ON emp.id = app.user_id' if 'employee' in group_by else ''}
+        {f'INNER JOIN {models.LeaveType._meta.db_table} lt ON lt.id = app.leave_type_id' if 'leave_type' in group_by else ''}
+        WHERE {' AND '.join(where)}
+        {f"GROUP BY {', '.join(columns)} ORDER BY {', '.join(columns)}" if columns else ''}
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+
+    result = []
+    for row in rows:
+        *values, days, working_days = row
+        if not days:
+            continue
+        if 'month' in group_by:
+            index = columns.index('cal.year')
+            values[index:index + 2] = [f'{values[index]:04}-{values[index + 1]:02}']
+        if 'status' in group_by:
+            index = columns.index('app.status')
+            values[index] = models.STATUS_LABELS[values[index]]
+        result.append({**dict(zip(keys, values)), 'days': days, 'working_days': working_days or 0})
+    return result
@@ -0,0 +1,62 @@
+import random
+from datetime import date, timedelta
+from django.contrib.auth.hashers import make_password
+from . import models, ledger
+
+LEAVE_TYPES = ['Annual', 'Sick', 'Personal']
+STATUSES = list(models.Status)
+
+
+def seed(employees=100, managers=10, applications=1000, years=(2023, 2024), password='seedpass123',
+         prefix='seed', batch_size=5000, random_seed=0):
+    """
+    Bulk-insert a synthetic organisation: `managers` managers, `employees` employees and
+    `applications` leave applications spread over `years`, each addressed to the employee's
+    manager. Every account shares one password hash, so seeding cost is dominated by the inserts
+    rather than by PBKDF2. Returns (managers, employees).
+    """
+    rng = random.Random(random_seed)
+    password_hash = make_password(password)
+
+    def users(kind, indexes, reports_to):
+        return models.User.objects.bulk_create(
+            [
+                models.User(
+                    username=f'{prefix}-{kind}-{i}', email=f'{prefix}-{kind}-{i}@example.com',
+                    name=f'{kind.title()} {i}', password=password_hash, reports_to=reports_to(i),
+                )
+                for i in indexes
+            ],
+            batch_size=batch_size,
+        )
+
+    # Manager 0 heads the organisation, the other managers report to them and employees
+    # report to the managers in turn, so the reporting line is at most three levels deep.
+    manager_rows = users('manager', range(1), lambda i: None)
+    manager_rows += users('manager', range(1, managers), lambda i: manager_rows[0])
+    employee_rows = users('employee', range(employees), lambda i: manager_rows[i % len(manager_rows)])
+
+    named = models.leave_types_named(LEAVE_TYPES)
+    leave_types = [named[name].id for name in LEAVE_TYPES]
+
+    def application(i):
+        employee = employee_rows[i % len(employee_rows)]
+        start_date = date(rng.choice(years), 1, 1) + timedelta(days=rng.randrange(360))
+        return models.Application(
+            user_id=employee.id,
+            manager_id=employee.reports_to_id,
+            leave_type_id=rng.choice(leave_types),
+            start_date=start_date,
+            end_date=start_date + timedelta(days=rng.randrange(5)),
+            reason='Seeded application',
+            status=rng.choice(STATUSES),
+        )
+
+    for offset in range(0, applications, batch_size):
+        models.Application.objects.bulk_create(
+            [application(i) for i in range(offset, min(offset + batch_size, applications))]
+        )
+    # bulk_create skips the model signals that normally keep the ledger current.
+    ledger.rebuild()
+    return manager_rows, employee_rows
+
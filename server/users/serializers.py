@@ -1,8 +1,14 @@
-from . import models
+from . import models, overlaps, reports, calendar, hierarchy, signals
+from django.utils import timezone
+from datetime import date
 from rest_framework import serializers
 from rest_framework_simplejwt.serializers import TokenRefreshSerializer
-from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
 from django.contrib.auth import get_user_model
+from django.conf import settings
+from django.db import transaction
+from .authentication import USER_CLAIMS, user_from_claims
 User = get_user_model()
 
 
@@ -10,10 +16,34 @@ class UserSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True) 
     class Meta:
         model = models.User
-        fields = ['id', 'username', 'name', 'email', 'password'] 
+        fields = ['id', 'username', 'name', 'email', 'password', 'reports_to'] 
+
+    def get_fields(self):
+        fields = super().get_fields()
+        # Reporting lines decide who sees whose leave, so only staff may set them.
+        request = self.context.get('request')
+        if request is None or not request.user.is_staff:
+            fields['reports_to'].read_only = True
+        return fields
+
+    def validate_reports_to(self, value):
+        if value is not None and self.instance is not None and hierarchy.creates_cycle(self.instance.id, value.id):
+            raise serializers.ValidationError('A user cannot report to themselves or to anyone below them.')
+        return value
 
     def create(self, validated_data):
         user = models.User.objects.create_user(**validated_data)
+        if user.reports_to_id is not None:
+            signals.reporting_line_changed(user.reports_to_id)
+        return user
+
+    def update(self, instance, validated_data):
+        previous, profile = instance.reports_to_id, (instance.name, instance.email)
+        user = super().update(instance, validated_data)
+        if user.reports_to_id != previous:
+            signals.reporting_line_changed(previous, user.reports_to_id)
+        if (user.name, user.email) != profile:
+            signals.profile_changed(user.id)
         return user
 
 class UserSignInSerializer(serializers.Serializer):
@@ -21,30 +51,280 @@ class UserSignInSerializer(serializers.Serializer):
     password = serializers.CharField(write_only=True) 
 
 class CustomTokenRefreshSerializer(TokenRefreshSerializer):
-    def validate(self, attrs):
-        data = super().validate(attrs)
+    """
+    Rotate the refresh token with claims read fresh from the User row, one query per refresh:
+    deactivated users are refused, and staff or profile changes reach the next access token.
+    """
 
-        refresh = RefreshToken(attrs['refresh'])
-        user = User.objects.get(id=refresh['user_id'])  
-        data['user'] = {
-            'id': user.id,
-            'name': user.name, 
-            'username': user.username,
-            'email': user.email,
-        }
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        user = User.objects.filter(id=refresh['user_id']).values('id', 'is_active', *USER_CLAIMS).first()
+        if user is None or not user['is_active']:
+            raise AuthenticationFailed('No active account found for the given token.', code='user_inactive')
+        for claim in USER_CLAIMS:
+            refresh[claim] = user[claim]
 
+        data = {'access': str(refresh.access_token)}
+        if jwt_settings.ROTATE_REFRESH_TOKENS:
+            if jwt_settings.BLACKLIST_AFTER_ROTATION:
+                try:
+                    refresh.blacklist()
+                except AttributeError:
+                    # The token_blacklist app is not installed.
+                    pass
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            data['refresh'] = str(refresh)
+        data['user'] = user_from_claims(refresh)
         return data
     
+class LeaveTypeField(serializers.CharField):
+    """
+    A leave type by name on the wire and a models.LeaveType in validated data. Names not seen
+    before come back unsaved and are added when the application is saved (see add_leave_types),
+    so failed submissions leave no rows behind. Bulk serializers find the batch's types in
+    context['leave_types'].
+    """
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('max_length', 255)
+        super().__init__(**kwargs)
+
+    def run_validation(self, data=serializers.empty):
+        # Resolved after CharField's own validation, which checks the name rather than the row.
+        name = super().run_validation(data)
+        known = self.context.get('leave_types')
+        if known is None:
+            known = models.leave_types_named([name], add_missing=False)
+        return known.get(name) or models.LeaveType(name=name)
+
+    def to_representation(self, value):
+        return value.name
+
+class StatusField(serializers.ChoiceField):
+    """A status by label ('Pending', 'Approved', 'Rejected') on the wire and a models.Status in validated data."""
+
+    def __init__(self, **kwargs):
+        super().__init__(choices=models.Status.labels, **kwargs)
+
+    def to_internal_value(self, data):
+        return models.Status[super().to_internal_value(data).upper()]
+
+    def to_representation(self, value):
+        return models.STATUS_LABELS[value]
+
 class ApplicationSerializer(serializers.ModelSerializer):
     user = UserSerializer(read_only=True) 
+    leave_type = LeaveTypeField()
+    status = StatusField()
     class Meta:
         model = models.Application
         fields = '__all__'
  
     def create(self, validated_data):
-        validated_data['user'] = self.context['request'].user
-        validated_data['status'] = 'Pending'
+        employee = getattr(self, 'employee', None)
+        if employee is not None:
+            # The row locked during validation, which the response renders.
+            validated_data['user'] = employee
+        else:
+            validated_data['user_id'] = self.context['request'].user.id
+        validated_data['status'] = models.Status.PENDING
+        add_leave_types([validated_data])
         return super().create(validated_data)
+
+    def update(self, instance, validated_data):
+        add_leave_types([validated_data])
+        return super().update(instance, validated_data)
+
+    def validate(self, attrs):
+        if 'start_date' in attrs or 'end_date' in attrs:
+            start_date, end_date = self.dates(attrs)
+            if end_date < start_date:
+                raise serializers.ValidationError({'end_date': 'End date cannot be before the start date.'})
+            if (end_date - start_date).days + 1 > settings.MAX_LEAVE_DAYS:
+                raise serializers.ValidationError({'end_date': f'Leave cannot be longer than {settings.MAX_LEAVE_DAYS} days.'})
+            if not calendar.covers(start_date, end_date):
+                # Working days are only counted inside the calendar, both in the ledger and in reports.
+                first, last = calendar.configured_range()
+                raise serializers.ValidationError(f'Leave must fall between {first} and {last}.')
+
+        if self.books_leave(attrs):
+            clashes = self.overlapping_leave(*self.dates(attrs))
+            if clashes:
+                raise serializers.ValidationError(overlap_error(clashes))
+        return attrs
+
+    def dates(self, attrs):
+        return (
+            attrs.get('start_date', getattr(self.instance, 'start_date', None)),
+            attrs.get('end_date', getattr(self.instance, 'end_date', None)),
+        )
+
+    def books_leave(self, attrs):
+        """Whether saving `attrs` can make the application overlap other leave: new or moved active leave, or a Rejected one made active again."""
+        if self.instance is None:
+            return True
+        if attrs.get('status', self.instance.status) not in overlaps.ACTIVE_STATUSES:
+            return False
+        return 'start_date' in attrs or 'end_date' in attrs or self.instance.status not in overlaps.ACTIVE_STATUSES
+
+    def overlapping_leave(self, start_date, end_date):
+        user_id = self.instance.user_id if self.instance else self.context['request'].user.id
+        if transaction.get_connection().in_atomic_block:
+            # Validated inside the view's transaction (see ApplicationList.create): hold the employee's
+            # row until it commits, so two concurrent requests cannot both pass and book the same days.
+            self.employee = next(iter(overlaps.lock_users(user_id)), None)
+        applications = models.Application.objects.filter(user_id=user_id)
+        if self.instance:
+            applications = applications.exclude(pk=self.instance.pk)
+        return [f'application {pk}' for pk in overlaps.overlapping(applications, start_date, end_date).values_list('id', flat=True)]
+
+def add_leave_types(items):
+    """
+    Swap the unsaved leave types LeaveTypeField left in validated data `items` for saved rows,
+    adding them. Call it inside the transaction that saves the applications.
+    """
+    unsaved = [item for item in items if 'leave_type' in item and item['leave_type'].pk is None]
+    if unsaved:
+        added = models.leave_types_named({item['leave_type'].name for item in unsaved})
+        for item in unsaved:
+            item['leave_type'] = added[item['leave_type'].name]
+
+def overlap_error(clashes):
+    return f'Overlaps existing leave: {", ".join(clashes)}.'
+    
+class BulkApplicationSerializer(ApplicationSerializer):
+    """
+    One item of a bulk submission. Managers are checked against the ids the view fetched
+    for the whole batch in context['manager_ids'], and leave types come from its
+    context['leave_types'], instead of one lookup per item.
+    """
+    manager = serializers.IntegerField()
+    status = serializers.CharField(required=False)
+
+    def validate_manager(self, value):
+        if value not in self.context['manager_ids']:
+            raise serializers.ValidationError(f'Invalid pk "{value}" - object does not exist.')
+        return value
+
+    def overlapping_leave(self, start_date, end_date):
+        # Checked by the view against the whole batch and one query for existing leave.
+        return []
+
+class BulkDecisionSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False)
+    status = StatusField()
+
+    def validate_ids(self, value):
+        if len(value) > settings.BULK_MAX_ITEMS:
+            raise serializers.ValidationError(f'At most {settings.BULK_MAX_ITEMS} ids per request.')
+        return list(dict.fromkeys(value))
+
+class ScopeSerializer(serializers.Serializer):
+    """`scope=direct` (default): applications naming the manager; `scope=subtree`: everyone below them in the org."""
+    scope = serializers.ChoiceField(choices=hierarchy.SCOPES, default='direct')
+
+class ArchiveSerializer(serializers.Serializer):
+    """`archived=true`: the applications moved to the archive (see users.archive) instead of the current ones."""
+    archived = serializers.BooleanField(default=False)
+
+class DateWindowSerializer(serializers.Serializer):
+    """An inclusive `start`..`end` query window, at most MAX_LEAVE_DAYS long."""
+    start = serializers.DateField()
+    end = serializers.DateField()
+
+    def validate(self, attrs):
+        if attrs['end'] < attrs['start']:
+            raise serializers.ValidationError({'end': 'End cannot be before start.'})
+        if (attrs['end'] - attrs['start']).days + 1 > settings.MAX_LEAVE_DAYS:
+            raise serializers.ValidationError({'end': f'Window cannot be longer than {settings.MAX_LEAVE_DAYS} days.'})
+        return attrs
+
+class TeamConflictSerializer(serializers.Serializer):
+    start_date = serializers.DateField()
+    end_date = serializers.DateField()
+    employees = serializers.ListField(child=serializers.CharField())
+    applications = serializers.ListField(child=serializers.IntegerField())
+
+class ExportFilterSerializer(serializers.Serializer):
+    """Query parameters of the export endpoints; dates filter on the application's start date."""
+    output = serializers.ChoiceField(choices=['csv', 'ndjson'], default='csv')
+    year = serializers.IntegerField(required=False, min_value=1, max_value=9998)
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+    manager = serializers.IntegerField(required=False)
+    archived = serializers.BooleanField(default=False)
+
+    def validate(self, attrs):
+        if 'year' in attrs and ('start' in attrs or 'end' in attrs):
+            raise serializers.ValidationError('Filter by year or by start/end, not both.')
+        return attrs
+
+class LeaveAnalyticsQuerySerializer(serializers.Serializer):
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+    group_by = serializers.CharField(default='leave_type')
+    manager = serializers.IntegerField(required=False)
+    # Also count archived applications, for windows reaching back past the hot horizon.
+    include_archive = serializers.BooleanField(default=False)
+
+    def validate_group_by(self, value):
+        names = [name.strip() for name in value.split(',') if name.strip()]
+        unknown = [name for name in names if name not in reports.ANALYTICS_GROUPS]
+        if unknown:
+            raise serializers.ValidationError(
+                f'Unknown grouping {", ".join(unknown)}; choose from {", ".join(reports.ANALYTICS_GROUPS)}.'
+            )
+        return list(dict.fromkeys(names))
+
+    def validate(self, attrs):
+        year = timezone.now().year
+        attrs.setdefault('start', date(year, 1, 1))
+        attrs.setdefault('end', date(year, 12, 31))
+        if attrs['end'] < attrs['start']:
+            raise serializers.ValidationError({'end': 'End cannot be before start.'})
+        if not calendar.covers(attrs['start'], attrs['end']):
+            first, last = calendar.configured_range()
+            raise serializers.ValidationError(f'The leave calendar only covers {first} to {last}.')
+        return attrs
+
+class LeaveAnalyticsRowSerializer(serializers.Serializer):
+    month = serializers.CharField(required=False)
+    leave_type = serializers.CharField(required=False)
+    status = serializers.CharField(required=False)
+    employee_id = serializers.IntegerField(required=False)
+    employee_name = serializers.CharField(required=False)
+    days = serializers.IntegerField()
+    working_days = serializers.IntegerField()
+
+# Columns needed to render ApplicationSerializer's read shape straight from values() rows.
+APPLICATION_LIST_FIELDS = [
+    'id', 'user_id', 'user__username', 'user__name', 'user__email', 'user__reports_to_id',
+    'leave_type__name', 'start_date', 'end_date', 'reason', 'status', 'manager_id',
+]
+
+def application_row(row):
+    """
+    Render one values(*APPLICATION_LIST_FIELDS) row exactly as ApplicationSerializer would,
+    without building a model instance or walking serializer fields per row.
+    """
+    return {
+        'id': row['id'],
+        'user': {
+            'id': row['user_id'],
+            'username': row['user__username'],
+            'name': row['user__name'],
+            'email': row['user__email'],
+            'reports_to': row['user__reports_to_id'],
+        },
+        'leave_type': row['leave_type__name'],
+        'start_date': row['start_date'].isoformat(),
+        'end_date': row['end_date'].isoformat(),
+        'reason': row['reason'],
+        'status': models.STATUS_LABELS[row['status']],
+        'manager': row['manager_id'],
+    }
     
 class LeaveTypeSerializer(serializers.Serializer): 
     leave_type = serializers.CharField()
@@ -55,4 +335,13 @@ class LeaveTypeSerializer(serializers.Serializer):
     
 class TotalLeaveReportSerializer(serializers.Serializer):
     employee_name = serializers.CharField()
-    leave_types = LeaveTypeSerializer(many=True)
\ No newline at end of file
+    leave_types = LeaveTypeSerializer(many=True)
+
+class ReportJobSerializer(serializers.ModelSerializer):
+    url = serializers.HyperlinkedIdentityField(view_name='report-job-detail')
+    result_url = serializers.HyperlinkedIdentityField(view_name='report-job-result')
+    status = serializers.CharField(source='get_status_display')
+
+    class Meta:
+        model = models.ReportJob
+        fields = ['id', 'url', 'result_url', 'scope', 'year', 'status', 'attempts', 'error', 'created_at', 'started_at', 'finished_at']
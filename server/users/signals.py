@@ -0,0 +1,102 @@
+from contextvars import ContextVar
+from functools import partial
+from itertools import chain
+from django.apps import apps as global_apps
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from . import models, ledger, cache, conditional, calendar, hierarchy, events
+
+# Set while users.archive moves rows to the archive table, where the ledger keeps counting them.
+archiving = ContextVar('archiving', default=False)
+
+
+def applications_changed(removed=(), added=(), notify=()):
+    """
+    Propagate application changes, given as ledger entries (see models.ledger_entry), to the
+    LeaveBalance ledger, the dashboard cache and ETag watermark of the managers and of everyone
+    above the employees in the reporting line (their subtree views include the change).
+    `notify` holds (event type, application) pairs pushed to the employee and manager streams.
+    Bulk writes that bypass model signals (bulk_create, QuerySet.update) call this directly.
+    """
+    ledger.record(removed=removed, added=added)
+    # Ledger keys start with (user_id, manager_id).
+    listings_changed({key[:2] for key, _, _ in chain(removed, added)})
+    for event_type, application in notify:
+        events.publish(events.application_event(event_type, application), application.user_id, application.manager_id)
+
+
+def invalidate_on_commit(*manager_ids):
+    """
+    Move the managers' dashboards to a new generation once the change is committed. Done earlier,
+    a concurrent request could still read the old rows and cache them under the new generation.
+    """
+    transaction.on_commit(partial(cache.invalidate, *manager_ids))
+
+
+def listings_changed(people):
+    """Expire the cached dashboards and ETags that list applications of the (user_id, manager_id) pairs."""
+    above = hierarchy.ancestor_ids(*(user_id for user_id, _ in people))
+    invalidate_on_commit(*(manager_id for _, manager_id in people), *above)
+    conditional.bump_watermarks(*chain.from_iterable(people), *above)
+
+
+def reporting_line_changed(*manager_ids):
+    """A user moved between the given managers: every subtree they left or joined looks different now."""
+    managers = {manager_id for manager_id in manager_ids if manager_id is not None}
+    managers |= hierarchy.ancestor_ids(*managers)
+    invalidate_on_commit(*managers)
+    conditional.bump_watermarks(*managers)
+
+
+def profile_changed(user_id):
+    """A user's name or email changed: the listings and reports of everyone who sees their leave show the old one."""
+    managers = set(models.Application.objects.filter(user_id=user_id).values_list('manager_id', flat=True).distinct())
+    managers |= set(models.LeaveBalance.objects.filter(user_id=user_id).values_list('manager_id', flat=True).distinct())
+    # The user's own views and everyone above them move on too, even without any leave yet.
+    above = hierarchy.ancestor_ids(user_id)
+    invalidate_on_commit(*managers, *above)
+    conditional.bump_watermarks(user_id, *managers, *above)
+
+
+@receiver(post_save, sender=models.Application)
+def application_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    entry = models.ledger_entry(instance)
+    previous = None if created else models.loaded_ledger_entry(instance)
+    if created:
+        event_type = events.CREATED
+    elif previous and previous[1] != entry[1]:
+        event_type = events.STATUS_CHANGED
+    else:
+        event_type = events.UPDATED
+    applications_changed(removed=[previous] if previous else [], added=[entry], notify=[(event_type, instance)])
+    if previous and previous[0][1] != instance.manager_id:
+        # Reassigned: the previous manager's dashboard loses the application.
+        events.publish(events.application_event(event_type, instance), previous[0][1])
+    instance._ledger_fields = {name: getattr(instance, name) for name in models.LEDGER_FIELDS}
+
+
+@receiver(post_delete, sender=models.Application)
+def application_deleted(sender, instance, **kwargs):
+    if archiving.get():
+        return
+    entry = models.loaded_ledger_entry(instance) or models.ledger_entry(instance)
+    applications_changed(removed=[entry], notify=[(events.DELETED, instance)])
+
+
+def build_calendar(sender, using='default', apps=global_apps, **kwargs):
+    """
+    post_migrate: make sure the configured calendar years exist, like contenttypes does for its rows.
+    Skipped when migrating back to before the calendar tables match the models, e.g. `migrate users 0003`.
+    """
+    try:
+        for name in ['CalendarDay', 'Holiday']:
+            fields = {field.column for field in apps.get_model('users', name)._meta.concrete_fields}
+            if fields != {field.column for field in getattr(models, name)._meta.concrete_fields}:
+                return
+    except LookupError:
+        return
+    if not models.CalendarDay.objects.using(using).exists():
+        calendar.build(using=using)
@@ -0,0 +1,63 @@
+"""
+Request coalescing: concurrent calls with the same key share one computation. The first caller
+runs it; callers arriving while it runs wait and get the same result, or the same exception.
+Nothing is kept once it finishes, so this only folds together calls that overlap in time;
+users.cache keeps results across requests.
+"""
+import asyncio
+import threading
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class Group:
+    """Single flights for threads (do) and, separately, for coroutines on one event loop (ado)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._tasks = {}
+
+    def do(self, key, compute):
+        """Return compute(), or the result of the call already computing `key`; second value: whether shared."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = compute()
+        except BaseException as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    async def ado(self, key, compute):
+        """do() for a coroutine function `compute`."""
+        loop = asyncio.get_running_loop()
+        task = self._tasks.get((loop, key))
+        shared = task is not None
+        if not shared:
+            # A task of its own, so a caller that goes away does not cancel it under the others.
+            task = self._tasks[loop, key] = loop.create_task(compute())
+
+            def forget(done):
+                if self._tasks.get((loop, key)) is done:
+                    del self._tasks[loop, key]
+            task.add_done_callback(forget)
+        return await asyncio.shield(task), shared
@@ -1,10 +1,49 @@
-from django.test import TestCase
-from django.urls import reverse
-from rest_framework.test import APIClient
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse, resolve
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework.exceptions import ValidationError
 from rest_framework import status
-from .models import User, Application
+from .models import User, Application, LeaveBalance, LeaveType, Status
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import override_settings
+from django.conf import settings
+from django.http import QueryDict
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.db.models import Max, Min
+from . import archive, jobs, singleflight, reports, serializers, cache, calendar, ledger, instrumentation, seed, urls, loadtest, events, backends, throttling
+from .authentication import tokens_for_user
+from .models import CalendarDay, Holiday, ArchivedApplication, ReportJob, JobStatus
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
 from django.utils import timezone
+from asgiref.sync import sync_to_async
+import asyncio
+import csv
 import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from contextlib import contextmanager
+from io import StringIO
+from unittest import mock
+
+class RecordingBroker:
+    def __init__(self):
+        self.published = []
+
+    def publish(self, channel, event):
+        self.published.append((channel, event['type'], event['id'], event['status']))
+
+def leave_type_named(name):
+    return LeaveType.objects.get_or_create(name=name)[0]
+
+def first_monday(year, month):
+    first = date(year, month, 1)
+    return first + timedelta(days=-first.weekday() % 7)
 
 class UserModelTests(TestCase):
     def test_create_user(self):
@@ -37,16 +76,16 @@ class ApplicationModelTests(TestCase):
     def test_create_application(self):
         application = Application.objects.create(
             user=self.user,
-            leave_type='Vacation',
+            leave_type=leave_type_named('Vacation'),
             start_date=timezone.now().date(),
             end_date=timezone.now().date() + timezone.timedelta(days=1),
             reason='Test reason',
-            status='Pending',
+            status=Status.PENDING,
             manager=self.manager
         )
         self.assertEqual(application.user, self.user)
-        self.assertEqual(application.leave_type, 'Vacation')
-        self.assertEqual(application.status, 'Pending')
+        self.assertEqual(application.leave_type.name, 'Vacation')
+        self.assertEqual(application.status, Status.PENDING)
         self.assertEqual(application.manager, self.manager)
 
 class APIViewTests(TestCase):
@@ -91,17 +130,51 @@ class APIViewTests(TestCase):
         response = self.client.post(url, data)
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         self.assertEqual(Application.objects.count(), 1)
-        self.assertEqual(Application.objects.get().leave_type, 'Vacation')
+        self.assertEqual(Application.objects.get().leave_type.name, 'Vacation')
+
+    def test_validation_does_not_add_leave_types(self):
+        self.client.force_authenticate(user=self.user)
+        data = {'leave_type': 'Sabbatical', 'reason': 'Test', 'manager': self.manager.id, 'status': 'Pending'}
+        response = self.client.post(reverse('application-list'), dict(data, start_date='2024-01-05', end_date='2024-01-01'))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(reverse('application-bulk-create'), [dict(data, start_date='2024-01-05', end_date='2024-01-01')], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(LeaveType.objects.filter(name='Sabbatical').exists())
+
+        response = self.client.post(reverse('application-list'), dict(data, start_date='2024-01-01', end_date='2024-01-01'))
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        response = self.client.post(reverse('application-bulk-create'), [
+            dict(data, leave_type='Study', start_date=start, end_date=start) for start in ['2024-02-01', '2024-03-01']
+        ], format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(sorted(Application.objects.values_list('leave_type__name', flat=True)), ['Sabbatical', 'Study', 'Study'])
+
+    def test_leave_type_and_status_strings(self):
+        self.client.force_authenticate(user=self.user)
+        data = {'leave_type': 'Vacation', 'reason': 'Test', 'manager': self.manager.id, 'status': 'Pending'}
+        ids = [
+            self.client.post(reverse('application-list'), dict(data, start_date=start, end_date=start)).data['id']
+            for start in ['2024-01-01', '2024-02-01']
+        ]
+        self.assertEqual(LeaveType.objects.filter(name='Vacation').count(), 1)
+
+        self.client.force_authenticate(user=self.manager)
+        url = reverse('application-detail', args=[ids[0]])
+        self.assertEqual(self.client.patch(url, {'status': 'Cancelled'}).status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.patch(url, {'status': 'Approved'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data['leave_type'], response.data['status']), ('Vacation', 'Approved'))
+        self.assertEqual(Application.objects.get(id=ids[0]).status, Status.APPROVED)
 
     def test_get_subordinate_applications(self):
         self.client.force_authenticate(user=self.manager)
         Application.objects.create(
             user=self.user,
-            leave_type='Vacation',
+            leave_type=leave_type_named('Vacation'),
             start_date='2024-01-01',
             end_date='2024-01-05',
             reason='Test vacation',
-            status='Pending',
+            status=Status.PENDING,
             manager=self.manager
         )
         url = reverse('subordinate-applications-list')
@@ -112,13 +185,14 @@ class APIViewTests(TestCase):
 
     def test_total_leave_report(self):
         self.client.force_authenticate(user=self.manager)
+        monday = first_monday(timezone.now().year, 1)
         Application.objects.create(
             user=self.user,
-            leave_type='Vacation',
-            start_date='2024-01-01',
-            end_date='2024-01-05',
+            leave_type=leave_type_named('Vacation'),
+            start_date=monday,
+            end_date=monday + timedelta(days=4),
             reason='Test vacation',
-            status='Approved',
+            status=Status.APPROVED,
             manager=self.manager
         )
         url = reverse('total-leaves-report')
@@ -126,6 +200,1996 @@ class APIViewTests(TestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.data), 1)
         self.assertEqual(response.data[0]['employee_name'], 'Test User')
-        self.assertEqual(response.data[0]['leave_type'], 'Vacation')
-        self.assertEqual(response.data[0]['total_days'], 5)
-        self.assertEqual(response.data[0]['approved_days'], 5)
\ No newline at end of file
+        leave_type = response.data[0]['leave_types'][0]
+        self.assertEqual(leave_type['leave_type'], 'Vacation')
+        self.assertEqual(leave_type['total_days'], 5)
+        self.assertEqual(leave_type['approved_days'], 5)
+
+class TotalLeaveReportTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.manager = User.objects.create_user(
+            username='manager',
+            email='manager@example.com',
+            password='managerpass123',
+            name='Manager User'
+        )
+        self.client.force_authenticate(user=self.manager)
+        self.url = reverse('total-leaves-report')
+        self.year = timezone.now().year
+        self.monday = first_monday(self.year, 3)
+        cache.dashboard_cache().clear()
+
+    def create_employees(self, count, first=0):
+        for i in range(first, count):
+            employee = User.objects.create_user(
+                username=f'employee{i}',
+                email=f'employee{i}@example.com',
+                password='employeepass123',
+                name=f'Employee {i}'
+            )
+            for leave_type, leave_status in [('Annual', Status.APPROVED), ('Annual', Status.PENDING), ('Sick', Status.REJECTED)]:
+                Application.objects.create(
+                    user=employee,
+                    leave_type=leave_type_named(leave_type),
+                    start_date=self.monday,
+                    end_date=self.monday + timedelta(days=2),
+                    reason='Test',
+                    status=leave_status,
+                    manager=self.manager
+                )
+
+    def test_splits_days_by_status(self):
+        self.create_employees(1)
+        response = self.client.get(self.url)
+        self.assertEqual(response.data, [{
+            'employee_name': 'Employee 0',
+            'leave_types': [
+                {'leave_type': 'Annual', 'total_days': 6, 'pending_days': 3, 'approved_days': 3, 'rejected_days': 0},
+                {'leave_type': 'Sick', 'total_days': 3, 'pending_days': 0, 'approved_days': 0, 'rejected_days': 3},
+            ],
+        }])
+
+    def test_ignores_other_years_and_managers(self):
+        self.create_employees(1)
+        other_manager = User.objects.create_user(
+            username='other', email='other@example.com', password='otherpass123', name='Other'
+        )
+        employee = User.objects.get(username='employee0')
+        Application.objects.create(
+            user=employee, leave_type=leave_type_named('Annual'), start_date=f'{self.year - 1}-03-02',
+            end_date=f'{self.year - 1}-03-04', reason='Test', status=Status.APPROVED, manager=self.manager
+        )
+        Application.objects.create(
+            user=employee, leave_type=leave_type_named('Annual'), start_date=f'{self.year}-05-04',
+            end_date=f'{self.year}-05-04', reason='Test', status=Status.APPROVED, manager=other_manager
+        )
+        response = self.client.get(self.url)
+        self.assertEqual(response.data[0]['leave_types'][0]['total_days'], 6)
+
+    def test_query_count_is_constant(self):
+        # ETag watermark lookup + stored snapshot lookup + the report itself.
+        self.create_employees(2)
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url)
+        self.assertEqual(len(response.data), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_employees(12, first=2)
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url)
+        self.assertEqual(len(response.data), 12)
+
+class LeaveBalanceLedgerTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123',
+            name='Test User'
+        )
+        self.manager = User.objects.create_user(
+            username='manager',
+            email='manager@example.com',
+            password='managerpass123',
+            name='Manager User'
+        )
+
+    def balance(self):
+        return LeaveBalance.objects.values(
+            'year', 'leave_type__name', 'total_days', 'pending_days', 'approved_days', 'rejected_days'
+        ).get(user=self.user, manager=self.manager)
+
+    def submit(self):
+        self.client.force_authenticate(user=self.user)
+        response = self.client.post(reverse('application-list'), {
+            'leave_type': 'Vacation',
+            'start_date': '2024-01-01',
+            'end_date': '2024-01-05',
+            'reason': 'Test vacation',
+            'manager': self.manager.id,
+            'status': 'Pending',
+        })
+        return response.data['id']
+
+    def test_create_adds_pending_days(self):
+        self.submit()
+        self.assertEqual(self.balance(), {
+            'year': 2024, 'leave_type__name': 'Vacation',
+            'total_days': 5, 'pending_days': 5, 'approved_days': 0, 'rejected_days': 0,
+        })
+
+    def test_status_patch_moves_days(self):
+        pk = self.submit()
+        self.client.force_authenticate(user=self.manager)
+        response = self.client.patch(reverse('application-detail', args=[pk]), {'status': 'Approved'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        balance = self.balance()
+        self.assertEqual(balance['total_days'], 5)
+        self.assertEqual(balance['pending_days'], 0)
+        self.assertEqual(balance['approved_days'], 5)
+
+    def test_delete_removes_days(self):
+        pk = self.submit()
+        response = self.client.delete(reverse('application-detail', args=[pk]))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.balance()['total_days'], 0)
+
+    def test_rebuild_command_restores_drifted_ledger(self):
+        self.submit()
+        LeaveBalance.objects.update(total_days=99)
+        with self.assertRaises(CommandError):
+            call_command('rebuild_leave_ledger', '--check', stdout=StringIO(), stderr=StringIO())
+        call_command('rebuild_leave_ledger', stdout=StringIO(), stderr=StringIO())
+        self.assertEqual(self.balance()['total_days'], 5)
+
+    def test_loading_applications_does_not_count_days(self):
+        pk = self.submit()
+        with mock.patch.object(calendar, 'working_days', side_effect=AssertionError('counted on load')):
+            application = Application.objects.get(pk=pk)
+        application.end_date = date(2024, 1, 3)
+        application.save()
+        self.assertEqual(self.balance()['total_days'], 3)
+
+@override_settings(KEYSET_PAGE_SIZE=2, KEYSET_MAX_PAGE_SIZE=3)
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123',
+            name='Test User'
+        )
+        self.manager = User.objects.create_user(
+            username='manager',
+            email='manager@example.com',
+            password='managerpass123',
+            name='Manager User'
+        )
+        self.applications = [
+            Application.objects.create(
+                user=self.user,
+                leave_type=leave_type_named('Vacation'),
+                start_date='2024-01-01',
+                end_date='2024-01-05',
+                reason=f'Test {i}',
+                status=Status.PENDING,
+                manager=self.manager
+            )
+            for i in range(5)
+        ]
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse('application-list')
+
+    def test_unpaginated_by_default(self):
+        response = self.client.get(self.url)
+        self.assertEqual(len(response.data), 5)
+
+    def test_walks_pages_in_id_order(self):
+        ids = []
+        response = self.client.get(self.url, {'page_size': 2})
+        while True:
+            ids += [row['id'] for row in response.data['results']]
+            if not response.data['next']:
+                break
+            response = self.client.get(response.data['next'])
+        self.assertEqual(ids, sorted((app.id for app in self.applications), reverse=True))
+
+    def test_cursor_is_stable_under_inserts(self):
+        first = self.client.get(self.url, {'page_size': 2})
+        Application.objects.create(
+            user=self.user, leave_type=leave_type_named('Sick'), start_date='2024-02-01', end_date='2024-02-01',
+            reason='New', status=Status.PENDING, manager=self.manager
+        )
+        second = self.client.get(first.data['next'])
+        self.assertEqual([row['id'] for row in second.data['results']], [self.applications[2].id, self.applications[1].id])
+
+    def test_page_size_is_capped(self):
+        response = self.client.get(self.url, {'page_size': 100})
+        self.assertEqual(len(response.data['results']), 3)
+
+    def test_invalid_page_size_uses_default(self):
+        response = self.client.get(self.url, {'page_size': 'all'})
+        self.assertEqual(len(response.data['results']), 2)
+
+def explain(sql, params=()):
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            return '\n'.join(row[-1] for row in cursor.fetchall())
+        cursor.execute(f'EXPLAIN {sql}', params)
+        return '\n'.join(row[0] for row in cursor.fetchall())
+
+class QueryPlanTests(TestCase):
+    """Fail when a hot endpoint's query on an application table stops using an index."""
+    tables = ['users_application', 'users_leavebalance']
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123',
+            name='Test User'
+        )
+        self.manager = User.objects.create_user(
+            username='manager',
+            email='manager@example.com',
+            password='managerpass123',
+            name='Manager User'
+        )
+        Application.objects.create(
+            user=self.user,
+            leave_type=leave_type_named('Vacation'),
+            start_date=timezone.now().date(),
+            end_date=timezone.now().date(),
+            reason='Test vacation',
+            status=Status.PENDING,
+            manager=self.manager
+        )
+        if connection.vendor == 'postgresql':
+            # Tiny test tables always favour a sequential scan; ask whether an index path exists at all.
+            with connection.cursor() as cursor:
+                cursor.execute('SET enable_seqscan = off')
+
+    def assertNoSequentialScan(self, sql, params=()):
+        plan = explain(sql, params)
+        for table in self.tables:
+            if connection.vendor == 'sqlite':
+                self.assertNotRegex(plan, rf'\bSCAN {table}\b(?! USING COVERING)', f'{sql}\n{plan}')
+            else:
+                self.assertNotRegex(plan, rf'Seq Scan on {table}\b', f'{sql}\n{plan}')
+
+    def assertEndpointUsesIndexes(self, user, url):
+        self.client.force_authenticate(user=user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        for query in queries.captured_queries:
+            if any(table in query['sql'] for table in self.tables):
+                self.assertNoSequentialScan(query['sql'])
+
+    def test_application_list(self):
+        self.assertEndpointUsesIndexes(self.user, reverse('application-list'))
+
+    def test_subordinate_applications_list(self):
+        self.assertEndpointUsesIndexes(self.manager, reverse('subordinate-applications-list'))
+
+    def test_total_leave_report(self):
+        self.assertEndpointUsesIndexes(self.manager, reverse('total-leaves-report'))
+
+    def test_manager_year_filter(self):
+        applications = Application.objects.filter(reports.year_filter(timezone.now().year), manager=self.manager)
+        self.assertNoSequentialScan(*applications.query.sql_with_params())
+
+    def test_manager_status_filter(self):
+        applications = Application.objects.filter(manager=self.manager, status=Status.PENDING)
+        self.assertNoSequentialScan(*applications.query.sql_with_params())
+
+class ApplicationListRenderingTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.manager = User.objects.create_user(
+            username='manager',
+            email='manager@example.com',
+            password='managerpass123',
+            name='Manager User'
+        )
+        for i in range(3):
+            employee = User.objects.create_user(
+                username=f'employee{i}',
+                email=f'employee{i}@example.com',
+                password='employeepass123',
+                name=f'Employee {i}'
+            )
+            Application.objects.create(
+                user=employee,
+                leave_type=leave_type_named('Vacation'),
+                start_date='2024-01-01',
+                end_date='2024-01-05',
+                reason='Test vacation',
+                status=Status.PENDING,
+                manager=self.manager
+            )
+        self.client.force_authenticate(user=self.manager)
+        cache.dashboard_cache().clear()
+
+    def test_rows_match_application_serializer(self):
+        response = self.client.get(reverse('subordinate-applications-list'))
+        expected = serializers.ApplicationSerializer(Application.objects.filter(manager=self.manager), many=True).data
+        self.assertEqual(json.loads(json.dumps(response.data)), json.loads(json.dumps(expected)))
+
+    def test_subordinate_list_does_not_query_per_row(self):
+        # ETag watermark lookup + the list itself.
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('subordinate-applications-list'))
+        self.assertEqual(len(response.data), 3)
+
+class StatelessJWTAuthenticationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123',
+            name='Test User'
+        )
+        self.manager = User.objects.create_user(
+            username='manager',
+            email='manager@example.com',
+            password='managerpass123',
+            name='Manager User'
+        )
+
+    def sign_in(self, username, password):
+        return self.client.post(reverse('signin'), {'username': username, 'password': password}).data
+
+    def test_authenticated_request_skips_user_query(self):
+        tokens = self.sign_in('testuser', 'testpass123')
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens['access']}")
+        # ETag watermark lookup + the list itself; no User row is loaded for authentication.
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('application-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(queries), 2)
+        self.assertNotIn('"users_user"."password"', ' '.join(query['sql'] for query in queries))
+
+    def test_create_and_manager_patch_with_token_user(self):
+        tokens = self.sign_in('testuser', 'testpass123')
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens['access']}")
+        response = self.client.post(reverse('application-list'), {
+            'leave_type': 'Vacation',
+            'start_date': '2024-01-01',
+            'end_date': '2024-01-05',
+            'reason': 'Test vacation',
+            'manager': self.manager.id,
+            'status': 'Pending'
+        })
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['user']['name'], 'Test User')
+
+        tokens = self.sign_in('manager', 'managerpass123')
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens['access']}")
+        response = self.client.patch(reverse('application-detail', args=[response.data['id']]), {'status': 'Approved'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(Application.objects.get().status, Status.APPROVED)
+
+    def test_refresh_reads_current_user_once(self):
+        tokens = self.sign_in('testuser', 'testpass123')
+        User.objects.filter(pk=self.user.pk).update(name='Renamed', is_staff=True)
+        with self.assertNumQueries(1):
+            response = self.client.post(reverse('token_refresh'), {'refresh': tokens['refresh']})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['user'], {
+            'id': self.user.id, 'name': 'Renamed', 'username': 'testuser', 'email': 'test@example.com',
+        })
+        self.assertTrue(AccessToken(response.data['access'])['is_staff'])
+
+        # Rotated refresh tokens carry the claims of the last refresh, never stale ones.
+        User.objects.filter(pk=self.user.pk).update(is_staff=False)
+        response = self.client.post(reverse('token_refresh'), {'refresh': response.data['refresh']})
+        self.assertFalse(AccessToken(response.data['access'])['is_staff'])
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+        self.assertEqual(self.client.get(reverse('request-metrics')).status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_refresh_refuses_inactive_users(self):
+        tokens = self.sign_in('testuser', 'testpass123')
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        response = self.client.post(reverse('token_refresh'), {'refresh': tokens['refresh']})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_tokens_without_profile_claims_must_be_refreshed(self):
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        response = self.client.get(reverse('application-list'))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        # Refreshing reads the claims from the database.
+        response = self.client.post(reverse('token_refresh'), {'refresh': str(refresh)})
+        self.assertEqual(response.data['user']['name'], 'Test User')
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+        response = self.client.get(reverse('application-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+class DashboardCacheTests(TestCase):
+    def setUp(self):
+        cache.dashboard_cache().clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123',
+            name='Test User'
+        )
+        self.manager = User.objects.create_user(
+            username='manager',
+            email='manager@example.com',
+            password='managerpass123',
+            name='Manager User'
+        )
+        self.application = self.create_application()
+        self.client.force_authenticate(user=self.manager)
+
+    def create_application(self):
+        return Application.objects.create(
+            user=self.user,
+            leave_type=leave_type_named('Vacation'),
+            start_date=first_monday(timezone.now().year, 1),
+            end_date=first_monday(timezone.now().year, 1),
+            reason='Test vacation',
+            status=Status.PENDING,
+            manager=self.manager
+        )
+
+    def test_repeated_dashboard_requests_hit_cache(self):
+        for name in ['subordinate-applications-list', 'total-leaves-report']:
+            first = self.client.get(reverse(name))
+            # Only the ETag watermark lookup.
+            with self.assertNumQueries(1):
+                second = self.client.get(reverse(name))
+            self.assertEqual(first.data, second.data)
+
+    def test_new_application_invalidates_manager(self):
+        self.client.get(reverse('subordinate-applications-list'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_application()
+        response = self.client.get(reverse('subordinate-applications-list'))
+        self.assertEqual(len(response.data), 2)
+
+    def test_invalidation_waits_for_commit(self):
+        self.client.get(reverse('subordinate-applications-list'))
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.create_application()
+        # Until commit, a concurrent reader would still see the old rows; the old generation stays.
+        self.assertEqual(len(self.client.get(reverse('subordinate-applications-list')).data), 1)
+        for callback in callbacks:
+            callback()
+        self.assertEqual(len(self.client.get(reverse('subordinate-applications-list')).data), 2)
+
+    def test_status_change_invalidates_report(self):
+        self.client.get(reverse('total-leaves-report'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(reverse('application-detail', args=[self.application.id]), {'status': 'Approved'})
+        response = self.client.get(reverse('total-leaves-report'))
+        self.assertEqual(response.data[0]['leave_types'][0]['approved_days'], 1)
+
+    def test_profile_edit_invalidates_manager(self):
+        self.client.get(reverse('subordinate-applications-list'))
+        self.client.get(reverse('total-leaves-report'))
+        self.client.force_authenticate(user=self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(reverse('user-detail', args=[self.user.id]), {'name': 'Renamed'})
+        self.client.force_authenticate(user=self.manager)
+        response = self.client.get(reverse('subordinate-applications-list'))
+        self.assertEqual(response.data[0]['user']['name'], 'Renamed')
+        response = self.client.get(reverse('total-leaves-report'))
+        self.assertEqual(response.data[0]['employee_name'], 'Renamed')
+
+    def test_delete_invalidates_manager(self):
+        self.client.get(reverse('subordinate-applications-list'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.application.delete()
+        response = self.client.get(reverse('subordinate-applications-list'))
+        self.assertEqual(response.data, [])
+
+    def test_query_params_are_part_of_key(self):
+        self.create_application()
+        self.client.get(reverse('subordinate-applications-list'))
+        response = self.client.get(reverse('subordinate-applications-list'), {'page_size': 1})
+        self.assertEqual(len(response.data['results']), 1)
+
+    def test_stats_are_admin_only(self):
+        self.client.get(reverse('total-leaves-report'))
+        self.client.get(reverse('total-leaves-report'))
+        response = self.client.get(reverse('cache-stats'))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.manager.is_staff = True
+        self.client.force_authenticate(user=self.manager)
+        response = self.client.get(reverse('cache-stats'))
+        self.assertGreaterEqual(response.data['hits'], 1)
+        self.assertGreaterEqual(response.data['misses'], 1)
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.dashboard_cache().clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123',
+            name='Test User'
+        )
+        self.manager = User.objects.create_user(
+            username='manager',
+            email='manager@example.com',
+            password='managerpass123',
+            name='Manager User'
+        )
+        self.application = Application.objects.create(
+            user=self.user,
+            leave_type=leave_type_named('Vacation'),
+            start_date=timezone.now().date(),
+            end_date=timezone.now().date(),
+            reason='Test vacation',
+            status=Status.PENDING,
+            manager=self.manager
+        )
+
+    def assertNotModifiedUntilChange(self, user, url, change):
+        self.client.force_authenticate(user=user)
+        response = self.client.get(url)
+        etag = response['ETag']
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        change()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def approve(self):
+        self.application.status = Status.APPROVED
+        self.application.save()
+
+    def test_employee_list(self):
+        self.assertNotModifiedUntilChange(self.user, reverse('application-list'), self.approve)
+
+    def test_subordinate_list(self):
+        self.assertNotModifiedUntilChange(self.manager, reverse('subordinate-applications-list'), self.application.delete)
+
+    def test_total_leave_report(self):
+        self.assertNotModifiedUntilChange(self.manager, reverse('total-leaves-report'), self.approve)
+
+    def test_profile_edit(self):
+        head = User.objects.create_user(username='head', email='head@example.com', password='headpass123', name='Head')
+        User.objects.filter(pk=self.user.pk).update(reports_to=head)
+        self.user.refresh_from_db()
+
+        def rename():
+            serializer = serializers.UserSerializer(self.user, data={'name': 'Renamed'}, partial=True)
+            serializer.is_valid(raise_exception=True)
+            serializer.save()
+        watermark = User.objects.get(pk=head.pk).leave_watermark
+        self.assertNotModifiedUntilChange(self.manager, reverse('subordinate-applications-list'), rename)
+        self.assertGreater(User.objects.get(pk=head.pk).leave_watermark, watermark)
+
+    def test_ledger_and_calendar_rebuilds(self):
+        self.assertNotModifiedUntilChange(self.manager, reverse('total-leaves-report'), ledger.rebuild)
+        self.assertNotModifiedUntilChange(self.user, reverse('application-list'), calendar.build)
+
+    def test_etag_depends_on_query_and_user(self):
+        self.client.force_authenticate(user=self.user)
+        etag = self.client.get(reverse('application-list'))['ETag']
+        response = self.client.get(reverse('application-list'), {'page_size': 1}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.client.force_authenticate(user=self.manager)
+        response = self.client.get(reverse('application-list'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+@override_settings(BULK_MAX_ITEMS=5)
+class BulkApplicationTests(TestCase):
+    def setUp(self):
+        cache.dashboard_cache().clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123',
+            name='Test User'
+        )
+        self.manager = User.objects.create_user(
+            username='manager',
+            email='manager@example.com',
+            password='managerpass123',
+            name='Manager User'
+        )
+        self.other_manager = User.objects.create_user(
+            username='other',
+            email='other@example.com',
+            password='otherpass123',
+            name='Other Manager'
+        )
+
+    def item(self, **overrides):
+        return {
+            'leave_type': 'Vacation',
+            'start_date': '2024-01-01',
+            'end_date': '2024-01-05',
+            'reason': 'Test vacation',
+            'manager': self.manager.id,
+            **overrides,
+        }
+
+    def items(self, count, year=2024):
+        return [self.item(start_date=f'{year}-{month:02}-01', end_date=f'{year}-{month:02}-05') for month in range(1, count + 1)]
+
+    def submit(self, items):
+        self.client.force_authenticate(user=self.user)
+        return self.client.post(reverse('application-bulk-create'), items, format='json')
+
+    def decide(self, ids, decision, user=None):
+        self.client.force_authenticate(user=user or self.manager)
+        return self.client.post(reverse('application-bulk-decision'), {'ids': ids, 'status': decision}, format='json')
+
+    def test_bulk_create(self):
+        response = self.submit([self.item(), self.item(leave_type='Sick', start_date='2024-02-01', end_date='2024-02-01')])
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([result['status'] for result in response.data], ['created', 'created'])
+        self.assertEqual(
+            sorted(Application.objects.filter(user=self.user, status=Status.PENDING).values_list('id', flat=True)),
+            sorted(result['id'] for result in response.data),
+        )
+        self.assertEqual(LeaveBalance.objects.get(leave_type=leave_type_named('Vacation')).pending_days, 5)
+
+    def test_bulk_create_reports_invalid_items(self):
+        response = self.submit([self.item(), self.item(manager=9999), self.item(start_date='not a date')])
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual([result['status'] for result in response.data], ['created', 'invalid', 'invalid'])
+        self.assertIn('manager', response.data[1]['errors'])
+        self.assertEqual(Application.objects.count(), 1)
+
+    def test_bulk_create_query_count_is_constant(self):
+        items = self.items(5)
+        self.submit(items[:1])  # creates the ledger row both batches below update
+        with CaptureQueriesContext(connection) as one:
+            self.submit(items[1:2])
+        with CaptureQueriesContext(connection) as many:
+            self.submit(items[2:])
+        self.assertEqual(Application.objects.count(), 5)
+        self.assertEqual(len(one), len(many))
+
+    def test_bulk_create_limits(self):
+        self.assertEqual(self.submit([]).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.submit(self.items(6)).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_create_rejects_overlaps(self):
+        Application.objects.create(
+            user=self.user, leave_type=leave_type_named('Sick'), start_date='2024-01-04', end_date='2024-01-08',
+            reason='Existing', status=Status.APPROVED, manager=self.manager
+        )
+        response = self.submit([
+            self.item(),
+            self.item(start_date='2024-02-01', end_date='2024-02-05'),
+            self.item(start_date='2024-02-05', end_date='2024-02-06'),
+        ])
+        self.assertEqual([result['status'] for result in response.data], ['invalid', 'created', 'invalid'])
+        self.assertIn('application', response.data[0]['errors']['non_field_errors'][0])
+        self.assertIn('item 1', response.data[2]['errors']['non_field_errors'][0])
+
+    def test_bulk_decision(self):
+        ids = [result['id'] for result in self.submit(self.items(3)).data]
+        foreign = Application.objects.create(
+            user=self.user, leave_type=leave_type_named('Sick'), start_date='2024-04-01', end_date='2024-04-01',
+            reason='Other', status=Status.PENDING, manager=self.other_manager
+        )
+        Application.objects.filter(id=ids[2]).update(status=Status.APPROVED)
+        LeaveBalance.objects.all().delete()
+        call_command('rebuild_leave_ledger', stdout=StringIO())
+
+        response = self.decide(ids + [foreign.id, 9999], 'Approved')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([result['status'] for result in response.data], ['updated', 'updated', 'unchanged', 'not_found', 'not_found'])
+        self.assertEqual(Application.objects.filter(manager=self.manager, status=Status.APPROVED).count(), 3)
+        self.assertEqual(Application.objects.get(id=foreign.id).status, Status.PENDING)
+        balance = LeaveBalance.objects.get(manager=self.manager)
+        # 1st-5th of January, February and March 2024: 5 + 3 + 3 working days.
+        self.assertEqual((balance.pending_days, balance.approved_days), (0, 11))
+
+    def test_bulk_decision_invalidates_dashboard(self):
+        ids = [result['id'] for result in self.submit([self.item()]).data]
+        self.client.force_authenticate(user=self.manager)
+        etag = self.client.get(reverse('subordinate-applications-list'))['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.decide(ids, 'Rejected')
+        response = self.client.get(reverse('subordinate-applications-list'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data[0]['status'], 'Rejected')
+
+    def test_bulk_decision_validation(self):
+        self.assertEqual(self.decide([1], 'Maybe').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.decide(list(range(6)), 'Approved').status_code, status.HTTP_400_BAD_REQUEST)
+
+class OverlapDetectionTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123',
+            name='Test User'
+        )
+        self.manager = User.objects.create_user(
+            username='manager',
+            email='manager@example.com',
+            password='managerpass123',
+            name='Manager User'
+        )
+        self.existing = Application.objects.create(
+            user=self.user,
+            leave_type=leave_type_named('Vacation'),
+            start_date='2024-01-10',
+            end_date='2024-01-15',
+            reason='Existing',
+            status=Status.APPROVED,
+            manager=self.manager
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def submit(self, start_date, end_date):
+        return self.client.post(reverse('application-list'), {
+            'leave_type': 'Sick',
+            'start_date': start_date,
+            'end_date': end_date,
+            'reason': 'Test',
+            'manager': self.manager.id,
+            'status': 'Pending'
+        })
+
+    def test_rejects_overlapping_leave(self):
+        response = self.submit('2024-01-15', '2024-01-16')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn(f'application {self.existing.id}', response.data['non_field_errors'][0])
+
+    def test_accepts_adjacent_leave(self):
+        self.assertEqual(self.submit('2024-01-16', '2024-01-16').status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.submit('2024-01-01', '2024-01-09').status_code, status.HTTP_201_CREATED)
+
+    def test_rejected_leave_does_not_block(self):
+        Application.objects.filter(id=self.existing.id).update(status=Status.REJECTED)
+        self.assertEqual(self.submit('2024-01-12', '2024-01-12').status_code, status.HTTP_201_CREATED)
+
+    def test_rejects_inverted_and_overlong_ranges(self):
+        self.assertEqual(self.submit('2024-03-05', '2024-03-01').status_code, status.HTTP_400_BAD_REQUEST)
+        with override_settings(MAX_LEAVE_DAYS=10):
+            self.assertEqual(self.submit('2024-03-01', '2024-03-11').status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_update_ignores_itself(self):
+        pending = Application.objects.create(
+            user=self.user, leave_type=leave_type_named('Sick'), start_date='2024-02-01', end_date='2024-02-02',
+            reason='Test', status=Status.PENDING, manager=self.manager
+        )
+        pending.refresh_from_db()
+        serializer = serializers.ApplicationSerializer(pending, data={'end_date': '2024-02-03'}, partial=True)
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        serializer = serializers.ApplicationSerializer(pending, data={'start_date': '2024-01-14'}, partial=True)
+        self.assertFalse(serializer.is_valid())
+
+    def test_reactivating_rejected_leave_is_checked(self):
+        rejected = Application.objects.create(
+            user=self.user, leave_type=leave_type_named('Sick'), start_date='2024-01-12', end_date='2024-01-12',
+            reason='Test', status=Status.REJECTED, manager=self.manager
+        )
+        serializer = serializers.ApplicationSerializer(rejected, data={'reason': 'Edited'}, partial=True)
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        self.client.force_authenticate(user=self.manager)
+        response = self.client.patch(reverse('application-detail', args=[rejected.id]), {'status': 'Approved'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn(f'application {self.existing.id}', response.data['non_field_errors'][0])
+
+        response = self.client.post(reverse('application-bulk-decision'), {'ids': [rejected.id], 'status': 'Pending'}, format='json')
+        self.assertEqual(response.data, [{'id': rejected.id, 'status': 'overlaps'}])
+        self.assertEqual(Application.objects.get(id=rejected.id).status, Status.REJECTED)
+
+    def test_overlap_query_uses_bounded_index_range(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.submit('2024-06-01', '2024-06-02')
+        sql = next(query['sql'] for query in queries if 'users_application' in query['sql'] and 'start_date' in query['sql'])
+        plan = explain(sql)
+        if connection.vendor == 'sqlite':
+            self.assertIn('application_user_start', plan)
+
+    def test_team_conflicts(self):
+        colleague = User.objects.create_user(
+            username='colleague', email='colleague@example.com', password='colleaguepass123', name='Colleague'
+        )
+        for start_date, end_date, leave_status in [
+            ('2024-01-14', '2024-01-20', Status.PENDING),
+            ('2024-01-01', '2024-01-31', Status.REJECTED),
+            ('2024-02-01', '2024-02-03', Status.APPROVED),
+        ]:
+            Application.objects.create(
+                user=colleague, leave_type=leave_type_named('Vacation'), start_date=start_date, end_date=end_date,
+                reason='Test', status=leave_status, manager=self.manager
+            )
+        self.client.force_authenticate(user=self.manager)
+        response = self.client.get(reverse('team-conflicts'), {'start': '2024-01-01', 'end': '2024-01-14'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 1)
+        self.assertEqual(response.data[0]['start_date'], '2024-01-14')
+        self.assertEqual(response.data[0]['end_date'], '2024-01-14')
+        self.assertEqual(response.data[0]['employees'], ['Test User', 'Colleague'])
+
+        response = self.client.get(reverse('team-conflicts'), {'start': '2024-01-31', 'end': '2024-01-01'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+@contextmanager
+def file_database():
+    """
+    Point the default connection at a file copy of an in-memory SQLite test database, so threads
+    open their own connections and lock the way a served database does; the in-memory one only has
+    shared-cache table locks. Other databases are shared between connections as they are.
+    """
+    if connection.vendor != 'sqlite' or not connection.is_in_memory_db():
+        yield
+        return
+    connection.ensure_connection()
+    memory, name = connection.connection, connection.settings_dict['NAME']
+    path = os.path.join(tempfile.mkdtemp(), 'concurrency.sqlite3')
+    target = sqlite3.connect(path)
+    memory.backup(target)
+    target.close()
+    # Closing the in-memory connection would drop the test database; set it aside instead.
+    connection.connection = None
+    connection.settings_dict['NAME'] = settings.DATABASES['default']['NAME'] = path
+    try:
+        yield
+    finally:
+        connection.close()
+        connection.settings_dict['NAME'] = settings.DATABASES['default']['NAME'] = name
+        connection.connection = memory
+
+class ConcurrentBookingTests(TransactionTestCase):
+    """Requests racing on real transactions, each thread on its own database connection."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', email='test@example.com', password='testpass123', name='Test User')
+        self.manager = User.objects.create_user(username='manager', email='manager@example.com', password='managerpass123', name='Manager User')
+        leave_type_named('Sick')
+
+    def race(self, requests):
+        barrier = threading.Barrier(len(requests))
+        responses = [None] * len(requests)
+
+        def run(index, url, data):
+            # A "database is locked" error comes back as a 500 instead of ending the thread.
+            client = APIClient(raise_request_exception=False)
+            client.force_authenticate(user=self.user)
+            barrier.wait()
+            try:
+                responses[index] = client.post(url, data, format='json')
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=run, args=[index, *request]) for index, request in enumerate(requests)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return [response.status_code for response in responses]
+
+    def test_one_of_overlapping_submissions_wins(self):
+        with file_database():
+            codes = self.race([
+                (reverse('application-list'), self.item('2024-02-06')),
+                (reverse('application-list'), self.item('2024-02-06')),
+                (reverse('application-bulk-create'), [self.item('2024-02-06')]),
+                (reverse('application-bulk-create'), [self.item('2024-02-06')]),
+            ])
+            self.assertEqual(sorted(codes), [201, 400, 400, 400])
+            self.assertEqual(Application.objects.count(), 1)
+            self.assertEqual(ledger.differences(), [])
+
+    def test_separate_submissions_all_succeed(self):
+        with file_database():
+            codes = self.race([(reverse('application-list'), self.item(f'2024-02-{day:02}')) for day in range(5, 9)])
+            self.assertEqual(codes, [201] * 4)
+            self.assertEqual(ledger.differences(), [])
+
+    def item(self, start_date):
+        return {
+            'leave_type': 'Sick', 'start_date': start_date, 'end_date': start_date,
+            'reason': 'Test', 'manager': self.manager.id, 'status': 'Pending',
+        }
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123',
+            name='Test User'
+        )
+        self.manager = User.objects.create_user(
+            username='manager',
+            email='manager@example.com',
+            password='managerpass123',
+            name='Manager User'
+        )
+        self.other_manager = User.objects.create_user(
+            username='other',
+            email='other@example.com',
+            password='otherpass123',
+            name='Other Manager'
+        )
+        for start_date, end_date, leave_status, manager in [
+            ('2023-12-28', '2024-01-02', Status.APPROVED, self.manager),
+            ('2024-03-04', '2024-03-05', Status.PENDING, self.manager),
+            ('2024-05-06', '2024-05-06', Status.REJECTED, self.other_manager),
+        ]:
+            Application.objects.create(
+                user=self.user, leave_type=leave_type_named('Vacation'), start_date=start_date, end_date=end_date,
+                reason='Test, with "quotes"', status=leave_status, manager=manager
+            )
+
+    def export(self, name, user, **params):
+        self.client.force_authenticate(user=user)
+        response = self.client.get(reverse(name), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response, b''.join(response.streaming_content).decode()
+
+    def test_applications_csv(self):
+        response, body = self.export('export-applications', self.user, year=2024)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        rows = list(csv.DictReader(StringIO(body)))
+        self.assertEqual([row['start_date'] for row in rows], ['2024-03-04', '2024-05-06'])
+        self.assertEqual(rows[0]['reason'], 'Test, with "quotes"')
+        self.assertEqual(rows[0]['employee_name'], 'Test User')
+
+    def test_applications_ndjson_scoped_to_manager(self):
+        response, body = self.export('export-applications', self.manager, output='ndjson')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([row['status'] for row in rows], ['Approved', 'Pending'])
+
+    def test_staff_can_filter_by_manager(self):
+        self.other_manager.is_staff = True
+        _, body = self.export('export-applications', self.other_manager, output='ndjson', manager=self.manager.id)
+        self.assertEqual(len(body.splitlines()), 2)
+
+    def test_date_range(self):
+        _, body = self.export('export-applications', self.user, start='2024-01-01', end='2024-03-31')
+        self.assertEqual(len(list(csv.DictReader(StringIO(body)))), 1)
+
+    def test_leave_report(self):
+        _, body = self.export('export-leave-report', self.manager, output='ndjson')
+        self.assertEqual([json.loads(line) for line in body.splitlines()], [{
+            'employee_id': self.user.id, 'employee_name': 'Test User', 'leave_type': 'Vacation',
+            'total_days': 6, 'pending_days': 2, 'approved_days': 4, 'rejected_days': 0,
+        }])
+
+    async def test_streams_chunks_under_asgi(self):
+        headers = {'Authorization': f'Bearer {tokens_for_user(self.manager).access_token}'}
+        response = await self.async_client.get(reverse('export-applications'), {'output': 'ndjson'}, headers=headers)
+        self.assertTrue(response.is_async)
+        body = b''.join([chunk async for chunk in response.streaming_content]).decode()
+        self.assertEqual([json.loads(line)['status'] for line in body.splitlines()], ['Approved', 'Pending'])
+
+    def test_invalid_filters(self):
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(reverse('export-applications'), {'year': 2024, 'start': '2024-01-01'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(reverse('export-applications'), {'output': 'xml'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+class LeaveAnalyticsTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123',
+            name='Test User'
+        )
+        self.manager = User.objects.create_user(
+            username='manager',
+            email='manager@example.com',
+            password='managerpass123',
+            name='Manager User'
+        )
+        # Thursday 2023-12-28 to Tuesday 2024-01-02: 6 days, 4 of them working days.
+        Application.objects.create(
+            user=self.user, leave_type=leave_type_named('Annual'), start_date='2023-12-28', end_date='2024-01-02',
+            reason='Holidays', status=Status.APPROVED, manager=self.manager
+        )
+        Application.objects.create(
+            user=self.user, leave_type=leave_type_named('Sick'), start_date='2024-01-31', end_date='2024-02-01',
+            reason='Flu', status=Status.PENDING, manager=self.manager
+        )
+        self.client.force_authenticate(user=self.manager)
+
+    def analytics(self, **params):
+        response = self.client.get(reverse('leave-analytics'), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        return [dict(row) for row in response.data]
+
+    def test_clips_to_range_and_splits_months(self):
+        rows = self.analytics(start='2024-01-01', end='2024-12-31', group_by='month,leave_type')
+        self.assertEqual(rows, [
+            {'month': '2024-01', 'leave_type': 'Annual', 'days': 2, 'working_days': 2},
+            {'month': '2024-01', 'leave_type': 'Sick', 'days': 1, 'working_days': 1},
+            {'month': '2024-02', 'leave_type': 'Sick', 'days': 1, 'working_days': 1},
+        ])
+
+    def test_multi_year_by_status_and_employee(self):
+        rows = self.analytics(start='2023-01-01', end='2024-12-31', group_by='employee,status')
+        self.assertEqual(rows, [
+            {'employee_id': self.user.id, 'employee_name': 'Test User', 'status': 'Pending', 'days': 2, 'working_days': 2},
+            {'employee_id': self.user.id, 'employee_name': 'Test User', 'status': 'Approved', 'days': 6, 'working_days': 4},
+        ])
+
+    def test_scoped_to_manager(self):
+        self.client.force_authenticate(user=self.user)
+        self.assertEqual(self.analytics(start='2023-01-01', end='2024-12-31'), [])
+
+    def test_single_query(self):
+        with self.assertNumQueries(1):
+            self.client.get(reverse('leave-analytics'), {'start': '2023-01-01', 'end': '2024-12-31', 'group_by': 'month'})
+
+    def test_invalid_parameters(self):
+        for params in [{'group_by': 'weekday'}, {'start': '2024-02-01', 'end': '2024-01-01'}, {'start': '1990-01-01', 'end': '1990-12-31'}]:
+            response = self.client.get(reverse('leave-analytics'), params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+@override_settings(LEAVE_CALENDAR_FIRST_YEAR=2023, LEAVE_CALENDAR_LAST_YEAR=2025)
+class WorkingDayCalendarTests(TestCase):
+    def setUp(self):
+        calendar.reset()
+        self.addCleanup(calendar.reset)
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123',
+            name='Test User'
+        )
+        self.manager = User.objects.create_user(
+            username='manager',
+            email='manager@example.com',
+            password='managerpass123',
+            name='Manager User'
+        )
+
+    def test_counts_weekdays_and_holidays(self):
+        days = calendar.WorkingDayCalendar(date(2024, 1, 1), date(2024, 12, 31), [5, 6], [date(2024, 1, 1)])
+        self.assertEqual(days.working_days(date(2024, 1, 1), date(2024, 1, 7)), 4)
+        self.assertEqual(days.working_days(date(2024, 1, 6), date(2024, 1, 7)), 0)
+        self.assertEqual(days.working_days(date(2024, 1, 5), date(2024, 1, 4)), 0)
+        # Outside the precomputed range days are counted one by one.
+        self.assertEqual(days.working_days(date(2023, 12, 29), date(2024, 1, 2)), 2)
+
+    @override_settings(LEAVE_WEEKEND_DAYS=[4, 5], LEAVE_CALENDAR_REGION='AE')
+    def test_region_and_weekend_settings(self):
+        Holiday.objects.create(region='AE', date=date(2024, 4, 10), name='Eid al-Fitr')
+        Holiday.objects.create(region='', date=date(2024, 4, 8), name='Other region')
+        # Sunday 2024-04-07 to Saturday 2024-04-13, Friday and Saturday off.
+        self.assertEqual(calendar.working_days(date(2024, 4, 7), date(2024, 4, 13)), 4)
+
+    def test_build_calendar_recounts_ledger_and_reports(self):
+        application = Application.objects.create(
+            user=self.user, leave_type=leave_type_named('Annual'), start_date='2024-12-23', end_date='2024-12-27',
+            reason='Christmas', status=Status.APPROVED, manager=self.manager
+        )
+        self.assertEqual(LeaveBalance.objects.get().approved_days, 5)
+
+        Holiday.objects.create(date=date(2024, 12, 25), name='Christmas Day')
+        Holiday.objects.create(date=date(2024, 12, 26), name='Boxing Day')
+        call_command('build_calendar', stdout=StringIO())
+
+        self.assertEqual(LeaveBalance.objects.get().approved_days, 3)
+        self.assertFalse(CalendarDay.objects.get(date=date(2024, 12, 25)).is_working_day)
+        # Every day covers() accepts leave on has a row.
+        first, last = calendar.configured_range()
+        self.assertEqual(CalendarDay.objects.count(), (last - first).days + 1)
+        self.assertEqual(list(CalendarDay.objects.aggregate(Min('date'), Max('date')).values()), [first, last])
+        totals = list(reports.leave_totals(Application.objects.filter(id=application.id), 'leave_type'))
+        self.assertEqual(totals[0]['total_days'], 3)
+        analytics = reports.leave_analytics(date(2024, 12, 1), date(2024, 12, 31), ['leave_type'])
+        self.assertEqual(analytics, [{'leave_type': 'Annual', 'days': 5, 'working_days': 3}])
+
+    def test_rejects_leave_outside_calendar(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        response = self.client.post(reverse('application-list'), {
+            'leave_type': 'Annual', 'start_date': '2026-01-05', 'end_date': '2026-01-09',
+            'reason': 'Test', 'manager': self.manager.id, 'status': 'Pending',
+        })
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(LeaveBalance.objects.exists())
+
+    def test_rebuild_elsewhere_refreshes_calendar(self):
+        self.assertEqual(calendar.working_days(date(2024, 12, 23), date(2024, 12, 27)), 5)
+        Holiday.objects.create(date=date(2024, 12, 25), name='Christmas Day')
+        self.assertEqual(calendar.working_days(date(2024, 12, 23), date(2024, 12, 27)), 5)
+        # What build_calendar in another process leaves behind in the shared cache.
+        cache.dashboard_cache().set('calendar:version', 0, timeout=None)
+        self.assertEqual(calendar.working_days(date(2024, 12, 23), date(2024, 12, 27)), 4)
+
+    def test_post_migrate_skips_calendar_before_its_migrations(self):
+        from django.db.migrations.loader import MigrationLoader
+        from .signals import build_calendar
+        CalendarDay.objects.all().delete()
+        state = MigrationLoader(connection).project_state(('users', '0003_alter_application_options_remove_user_manager'))
+        with self.assertNumQueries(0):
+            build_calendar(sender=None, apps=state.apps)
+        state = MigrationLoader(connection).project_state(('users', '0008_calendarday'))
+        with self.assertNumQueries(0):
+            build_calendar(sender=None, apps=state.apps)
+        build_calendar(sender=None)
+        self.assertTrue(CalendarDay.objects.exists())
+
+    def test_ledger_uses_working_days(self):
+        # Friday to Monday.
+        Application.objects.create(
+            user=self.user, leave_type=leave_type_named('Annual'), start_date='2024-03-01', end_date='2024-03-04',
+            reason='Long weekend', status=Status.PENDING, manager=self.manager
+        )
+        self.assertEqual(LeaveBalance.objects.get().pending_days, 2)
+        self.assertEqual(ledger.differences(), [])
+
+class OrgHierarchyTests(TestCase):
+    def setUp(self):
+        cache.dashboard_cache().clear()
+        self.client = APIClient()
+        self.head = self.create_user('head')
+        self.lead = self.create_user('lead', reports_to=self.head)
+        self.employee = self.create_user('employee', reports_to=self.lead)
+        self.monday = first_monday(timezone.now().year, 3)
+        self.apply(self.employee, self.lead)
+        self.apply(self.lead, self.head, leave_type='Sick')
+        self.client.force_authenticate(user=self.head)
+
+    def create_user(self, username, reports_to=None):
+        return User.objects.create_user(
+            username=username, email=f'{username}@example.com', password='testpass123',
+            name=username.title(), reports_to=reports_to
+        )
+
+    def apply(self, user, manager, leave_type='Vacation', weeks=0):
+        start_date = self.monday + timedelta(weeks=weeks)
+        return Application.objects.create(
+            user=user, leave_type=leave_type_named(leave_type), start_date=start_date, end_date=start_date + timedelta(days=1),
+            reason='Test', status=Status.APPROVED, manager=manager
+        )
+
+    def subtree_list(self):
+        return self.client.get(reverse('subordinate-applications-list'), {'scope': 'subtree'})
+
+    def test_subtree_includes_indirect_reports(self):
+        direct = self.client.get(reverse('subordinate-applications-list'))
+        self.assertEqual([row['user']['name'] for row in direct.data], ['Lead'])
+        response = self.subtree_list()
+        self.assertEqual([row['user']['name'] for row in response.data], ['Lead', 'Employee'])
+
+    def test_subtree_query_count_is_independent_of_depth(self):
+        with CaptureQueriesContext(connection) as shallow:
+            self.subtree_list()
+        boss = self.employee
+        for level in range(8):
+            boss = self.create_user(f'level{level}', reports_to=boss)
+            self.apply(boss, self.lead, weeks=level + 1)
+        cache.dashboard_cache().clear()
+        with CaptureQueriesContext(connection) as deep:
+            response = self.subtree_list()
+        self.assertEqual(len(response.data), 10)
+        self.assertEqual(len(shallow), len(deep))
+
+    def test_subtree_report_sums_across_managers(self):
+        self.apply(self.employee, self.head, weeks=1)
+        response = self.client.get(reverse('total-leaves-report'), {'scope': 'subtree'})
+        self.assertEqual(response.data, [
+            {'employee_name': 'Lead', 'leave_types': [
+                {'leave_type': 'Sick', 'total_days': 2, 'pending_days': 0, 'approved_days': 2, 'rejected_days': 0},
+            ]},
+            {'employee_name': 'Employee', 'leave_types': [
+                {'leave_type': 'Vacation', 'total_days': 4, 'pending_days': 0, 'approved_days': 4, 'rejected_days': 0},
+            ]},
+        ])
+        direct = self.client.get(reverse('total-leaves-report'))
+        self.assertEqual([row['employee_name'] for row in direct.data], ['Lead', 'Employee'])
+
+    def test_indirect_change_invalidates_subtree_views(self):
+        etag = self.subtree_list()['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.apply(self.employee, self.lead, weeks=1)
+        response = self.subtree_list()
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(len(response.data), 3)
+
+    def test_reporting_line_change_invalidates_subtree_views(self):
+        self.assertEqual(len(self.subtree_list().data), 2)
+        other = self.create_user('other')
+        other.is_staff = True
+        self.client.force_authenticate(user=other)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(reverse('user-detail', args=[self.lead.id]), {'reports_to': other.id})
+        self.client.force_authenticate(user=self.head)
+        self.assertEqual(self.subtree_list().data, [])
+
+    def test_only_staff_set_reporting_lines(self):
+        intruder = self.create_user('intruder')
+        self.client.force_authenticate(user=intruder)
+        response = self.client.patch(reverse('user-detail', args=[self.employee.id]), {'reports_to': intruder.id})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(User.objects.get(pk=self.employee.pk).reports_to_id, self.lead.id)
+
+        self.client.logout()
+        response = self.client.post(reverse('user-list'), {
+            'username': 'newcomer', 'name': 'Newcomer', 'email': 'newcomer@example.com',
+            'password': 'newcomerpass123', 'reports_to': self.employee.id,
+        })
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertIsNone(User.objects.get(username='newcomer').reports_to_id)
+
+    def test_rejects_cycles(self):
+        self.head.is_staff = True
+        url = reverse('user-detail', args=[self.head.id])
+        for reports_to in [self.head, self.employee]:
+            response = self.client.patch(url, {'reports_to': reports_to.id})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn('reports_to', response.data)
+        self.assertEqual(self.client.patch(url, {'reports_to': ''}).status_code, status.HTTP_200_OK)
+
+    def test_invalid_scope(self):
+        response = self.client.get(reverse('total-leaves-report'), {'scope': 'everyone'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+class RequestMetricsTests(TestCase):
+    def setUp(self):
+        instrumentation.reset()
+        self.addCleanup(instrumentation.reset)
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123',
+            name='Test User'
+        )
+        self.admin = User.objects.create_user(
+            username='admin',
+            email='admin@example.com',
+            password='adminpass123',
+            name='Admin User',
+            is_staff=True
+        )
+        Application.objects.create(
+            user=self.user, leave_type=leave_type_named('Vacation'), start_date='2024-01-01', end_date='2024-01-05',
+            reason='Test vacation', status=Status.PENDING, manager=self.admin
+        )
+
+    def test_records_route_histograms(self):
+        self.client.force_authenticate(user=self.user)
+        self.client.get(reverse('application-list'))
+        self.client.get(reverse('application-list'))
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.get(reverse('request-metrics'))
+        route = response.data['routes']['application-list']
+        self.assertEqual(route['request_seconds']['count'], 2)
+        self.assertEqual(route['queries']['buckets']['+Inf'], 2)
+        self.assertGreater(route['queries']['sum'], 0)
+        self.assertGreater(route['serialize_seconds']['sum'], 0)
+        self.assertGreater(route['render_seconds']['sum'], 0)
+        self.assertEqual(route['over_budget'], 0)
+
+    def test_prometheus_text(self):
+        self.client.force_authenticate(user=self.admin)
+        self.client.get(reverse('subordinate-applications-list'))
+        response = self.client.get(reverse('prometheus-metrics'))
+        self.assertEqual(response['Content-Type'], 'text/plain; version=0.0.4')
+        body = response.content.decode()
+        self.assertIn('# TYPE quickleave_request_seconds histogram', body)
+        self.assertIn('quickleave_queries_count{route="subordinate-applications-list"} 1', body)
+        self.assertIn('quickleave_queries_bucket{route="subordinate-applications-list",le="+Inf"} 1', body)
+        self.assertIn('quickleave_dashboard_cache_total{result="misses"}', body)
+
+    @override_settings(REQUEST_QUERY_BUDGET=1)
+    def test_flags_requests_over_query_budget(self):
+        self.client.force_authenticate(user=self.user)
+        with self.assertLogs('users.instrumentation', 'WARNING'):
+            response = self.client.get(reverse('application-list'))
+        self.assertEqual(response['X-Query-Budget-Exceeded'], '2/1')
+        self.assertEqual(instrumentation.snapshot()['application-list']['over_budget'], 1)
+
+    def test_admin_only(self):
+        self.client.force_authenticate(user=self.user)
+        for name in ['request-metrics', 'prometheus-metrics']:
+            self.assertEqual(self.client.get(reverse(name)).status_code, status.HTTP_403_FORBIDDEN)
+
+# Volumes seeded by the query budget harness; raise or lower them through the environment.
+PERF_EMPLOYEES = int(os.getenv('PERF_EMPLOYEES', 1000))
+PERF_MANAGERS = int(os.getenv('PERF_MANAGERS', 50))
+PERF_APPLICATIONS = int(os.getenv('PERF_APPLICATIONS', 100000))
+# Multiplies every response time budget, for slow CI machines.
+PERF_TIME_SCALE = float(os.getenv('PERF_TIME_SCALE', 1))
+
+class QueryBudgetTests(TestCase):
+    """
+    Every route in users.urls against a seeded organisation, authenticated with real JWTs.
+    Query budgets do not depend on the seeded volume, so a change that adds per-row queries
+    fails here long before it is noticed in production.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        managers, employees = seed.seed(
+            employees=PERF_EMPLOYEES, managers=PERF_MANAGERS, applications=PERF_APPLICATIONS,
+            years=(timezone.now().year - 1, timezone.now().year),
+        )
+        cls.head = managers[0]
+        cls.manager = managers[1]
+        cls.employee = employees[1]
+        cls.admin = User.objects.create_user(
+            username='admin', email='admin@example.com', password='adminpass123', name='Admin User', is_staff=True
+        )
+
+    def setUp(self):
+        cache.dashboard_cache().clear()
+        # A running server has the working-day calendar loaded; its one-off load is not a per-request cost.
+        calendar.get_calendar()
+        self.client = APIClient()
+
+    def authenticate(self, user):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {tokens_for_user(user).access_token}' if user else '')
+
+    def cases(self):
+        """(url name, label, user, method, url, data, query budget, seconds budget) for every route."""
+        year = timezone.now().year
+        refresh = tokens_for_user(self.employee)
+        pending = Application.objects.filter(manager=self.manager, status=Status.PENDING)
+        application = pending.first()
+        window = {'start': f'{year}-03-01', 'end': f'{year}-03-31'}
+        new_leave = {'leave_type': 'Annual', 'start_date': '2030-03-04', 'end_date': '2030-03-05', 'reason': 'Budget test', 'status': 'Pending', 'manager': self.manager.id}
+        bulk = [dict(new_leave, start_date=f'2031-{month:02}-03', end_date=f'2031-{month:02}-04') for month in range(1, 13)]
+        job = ReportJob.objects.create(manager=self.manager, scope='direct', year=year, status=JobStatus.DONE, result=[])
+        return [
+            ('user-list', 'users', self.manager, 'get', reverse('user-list'), None, 1, 2),
+            ('user-detail', 'user', self.manager, 'get', reverse('user-detail', args=[self.employee.id]), None, 1, 0.5),
+            ('signin', 'signin', None, 'post', reverse('signin'), {'username': self.employee.username, 'password': 'seedpass123'}, 1, 2),
+            ('token_refresh', 'refresh', None, 'post', reverse('token_refresh'), {'refresh': str(refresh)}, 1, 0.5),
+            ('token_verify', 'verify', None, 'post', reverse('token_verify'), {'token': str(refresh.access_token)}, 0, 0.5),
+            ('application-list', 'own applications', self.employee, 'get', reverse('application-list'), None, 2, 1),
+            ('application-list', 'apply', self.employee, 'post', reverse('application-list'), new_leave, 15, 1),
+            ('application-detail', 'application', application.user, 'get', reverse('application-detail', args=[application.id]), None, 1, 0.5),
+            ('application-detail', 'decide', self.manager, 'patch', reverse('application-detail', args=[application.id]), {'status': 'Approved'}, 9, 1),
+            ('application-bulk-create', 'bulk apply', self.employee, 'post', reverse('application-bulk-create'), bulk, 15, 1),
+            ('application-bulk-decision', 'bulk decide', self.manager, 'post', reverse('application-bulk-decision'), {'ids': list(pending.values_list('id', flat=True)[:50]), 'status': 'Rejected'}, 10, 1),
+            ('subordinate-applications-list', 'direct reports', self.manager, 'get', reverse('subordinate-applications-list'), None, 2, 3),
+            ('subordinate-applications-list', 'subtree page', self.head, 'get', reverse('subordinate-applications-list'), {'scope': 'subtree', 'page_size': 100}, 2, 1),
+            ('total-leaves-report', 'report', self.manager, 'get', reverse('total-leaves-report'), None, 3, 1),
+            ('total-leaves-report', 'subtree report', self.head, 'get', reverse('total-leaves-report'), {'scope': 'subtree'}, 3, 2),
+            ('report-job-start', 'start report job', self.head, 'post', reverse('report-job-start') + '?scope=subtree', None, 2, 0.5),
+            ('report-job-detail', 'report job', self.manager, 'get', reverse('report-job-detail', args=[job.id]), None, 1, 0.5),
+            ('report-job-result', 'report job result', self.manager, 'get', reverse('report-job-result', args=[job.id]), None, 1, 0.5),
+            ('leave-analytics', 'analytics', self.head, 'get', reverse('leave-analytics'), {'group_by': 'month,employee'}, 1, 3),
+            ('team-conflicts', 'conflicts', self.manager, 'get', reverse('team-conflicts'), window, 1, 1),
+            ('export-applications', 'export', self.manager, 'get', reverse('export-applications'), {'year': year}, 1, 3),
+            ('export-leave-report', 'leave report export', self.manager, 'get', reverse('export-leave-report'), {'output': 'ndjson'}, 1, 1),
+            ('cache-stats', 'cache stats', self.admin, 'get', reverse('cache-stats'), None, 0, 0.5),
+            ('request-metrics', 'metrics', self.admin, 'get', reverse('request-metrics'), None, 0, 0.5),
+            ('prometheus-metrics', 'prometheus', self.admin, 'get', reverse('prometheus-metrics'), None, 0, 0.5),
+        ]
+
+    def test_every_route_has_a_budget(self):
+        # The event stream never ends; ApplicationEventTests covers it.
+        routes = {pattern.name for pattern in urls.urlpatterns} - {'application-events'}
+        self.assertEqual({case[0] for case in self.cases()}, routes)
+
+    def test_query_and_time_budgets(self):
+        for name, label, user, method, url, data, max_queries, max_seconds in self.cases():
+            with self.subTest(label):
+                self.authenticate(user)
+                started = time.perf_counter()
+                with CaptureQueriesContext(connection) as queries:
+                    response = getattr(self.client, method)(url, data, format='json' if method != 'get' else None)
+                    if response.streaming:
+                        b''.join(response.streaming_content)
+                elapsed = time.perf_counter() - started
+                self.assertLess(response.status_code, 300, getattr(response, 'data', None))
+                self.assertLessEqual(len(queries), max_queries, '\n'.join(query['sql'] for query in queries.captured_queries))
+                self.assertLessEqual(elapsed, max_seconds * PERF_TIME_SCALE)
+        # The writes above kept the ledger in step with the applications.
+        self.assertEqual(ledger.differences(), [])
+
+class LoadTestSummaryTests(TestCase):
+    def test_percentiles_and_throughput(self):
+        results = loadtest.Results()
+        for i in range(1, 101):
+            results.add('applications list', i / 1000, 200)
+        results.add('signin', 0.5, 401)
+        summary = loadtest.summarize(results, elapsed=10)
+        listing = summary['endpoints']['applications list']
+        self.assertEqual((listing['p50_ms'], listing['p95_ms'], listing['p99_ms'], listing['max_ms']), (50, 95, 99, 100))
+        self.assertEqual(listing['throughput_rps'], 10)
+        self.assertEqual(summary['endpoints']['signin']['errors'], 1)
+        self.assertEqual(summary['total']['requests'], 101)
+        self.assertEqual(summary['total']['statuses'], {'200': 100, '401': 1})
+
+class SerializationBenchmarkTests(TestCase):
+    def test_reports_query_counts(self):
+        out = StringIO()
+        call_command('bench_serialization', rows=20, repeat=1, stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertTrue(lines[1].startswith('ApplicationSerializer + select_related'))
+        self.assertTrue(lines[1].endswith(' 1 queries'), lines[1])
+        self.assertTrue(lines[2].endswith(' 1 queries'), lines[2])
+        self.assertFalse(Application.objects.exists())
+
+class ConnectionBenchmarkTests(TestCase):
+    def test_reports_every_connection_mode(self):
+        User.objects.create_user(username='testuser', email='test@example.com', password='testpass123', name='Test User')
+        max_age = connection.settings_dict['CONN_MAX_AGE']
+        out = StringIO()
+        call_command('bench_connections', requests=3, warmup=1, stdout=out)
+        output = out.getvalue()
+        for mode in ['new connection per request', 'persistent', 'persistent + health checks']:
+            self.assertIn(mode, output)
+        self.assertIn('Opening a connection adds', output)
+        self.assertEqual(connection.settings_dict['CONN_MAX_AGE'], max_age)
+
+    def test_needs_a_user(self):
+        with self.assertRaises(CommandError):
+            call_command('bench_connections', requests=1, stdout=StringIO())
+
+@override_settings(SIGNIN_THROTTLE_RATES={'username': '3/minute', 'address': '100/minute'})
+class SignInPipelineTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123',
+            name='Test User'
+        )
+        throttling.reset()
+        backends.reset()
+
+    def tearDown(self):
+        backends.reset()
+
+    def sign_in(self, username='testuser', password='testpass123'):
+        return self.client.post(reverse('signin'), {'username': username, 'password': password})
+
+    def test_rehashes_at_the_configured_cost(self):
+        self.assertFalse(self.user.password.startswith('pbkdf2_sha256$1000$'))
+        with override_settings(PASSWORD_HASH_ITERATIONS=1000):
+            self.assertEqual(self.sign_in().status_code, status.HTTP_200_OK)
+            self.user.refresh_from_db()
+            self.assertTrue(self.user.password.startswith('pbkdf2_sha256$1000$'))
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self.sign_in().status_code, status.HTTP_200_OK)
+            self.assertEqual(len(queries), 1)
+        self.assertEqual(self.sign_in('testuser', 'wrong').status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_failed_attempts_are_throttled_per_username(self):
+        for _ in range(3):
+            self.assertEqual(self.sign_in(password='wrong').status_code, status.HTTP_401_UNAUTHORIZED)
+        response = self.sign_in()
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertGreater(int(response['Retry-After']), 0)
+        self.assertEqual(self.sign_in('TestUser ', 'wrong').status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(self.sign_in('someone', 'wrong').status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(SIGNIN_THROTTLE_RATES={'username': None, 'address': '2/minute'})
+    def test_failed_attempts_are_throttled_per_address(self):
+        for _ in range(3):
+            self.assertEqual(self.sign_in().status_code, status.HTTP_200_OK)
+        self.sign_in('first', 'wrong')
+        self.sign_in('second', 'wrong')
+        self.assertEqual(self.sign_in().status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        response = self.client.post(reverse('signin'), {'username': 'testuser', 'password': 'testpass123'}, REMOTE_ADDR='10.0.0.2')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_token_bucket_refills(self):
+        bucket = throttling.TokenBucket(2, 0.2)
+        bucket.take('key')
+        bucket.take('key')
+        self.assertGreater(bucket.wait('key'), 0)
+        time.sleep(0.15)
+        self.assertEqual(bucket.wait('key'), 0)
+
+    @override_settings(SIGNIN_HASH_WORKERS=1, SIGNIN_HASH_QUEUE=0)
+    def test_full_hashing_pool_answers_busy(self):
+        _, slots = backends._executor()
+        slots.acquire()
+        try:
+            response = self.sign_in()
+        finally:
+            slots.release()
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertEqual(self.sign_in().status_code, status.HTTP_200_OK)
+
+class AsyncViewTests(TestCase):
+    def setUp(self):
+        cache.dashboard_cache().clear()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123',
+            name='Test User'
+        )
+        self.manager = User.objects.create_user(
+            username='manager',
+            email='manager@example.com',
+            password='managerpass123',
+            name='Manager User'
+        )
+        monday = first_monday(timezone.now().year, 3)
+        for weeks in range(3):
+            Application.objects.create(
+                user=self.user, leave_type=leave_type_named('Vacation'), start_date=monday + timedelta(weeks=weeks),
+                end_date=monday + timedelta(weeks=weeks, days=1), reason='Test', status=Status.PENDING, manager=self.manager
+            )
+        self.urls = [reverse(name) for name in ['user-list', 'application-list', 'subordinate-applications-list', 'total-leaves-report']]
+
+    def headers(self, user):
+        return {'Authorization': f'Bearer {tokens_for_user(user).access_token}'}
+
+    def test_read_heavy_routes_are_coroutines(self):
+        for url in self.urls:
+            self.assertTrue(asyncio.iscoroutinefunction(resolve(url).func), url)
+
+    async def test_concurrent_dashboard_polls(self):
+        responses = await asyncio.gather(*(
+            self.async_client.get(url, headers=self.headers(self.manager)) for url in self.urls[2:] for _ in range(3)
+        ))
+        self.assertEqual([response.status_code for response in responses], [200] * 6)
+        self.assertEqual(len(json.loads(responses[0].content)), 3)
+        self.assertEqual(json.loads(responses[3].content)[0]['leave_types'][0]['pending_days'], 6)
+
+    async def test_matches_sync_payloads(self):
+        response = await self.async_client.get(reverse('application-list'), {'page_size': 2}, headers=self.headers(self.user))
+        self.assertEqual(response.status_code, 200)
+        page = json.loads(response.content)
+        self.assertEqual(len(page['results']), 2)
+        self.assertIsNotNone(page['next'])
+        response = await self.async_client.get(reverse('user-list'), headers=self.headers(self.user))
+        self.assertEqual([user['username'] for user in json.loads(response.content)], ['manager'])
+        response = await self.async_client.get(reverse('total-leaves-report'))
+        self.assertEqual(response.status_code, 401)
+
+    async def test_tokens_without_profile_claims_are_refused(self):
+        # user-list reads request.user.is_staff; such tokens must not reach the database from the event loop.
+        token = RefreshToken.for_user(self.user).access_token
+        response = await self.async_client.get(reverse('user-list'), headers={'Authorization': f'Bearer {token}'})
+        self.assertEqual(response.status_code, 401)
+
+    def test_other_methods_stay_synchronous(self):
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        response = client.post(reverse('application-list'), {
+            'leave_type': 'Sick', 'start_date': '2030-01-07', 'end_date': '2030-01-07',
+            'reason': 'Flu', 'status': 'Pending', 'manager': self.manager.id,
+        })
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(client.head(reverse('application-list')).status_code, status.HTTP_200_OK)
+
+@override_settings(EVENTS_KEEPALIVE_SECONDS=5)
+class ApplicationEventTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123',
+            name='Test User'
+        )
+        self.manager = User.objects.create_user(
+            username='manager',
+            email='manager@example.com',
+            password='managerpass123',
+            name='Manager User'
+        )
+        self.monday = first_monday(2030, 1)
+        self.client = APIClient()
+        events.reset()
+
+    def apply(self, weeks=0):
+        self.client.force_authenticate(user=self.user)
+        start = self.monday + timedelta(weeks=weeks)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('application-list'), {
+                'leave_type': 'Vacation', 'start_date': start, 'end_date': start + timedelta(days=1),
+                'reason': 'Test', 'status': 'Pending', 'manager': self.manager.id,
+            })
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.data['id']
+
+    def decide(self, pk, decision='Approved'):
+        self.client.force_authenticate(user=self.manager)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(reverse('application-detail', args=[pk]), {'status': decision})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    @override_settings(EVENTS_BROKER='users.tests.RecordingBroker')
+    def test_changes_are_published_to_employee_and_manager(self):
+        broker = events.get_broker()
+        employee, manager = events.channel(self.user.id), events.channel(self.manager.id)
+        pk = self.apply()
+        self.decide(pk)
+        self.client.force_authenticate(user=self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(reverse('application-detail', args=[pk]))
+        self.assertEqual(sorted(broker.published), sorted(
+            (channel, event_type, pk, state)
+            for event_type, state in [(events.CREATED, 'Pending'), (events.STATUS_CHANGED, 'Approved'), (events.DELETED, 'Approved')]
+            for channel in [employee, manager]
+        ))
+
+    @override_settings(EVENTS_BROKER='users.tests.RecordingBroker')
+    def test_bulk_writes_publish_per_application(self):
+        broker = events.get_broker()
+        ids = [self.apply(weeks) for weeks in range(3)]
+        self.client.force_authenticate(user=self.manager)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('application-bulk-decision'), {'ids': ids, 'status': 'Rejected'}, format='json')
+        rejected = [(channel, pk) for channel, event_type, pk, state in broker.published if event_type == events.STATUS_CHANGED]
+        self.assertEqual(sorted(rejected), sorted((events.channel(user.id), pk) for pk in ids for user in [self.user, self.manager]))
+
+    @override_settings(EVENTS_BROKER='users.tests.RecordingBroker')
+    def test_rolled_back_changes_are_not_published(self):
+        broker = events.get_broker()
+        self.client.force_authenticate(user=self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('application-bulk-create'), [{'leave_type': 'Vacation'}], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(broker.published, [])
+
+    async def test_stream_pushes_status_changes(self):
+        pk = await sync_to_async(self.apply)()
+        token = tokens_for_user(self.user).access_token
+        response = await self.async_client.get(reverse('application-events'), {'token': str(token)})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        content = aiter(response.streaming_content)
+        self.assertEqual(await anext(content), b'retry: 5000\n\n')
+        await sync_to_async(self.decide)(pk)
+        message = (await asyncio.wait_for(anext(content), 5)).decode()
+        self.assertTrue(message.startswith(f'event: {events.STATUS_CHANGED}\n'))
+        event = json.loads(message.split('data: ', 1)[1])
+        self.assertEqual((event['id'], event['user'], event['manager'], event['status']), (pk, self.user.id, self.manager.id, 'Approved'))
+        await content.aclose()
+
+    @override_settings(EVENTS_KEEPALIVE_SECONDS=0.05)
+    async def test_stream_keeps_alive_and_ends_with_the_token(self):
+        chunks = [chunk async for chunk in events.stream(self.user.id, time.time() + 0.2)]
+        self.assertEqual(chunks[0], 'retry: 5000\n\n')
+        self.assertIn(': keepalive\n\n', chunks)
+        self.assertEqual(events.get_broker().subscribers(events.channel(self.user.id)), 0)
+
+    async def test_stream_authentication(self):
+        response = await self.async_client.get(reverse('application-events'), {'token': 'not-a-token'})
+        self.assertEqual(response.status_code, 401)
+        refresh = tokens_for_user(self.user)
+        response = await self.async_client.get(reverse('application-events'), {'token': str(refresh)})
+        self.assertEqual(response.status_code, 401)
+
+    def test_stream_needs_asgi(self):
+        token = tokens_for_user(self.user).access_token
+        response = self.client.get(reverse('application-events'), {'token': str(token)})
+        self.assertEqual(response.status_code, status.HTTP_501_NOT_IMPLEMENTED)
+
+    async def test_slow_subscriber_is_told_to_resync(self):
+        broker = events.InProcessBroker(max_queued=2)
+        subscription = broker.subscribe('user:1')
+        await asyncio.gather(*(
+            asyncio.to_thread(broker.publish, 'user:1', {'type': events.CREATED, 'id': pk}) for pk in range(3)
+        ))
+        await asyncio.sleep(0)
+        self.assertEqual(await subscription.get(), {'type': events.RESYNC})
+        subscription.close()
+        self.assertEqual(broker.subscribers('user:1'), 0)
+
+
+@override_settings(ARCHIVE_HOT_YEARS=2)
+class ArchiveTests(TestCase):
+    def setUp(self):
+        cache.dashboard_cache().clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123',
+            name='Test User'
+        )
+        self.manager = User.objects.create_user(
+            username='manager',
+            email='manager@example.com',
+            password='managerpass123',
+            name='Manager User'
+        )
+        old = first_monday(timezone.now().year - 2, 3)
+        recent = first_monday(timezone.now().year - 1, 3)
+        self.old_ids = [self.apply(old + timedelta(weeks=weeks), Status.APPROVED) for weeks in range(3)]
+        self.pending_id = self.apply(old + timedelta(weeks=4), Status.PENDING)
+        self.recent_id = self.apply(recent, Status.REJECTED)
+
+    def apply(self, start_date, leave_status):
+        return Application.objects.create(
+            user=self.user, leave_type=leave_type_named('Vacation'), start_date=start_date,
+            end_date=start_date + timedelta(days=1), reason='Test', status=leave_status, manager=self.manager
+        ).id
+
+    def listed(self, name, user, **params):
+        self.client.force_authenticate(user=user)
+        response = self.client.get(reverse(name), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return sorted(row['id'] for row in response.data)
+
+    def test_moves_closed_applications_before_horizon_in_batches(self):
+        self.assertEqual(archive.horizon(date(2024, 6, 1)), date(2023, 1, 1))
+        balances = ledger.stored_balances()
+
+        call_command('archive_applications', batch_size=2, max_batches=1, stdout=StringIO())
+        self.assertEqual(ArchivedApplication.objects.count(), 2)
+        out = StringIO()
+        call_command('archive_applications', batch_size=2, stdout=out)
+        self.assertIn('Archived 1 application(s)', out.getvalue())
+
+        self.assertEqual(sorted(ArchivedApplication.objects.values_list('id', flat=True)), self.old_ids)
+        self.assertEqual(sorted(Application.objects.values_list('id', flat=True)), [self.pending_id, self.recent_id])
+        self.assertEqual(ledger.stored_balances(), balances)
+        self.assertEqual(ledger.differences(), [])
+
+    def test_lists_read_the_archive_only_when_asked(self):
+        views = [('application-list', self.user), ('subordinate-applications-list', self.manager)]
+        for name, user in views:
+            self.assertEqual(self.listed(name, user, archived='true'), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('archive_applications', stdout=StringIO())
+        for name, user in views:
+            self.assertEqual(self.listed(name, user), [self.pending_id, self.recent_id])
+            self.assertEqual(self.listed(name, user, archived='true'), self.old_ids)
+
+    def test_analytics_and_exports(self):
+        call_command('archive_applications', stdout=StringIO())
+        self.client.force_authenticate(user=self.manager)
+        year = timezone.now().year - 2
+        params = {'start': f'{year}-01-01', 'end': f'{year}-12-31', 'group_by': 'status'}
+        rows = self.client.get(reverse('leave-analytics'), params).data
+        self.assertEqual([row['status'] for row in rows], ['Pending'])
+        rows = self.client.get(reverse('leave-analytics'), dict(params, include_archive='true')).data
+        self.assertEqual([(row['status'], row['working_days']) for row in rows], [('Pending', 2), ('Approved', 6)])
+
+        response = self.client.get(reverse('export-applications'), {'archived': 'true', 'output': 'ndjson'})
+        exported = [json.loads(line)['id'] for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(exported, self.old_ids)
+
+    def test_refuses_hot_dates(self):
+        with self.assertRaises(CommandError):
+            call_command('archive_applications', '--before', f'{timezone.now().year}-01-01', stdout=StringIO())
+
+
+class ReportJobTests(TestCase):
+    def setUp(self):
+        cache.dashboard_cache().clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123',
+            name='Test User'
+        )
+        self.manager = User.objects.create_user(
+            username='manager',
+            email='manager@example.com',
+            password='managerpass123',
+            name='Manager User'
+        )
+        self.year = timezone.now().year
+        self.apply(first_monday(self.year, 3))
+        self.client.force_authenticate(user=self.manager)
+
+    def apply(self, start_date):
+        return Application.objects.create(
+            user=self.user, leave_type=leave_type_named('Vacation'), start_date=start_date,
+            end_date=start_date + timedelta(days=1), reason='Test', status=Status.APPROVED, manager=self.manager
+        )
+
+    def work(self):
+        call_command('run_report_jobs', once=True, stdout=StringIO())
+
+    def test_start_poll_and_fetch(self):
+        response = self.client.post(reverse('report-job-start'))
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response['Location'], response.data['url'])
+        self.assertEqual((response.data['status'], response.data['scope'], response.data['year']), ('Queued', 'direct', self.year))
+        self.assertEqual(self.client.post(reverse('report-job-start')).data['id'], response.data['id'])
+        result = self.client.get(response.data['result_url'])
+        self.assertEqual((result.status_code, result.data['status']), (status.HTTP_409_CONFLICT, 'Queued'))
+
+        self.work()
+        self.assertEqual(self.client.get(response.data['url']).data['status'], 'Done')
+        result = self.client.get(response.data['result_url'])
+        self.assertEqual(result.status_code, status.HTTP_200_OK)
+        self.assertEqual(result.data, jobs.build(self.manager.id, 'direct', self.year))
+        self.assertEqual(result.data[0]['leave_types'][0]['approved_days'], 2)
+
+        self.client.force_authenticate(user=self.user)
+        self.assertEqual(self.client.get(response.data['url']).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_dashboard_serves_current_snapshot(self):
+        jobs.enqueue(self.manager.id, 'direct', self.year)
+        self.work()
+        ReportJob.objects.update(result=[{'employee_name': 'From snapshot', 'leave_types': []}])
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('total-leaves-report'))
+        self.assertEqual(response.data[0]['employee_name'], 'From snapshot')
+
+        # A change moves the watermark on: the stored report is no longer served.
+        with self.captureOnCommitCallbacks(execute=True):
+            self.apply(first_monday(self.year, 5))
+        response = self.client.get(reverse('total-leaves-report'))
+        self.assertEqual(response.data[0]['leave_types'][0]['approved_days'], 4)
+
+    def test_claim_and_stale_jobs(self):
+        job = jobs.enqueue(self.manager.id, 'direct', self.year)
+        self.assertEqual(jobs.claim().pk, job.pk)
+        self.assertIsNone(jobs.claim())
+
+        ReportJob.objects.update(started_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(jobs.requeue_stale(), 1)
+        self.assertEqual(jobs.claim().attempts, 2)
+        with override_settings(REPORT_JOB_MAX_ATTEMPTS=2):
+            ReportJob.objects.update(started_at=timezone.now() - timedelta(hours=1))
+            self.assertEqual(jobs.requeue_stale(), 0)
+        self.assertEqual(ReportJob.objects.get().status, JobStatus.FAILED)
+
+    def test_nightly_precompute(self):
+        lead = User.objects.create_user(username='lead', email='lead@example.com', password='leadpass123', name='Lead')
+        User.objects.filter(pk=self.manager.pk).update(reports_to=lead)
+        old = ReportJob.objects.create(manager=self.manager, scope='direct', year=self.year - 1, status=JobStatus.DONE)
+        ReportJob.objects.filter(pk=old.pk).update(finished_at=timezone.now() - timedelta(days=30))
+
+        call_command('enqueue_report_snapshots', stdout=StringIO())
+        self.assertFalse(ReportJob.objects.filter(pk=old.pk).exists())
+        self.assertEqual(
+            sorted(ReportJob.objects.values_list('manager_id', 'scope')),
+            [(self.manager.id, 'direct'), (lead.id, 'direct'), (lead.id, 'subtree')],
+        )
+        self.work()
+        self.assertEqual(ReportJob.objects.filter(status=JobStatus.DONE).count(), 3)
+
+
+def throttle_rates(**rates):
+    return override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': rates})
+
+class ApiThrottleTests(TestCase):
+    def setUp(self):
+        throttling.reset()
+        self.addCleanup(throttling.reset)
+        cache.dashboard_cache().clear()
+        self.client = APIClient()
+        self.manager = User.objects.create_user(
+            username='manager',
+            email='manager@example.com',
+            password='managerpass123',
+            name='Manager User'
+        )
+        self.other = User.objects.create_user(
+            username='other', email='other@example.com', password='otherpass123', name='Other Manager'
+        )
+
+    def get(self, name, user):
+        self.client.force_authenticate(user=user)
+        return self.client.get(reverse(name))
+
+    def test_forwarded_for_needs_trusted_proxies(self):
+        throttle = throttling.SignInAddressThrottle()
+        request = APIRequestFactory().post(reverse('signin'), HTTP_X_FORWARDED_FOR='203.0.113.9, 198.51.100.7', REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(throttle.get_ident(request), '10.0.0.1')
+        with override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'NUM_PROXIES': 1}):
+            self.assertEqual(throttle.get_ident(request), '198.51.100.7')
+
+    def test_per_endpoint_rate(self):
+        with throttle_rates(user='10/minute', **{'total-leaves-report': '2/minute'}):
+            for _ in range(2):
+                self.assertEqual(self.get('total-leaves-report', self.manager).status_code, status.HTTP_200_OK)
+            response = self.get('total-leaves-report', self.manager)
+            self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+            self.assertGreater(int(response['Retry-After']), 0)
+            self.assertEqual(self.get('subordinate-applications-list', self.manager).status_code, status.HTTP_200_OK)
+            self.assertEqual(self.get('total-leaves-report', self.other).status_code, status.HTTP_200_OK)
+
+    def test_per_user_rate(self):
+        with throttle_rates(user='2/minute'):
+            self.assertEqual(self.get('total-leaves-report', self.manager).status_code, status.HTTP_200_OK)
+            self.assertEqual(self.get('subordinate-applications-list', self.manager).status_code, status.HTTP_200_OK)
+            self.assertEqual(self.get('application-list', self.manager).status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+            self.assertEqual(self.get('application-list', self.other).status_code, status.HTTP_200_OK)
+
+    def test_empty_rate_disables(self):
+        with throttle_rates(user=''):
+            for _ in range(5):
+                self.assertEqual(self.get('application-list', self.manager).status_code, status.HTTP_200_OK)
+
+class RequestCoalescingTests(TestCase):
+    def setUp(self):
+        cache.dashboard_cache().clear()
+        cache.stats.clear()
+
+    def concurrently(self, count, call):
+        results = [None] * count
+
+        def run(index):
+            try:
+                results[index] = call()
+            except Exception as exc:
+                results[index] = exc
+
+        threads = [threading.Thread(target=run, args=[index]) for index in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_concurrent_misses_compute_once(self):
+        calls = []
+        release = threading.Event()
+
+        def compute():
+            calls.append(1)
+            release.wait(5)
+            return {'report': len(calls)}
+
+        leader = threading.Thread(target=cache.get_or_compute, args=['total-leaves-report', 1, QueryDict(), compute])
+        leader.start()
+        threading.Timer(0.2, release.set).start()
+        results = self.concurrently(4, lambda: cache.get_or_compute('total-leaves-report', 1, QueryDict(), compute))
+        leader.join()
+        self.assertEqual(calls, [1])
+        self.assertEqual(results, [{'report': 1}] * 4)
+        self.assertEqual((cache.stats['misses'], cache.stats['coalesced']), (1, 4))
+
+        # Finished flights are forgotten; the next miss, e.g. after an invalidation, computes again.
+        cache.invalidate(1)
+        self.assertEqual(cache.get_or_compute('total-leaves-report', 1, QueryDict(), compute), {'report': 2})
+
+    def test_errors_are_shared(self):
+        group = singleflight.Group()
+        entered = threading.Event()
+        release = threading.Event()
+
+        def compute():
+            entered.set()
+            release.wait(5)
+            raise ValueError('failed')
+
+        thread = threading.Thread(target=lambda: self.assertRaises(ValueError, group.do, 'key', compute))
+        thread.start()
+        entered.wait(5)
+        threading.Timer(0.2, release.set).start()
+        results = self.concurrently(3, lambda: group.do('key', compute))
+        thread.join()
+        self.assertTrue(all(isinstance(result, ValueError) for result in results))
+        self.assertEqual(group.do('key', lambda: 'fresh'), ('fresh', False))
+
+    def test_async_misses_compute_once(self):
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return {'report': len(calls)}
+
+        async def dashboards():
+            return await asyncio.gather(*[
+                cache.aget_or_compute('subordinate-applications', 1, QueryDict(), compute) for _ in range(5)
+            ])
+
+        self.assertEqual(asyncio.run(dashboards()), [{'report': 1}] * 5)
+        self.assertEqual(calls, [1])
+        self.assertEqual((cache.stats['misses'], cache.stats['coalesced']), (1, 4))
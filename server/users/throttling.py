@@ -0,0 +1,172 @@
+import threading
+import time
+from django.conf import settings
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate):
+    """'5/minute' -> (5, 60), the same notation as DRF's throttle rates. None disables."""
+    if rate is None:
+        return None
+    count, period = rate.split('/')
+    return int(count), PERIODS[period[0]]
+
+
+class TokenBucket:
+    """
+    `capacity` tokens per key, refilled continuously at capacity per `period` seconds. Kept in
+    process memory: every server process enforces its own buckets.
+    """
+
+    def __init__(self, capacity, period, max_keys=100000):
+        self.capacity = capacity
+        self.per_second = capacity / period
+        self.max_keys = max_keys
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def _level(self, key, now):
+        tokens, updated = self._buckets.get(key, (self.capacity, now))
+        return min(self.capacity, tokens + (now - updated) * self.per_second)
+
+    def wait(self, key):
+        """Seconds until `key` has a token; 0 when it has one now."""
+        with self._lock:
+            level = self._level(key, time.monotonic())
+        return 0 if level >= 1 else (1 - level) / self.per_second
+
+    def take(self, key):
+        with self._lock:
+            now = time.monotonic()
+            self._buckets[key] = (max(0, self._level(key, now) - 1), now)
+            if len(self._buckets) > self.max_keys:
+                self._prune(now)
+
+    def acquire(self, key):
+        """Take a token if `key` has one and return 0, else return the seconds until it has."""
+        with self._lock:
+            now = time.monotonic()
+            level = self._level(key, now)
+            if level < 1:
+                return (1 - level) / self.per_second
+            self._buckets[key] = (level - 1, now)
+            if len(self._buckets) > self.max_keys:
+                self._prune(now)
+            return 0
+
+    def _prune(self, now):
+        # Full buckets look the same as absent ones.
+        for key in [key for key in self._buckets if self._level(key, now) >= self.capacity]:
+            del self._buckets[key]
+
+
+_buckets = {}
+_lock = threading.Lock()
+
+
+def get_bucket(scope, rate):
+    with _lock:
+        if (scope, rate) not in _buckets:
+            _buckets[scope, rate] = TokenBucket(*parse_rate(rate))
+        return _buckets[scope, rate]
+
+
+def reset():
+    with _lock:
+        _buckets.clear()
+
+
+class FailedSignInThrottle(BaseThrottle):
+    """
+    Let a sign-in through while the caller's bucket has a token. Only failed attempts take
+    one (see `failed`), so an office signing in from one address is not throttled by its own
+    successful logins. Rates come from SIGNIN_THROTTLE_RATES[scope].
+    """
+    scope = None
+
+    def get_key(self, request):
+        raise NotImplementedError('.get_key() must be overridden')
+
+    def bucket(self):
+        rate = settings.SIGNIN_THROTTLE_RATES.get(self.scope)
+        return get_bucket(self.scope, rate) if rate else None
+
+    def allow_request(self, request, view):
+        bucket, key = self.bucket(), self.get_key(request)
+        self.seconds = bucket.wait(key) if bucket and key else 0
+        return not self.seconds
+
+    def wait(self):
+        return self.seconds
+
+    def failed(self, request):
+        bucket, key = self.bucket(), self.get_key(request)
+        if bucket and key:
+            bucket.take(key)
+
+
+class SignInUsernameThrottle(FailedSignInThrottle):
+    scope = 'username'
+
+    def get_key(self, request):
+        return str(request.data.get('username', '')).strip().lower()
+
+
+class SignInAddressThrottle(FailedSignInThrottle):
+    scope = 'address'
+
+    def get_key(self, request):
+        return self.get_ident(request)
+
+
+class BucketRateThrottle(BaseThrottle):
+    """
+    DRF's rate throttling on in-memory token buckets: every request takes a token, so a client
+    may burst up to the rate's count and is then held to its pace. Rates come from
+    REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'][scope] and are read per request; a missing or
+    empty rate disables the throttle.
+    """
+    scope = None
+
+    def get_scope(self, view):
+        return self.scope
+
+    def get_key(self, request, view):
+        raise NotImplementedError('.get_key() must be overridden')
+
+    def allow_request(self, request, view):
+        scope = self.get_scope(view)
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(scope) if scope else None
+        key = self.get_key(request, view) if rate else None
+        self.seconds = get_bucket(scope, rate).acquire(key) if key else 0
+        return not self.seconds
+
+    def wait(self):
+        return self.seconds
+
+
+class UserBucketThrottle(BucketRateThrottle):
+    """All of a user's requests, at the 'user' rate; anonymous ones per address at the 'anon' rate."""
+
+    def get_scope(self, view):
+        return 'user' if self.user_id else 'anon'
+
+    def allow_request(self, request, view):
+        self.user_id = request.user.id if request.user and request.user.is_authenticated else None
+        return super().allow_request(request, view)
+
+    def get_key(self, request, view):
+        return self.user_id or self.get_ident(request)
+
+
+class EndpointBucketThrottle(UserBucketThrottle):
+    """
+    A user's (or anonymous address's) requests to one endpoint, at the rate of the view's
+    `throttle_scope` if it names one. Each scope has its own buckets.
+    """
+
+    def get_scope(self, view):
+        return getattr(view, 'throttle_scope', None)
@@ -10,6 +10,19 @@ urlpatterns = [
     path('token/verify/', TokenVerifyView.as_view(), name='token_verify'),
     path('applications/', views.ApplicationList.as_view(), name='application-list'),
     path('applications/<int:pk>/', views.ApplicationDetail.as_view(), name='application-detail'),
+    path('applications/bulk/', views.BulkApplicationCreate.as_view(), name='application-bulk-create'),
+    path('applications/decisions/', views.BulkApplicationDecision.as_view(), name='application-bulk-decision'),
     path('subordinate-applications/', views.SubordinateApplicationsList.as_view(), name='subordinate-applications-list'),
     path('total-leaves-report/', views.TotalLeaveReport.as_view(), name='total-leaves-report'),
+    path('total-leaves-report/jobs/', views.ReportJobStart.as_view(), name='report-job-start'),
+    path('total-leaves-report/jobs/<int:pk>/', views.ReportJobDetail.as_view(), name='report-job-detail'),
+    path('total-leaves-report/jobs/<int:pk>/result/', views.ReportJobResult.as_view(), name='report-job-result'),
+    path('leave-analytics/', views.LeaveAnalytics.as_view(), name='leave-analytics'),
+    path('team-conflicts/', views.TeamConflicts.as_view(), name='team-conflicts'),
+    path('export/applications/', views.ApplicationExport.as_view(), name='export-applications'),
+    path('export/leave-report/', views.LeaveReportExport.as_view(), name='export-leave-report'),
+    path('cache-stats/', views.DashboardCacheStats.as_view(), name='cache-stats'),
+    path('events/', views.ApplicationEvents.as_view(), name='application-events'),
+    path('metrics/', views.RequestMetrics.as_view(), name='request-metrics'),
+    path('metrics/prometheus/', views.PrometheusMetrics.as_view(), name='prometheus-metrics'),
 ]
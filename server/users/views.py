@@ -1,27 +1,47 @@
-from . import serializers, models, permissions
+from . import archive, jobs, serializers, models, permissions, reports, pagination, cache, conditional, signals, overlaps, exports, hierarchy, instrumentation, events, throttling
+from .asyncviews import AsyncGetMixin
 from rest_framework import generics
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework_simplejwt.tokens import RefreshToken
+from .authentication import tokens_for_user
 from django.contrib.auth import authenticate
 from rest_framework_simplejwt.views import TokenRefreshView
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from django.utils import timezone
-from django.db.models import F, Sum, Case, When, IntegerField
+from datetime import timedelta
+from django.db import transaction
+from django.db.models import F, Q
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.views import View
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.tokens import AccessToken
 
-class UserList(generics.ListCreateAPIView):
+class UserList(AsyncGetMixin, generics.ListCreateAPIView):
     serializer_class = serializers.UserSerializer 
+    pagination_class = pagination.KeysetPagination
 
     def get_queryset(self):
         return models.User.objects.exclude(id=self.request.user.id)
 
+    async def aget(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = await self.apaginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(self.get_serializer(page, many=True).data)
+        users = [user async for user in queryset]
+        return Response(self.get_serializer(users, many=True).data)
+
 class UserDetail(generics.RetrieveUpdateDestroyAPIView):
     queryset = models.User.objects.all()
     serializer_class = serializers.UserSerializer
     permission_classes = [IsAuthenticated]
 
 class SignIn(APIView):
+    throttle_classes = [throttling.SignInAddressThrottle, throttling.SignInUsernameThrottle]
+
     def post(self, request):
         serializer = serializers.UserSignInSerializer(data=request.data)
         if serializer.is_valid():
@@ -31,7 +51,7 @@ class SignIn(APIView):
             user = authenticate(username=username, password=password)
 
             if user:
-                refresh = RefreshToken.for_user(user)
+                refresh = tokens_for_user(user)
                 user_data = serializers.UserSerializer(user).data
                 return Response({
                     'refresh': str(refresh),
@@ -40,6 +60,8 @@ class SignIn(APIView):
                 })
 
             else:
+                for throttle in self.get_throttles():
+                    throttle.failed(request)
                 return Response({'error': 'Invalid credentials'}, status=status.HTTP_401_UNAUTHORIZED) 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
@@ -47,65 +69,466 @@ class SignIn(APIView):
 class CustomTokenRefreshView(TokenRefreshView):
     serializer_class = serializers.CustomTokenRefreshSerializer
 
-class ApplicationList(generics.ListCreateAPIView):
+class ApplicationRowsListMixin:
+    """List applications from values() rows, rendered by serializers.application_row."""
+
+    def list(self, request, *args, **kwargs):
+        rows = self.filter_queryset(self.get_queryset()).values(*serializers.APPLICATION_LIST_FIELDS)
+        page = self.paginate_queryset(rows)
+        return self.rows_response(request, rows if page is None else page, page is not None)
+
+    async def alist(self, request, *args, **kwargs):
+        rows = self.filter_queryset(self.get_queryset()).values(*serializers.APPLICATION_LIST_FIELDS)
+        page = await self.apaginate_queryset(rows)
+        if page is None:
+            rows = [row async for row in rows]
+        return self.rows_response(request, rows if page is None else page, page is not None)
+
+    def rows_response(self, request, rows, paginated):
+        with instrumentation.timed(request):
+            data = [serializers.application_row(row) for row in rows]
+        if paginated:
+            return self.get_paginated_response(data)
+        return Response(data)
+
+class ApplicationList(AsyncGetMixin, ApplicationRowsListMixin, generics.ListCreateAPIView):
     serializer_class = serializers.ApplicationSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = pagination.KeysetPagination
 
     def get_queryset(self):
-        return models.Application.objects.filter(user=self.request.user)
+        applications = archive.source(requested_archive(self.request)).objects
+        return applications.filter(user_id=self.request.user.id).select_related('user')
 
-    def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+    @conditional.conditional_get('applications')
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+    @conditional.conditional_get('applications')
+    async def aget(self, request, *args, **kwargs):
+        return await self.alist(request, *args, **kwargs)
+
+    # Validation locks the employee for its overlap check and the ledger is updated from model
+    # signals, so the whole request is one transaction.
+    @transaction.atomic
+    def create(self, request, *args, **kwargs):
+        return super().create(request, *args, **kwargs)
+
+class BulkApplicationCreate(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        items = request.data
+        if not isinstance(items, list) or not items:
+            return Response({'error': 'Expected a non-empty list of applications'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > settings.BULK_MAX_ITEMS:
+            return Response({'error': f'At most {settings.BULK_MAX_ITEMS} applications per request'}, status=status.HTTP_400_BAD_REQUEST)
+
+        requested_managers = set()
+        requested_leave_types = set()
+        for item in items:
+            try:
+                requested_managers.add(int(item['manager']))
+            except (TypeError, KeyError, ValueError):
+                pass
+            if isinstance(item, dict) and isinstance(item.get('leave_type'), str) and item['leave_type'].strip():
+                requested_leave_types.add(item['leave_type'].strip())
+        context = {
+            'request': request,
+            'manager_ids': set(models.User.objects.filter(pk__in=requested_managers).values_list('id', flat=True)),
+            'leave_types': models.leave_types_named(requested_leave_types, add_missing=False) if requested_leave_types else {},
+        }
+
+        results = [None] * len(items)
+        valid = []
+        for index, item in enumerate(items):
+            serializer = serializers.BulkApplicationSerializer(data=item, context=context)
+            if serializer.is_valid():
+                valid.append((index, serializer.validated_data))
+            else:
+                results[index] = {'index': index, 'status': 'invalid', 'errors': serializer.errors}
+
+        with transaction.atomic():
+            # One bounded range query covers existing leave that could overlap any item in the batch,
+            # read holding the user's row so concurrent submissions cannot book the same days.
+            booked = overlaps.IntervalIndex()
+            if valid:
+                overlaps.lock_users(request.user.id)
+                existing = overlaps.overlapping(
+                    models.Application.objects.filter(user_id=request.user.id),
+                    min(data['start_date'] for _, data in valid),
+                    max(data['end_date'] for _, data in valid),
+                ).values_list('start_date', 'end_date', 'id')
+                booked = overlaps.IntervalIndex((start, end, f'application {pk}') for start, end, pk in existing)
+
+            accepted = []
+            for index, data in valid:
+                clashes = [value for _, _, value in booked.overlapping(data['start_date'], data['end_date'])]
+                if clashes:
+                    results[index] = {'index': index, 'status': 'invalid', 'errors': {'non_field_errors': [serializers.overlap_error(clashes)]}}
+                    continue
+                booked.add(data['start_date'], data['end_date'], f'item {index}')
+                results[index] = {'index': index, 'status': 'created'}
+                accepted.append(data)
+
+            serializers.add_leave_types(accepted)
+            applications = models.Application.objects.bulk_create([
+                models.Application(
+                    user_id=request.user.id,
+                    manager_id=data['manager'],
+                    leave_type=data['leave_type'],
+                    start_date=data['start_date'],
+                    end_date=data['end_date'],
+                    reason=data['reason'],
+                    status=models.Status.PENDING,
+                )
+                for data in accepted
+            ])
+            signals.applications_changed(
+                added=[models.ledger_entry(application) for application in applications],
+                notify=[(events.CREATED, application) for application in applications],
+            )
+
+        created = iter(applications)
+        for result in results:
+            if result['status'] == 'created':
+                result['id'] = next(created).id
+
+        if not applications:
+            response_status = status.HTTP_400_BAD_REQUEST
+        elif len(applications) < len(items):
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_201_CREATED
+        return Response(results, status=response_status)
+
+class BulkApplicationDecision(APIView):
+    """Set the status of many subordinate applications with one permission-filtered UPDATE."""
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        serializer = serializers.BulkDecisionSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        ids = serializer.validated_data['ids']
+        new_status = serializer.validated_data['status']
+
+        with transaction.atomic():
+            # Only the caller's subordinate applications are visible, so foreign ids read as not found.
+            visible = models.Application.objects.filter(id__in=ids, manager_id=request.user.id)
+            if new_status in overlaps.ACTIVE_STATUSES:
+                # Employees before applications, in the order single updates take them.
+                overlaps.lock_users(*visible.values_list('user_id', flat=True))
+            applications = list(
+                visible.select_for_update(of=['self'])
+                .select_related('leave_type')
+                .only(*models.LEDGER_FIELDS, 'leave_type__name')
+            )
+            changing = [application for application in applications if application.status != new_status]
+            # Rejected leave made active again must not overlap the employee's other leave.
+            clashing = set()
+            if new_status in overlaps.ACTIVE_STATUSES:
+                clashing = overlaps.reactivation_clashes(
+                    [application for application in changing if application.status not in overlaps.ACTIVE_STATUSES]
+                )
+                changing = [application for application in changing if application.id not in clashing]
+            models.Application.objects.filter(id__in=[application.id for application in changing]).update(status=new_status)
+
+            removed = [models.ledger_entry(application) for application in changing]
+            for application in changing:
+                application.status = new_status
+            signals.applications_changed(
+                removed=removed,
+                added=[models.ledger_entry(application) for application in changing],
+                notify=[(events.STATUS_CHANGED, application) for application in changing],
+            )
+
+        outcome = {application.id: 'unchanged' for application in applications}
+        outcome.update({application.id: 'updated' for application in changing})
+        outcome.update({pk: 'overlaps' for pk in clashing})
+        return Response(
+            [{'id': pk, 'status': outcome.get(pk, 'not_found')} for pk in ids],
+            status=status.HTTP_200_OK,
+        )
 
 class ApplicationDetail(generics.RetrieveUpdateDestroyAPIView):
-    queryset = models.Application.objects.all()
+    queryset = models.Application.objects.select_related('user', 'leave_type')
     serializer_class = serializers.ApplicationSerializer
     permission_classes = [permissions.IsManagerOrDeleteOnly]
 
-class SubordinateApplicationsList(generics.ListAPIView):
+    # As in ApplicationList.create: validation locks the employee, and model signals update the ledger.
+    @transaction.atomic
+    def update(self, request, *args, **kwargs):
+        return super().update(request, *args, **kwargs)
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        instance.delete()
+
+def requested_scope(request):
+    serializer = serializers.ScopeSerializer(data=request.query_params)
+    serializer.is_valid(raise_exception=True)
+    return serializer.validated_data['scope']
+
+def requested_archive(request):
+    serializer = serializers.ArchiveSerializer(data=request.query_params)
+    serializer.is_valid(raise_exception=True)
+    return serializer.validated_data['archived']
+
+class SubordinateApplicationsList(AsyncGetMixin, ApplicationRowsListMixin, generics.ListAPIView):
     serializer_class = serializers.ApplicationSerializer
     permission_classes = [IsAuthenticated]
+    throttle_scope = 'subordinate-applications'
+    pagination_class = pagination.KeysetPagination
 
     def get_queryset(self):
-        return models.Application.objects.filter(manager=self.request.user)
+        applications = archive.source(requested_archive(self.request)).objects
+        if requested_scope(self.request) == 'subtree':
+            applications = applications.filter(user_id__in=hierarchy.subtree(self.request.user.id))
+        else:
+            applications = applications.filter(manager_id=self.request.user.id)
+        return applications.select_related('user')
+
+    @conditional.conditional_get('subordinate-applications')
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+    def list(self, request, *args, **kwargs):
+        data = cache.get_or_compute(
+            'subordinate-applications', request.user.id, request.query_params,
+            lambda: super(SubordinateApplicationsList, self).list(request, *args, **kwargs).data,
+        )
+        return Response(data)
+
+    @conditional.conditional_get('subordinate-applications')
+    async def aget(self, request, *args, **kwargs):
+        async def compute():
+            return (await self.alist(request, *args, **kwargs)).data
+
+        data = await cache.aget_or_compute('subordinate-applications', request.user.id, request.query_params, compute)
+        return Response(data)
     
 
-class TotalLeaveReport(APIView):
+class TotalLeaveReport(AsyncGetMixin, APIView):
     permission_classes = [IsAuthenticated]
+    throttle_scope = 'total-leaves-report'
 
+    @conditional.conditional_get('total-leaves-report', lambda request: [timezone.now().year])
     def get(self, request):
+        data = cache.get_or_compute('total-leaves-report', request.user.id, request.query_params, self.report)
+        return Response(data, status=status.HTTP_200_OK)
 
-        applications  = models.Application.objects.filter(
-            manager=request.user, 
-            start_date__year=timezone.now().year,
-            )
-        
-        users = applications.values('user__id', 'user__name').order_by('user__id').distinct('user__id')
+    @conditional.conditional_get('total-leaves-report', lambda request: [timezone.now().year])
+    async def aget(self, request):
+        data = await cache.aget_or_compute('total-leaves-report', request.user.id, request.query_params, self.areport)
+        return Response(data, status=status.HTTP_200_OK)
 
-        result = []
+    def report_key(self):
+        return self.request.user.id, requested_scope(self.request), timezone.now().year
 
-        for user in users:
-            user_leaves = applications.filter(user__id=user['user__id'])
-            
-            # Get unique leave types for this user
-            leave_types = user_leaves.values_list('leave_type', flat=True).distinct()
-            
-            leave_type_data = []
-            for leave_type in leave_types:
-                type_applications = user_leaves.filter(leave_type=leave_type)
-                
-                leave_type_data.append({
-                    'leave_type': leave_type,
-                    'total_days': sum((app.end_date - app.start_date).days + 1 for app in type_applications),
-                    'pending_days': sum((app.end_date - app.start_date).days + 1 for app in type_applications if app.status == 'Pending'),
-                    'approved_days': sum((app.end_date - app.start_date).days + 1 for app in type_applications if app.status == 'Approved'),
-                    'rejected_days': sum((app.end_date - app.start_date).days + 1 for app in type_applications if app.status == 'Rejected')
-                })
-            
-            result.append({
-                'employee_name': user['user__name'],
-                'leave_types': leave_type_data
-            })
+    def report(self):
+        # The nightly precompute (see users.jobs) leaves a snapshot that stays good until the next change.
+        snapshot = jobs.snapshot(*self.report_key())
+        if snapshot is not None:
+            return snapshot
+        return self.serialize(reports.balance_report(*reports.manager_balances(*self.report_key())))
 
+    async def areport(self):
+        snapshot = await jobs.asnapshot(*self.report_key())
+        if snapshot is not None:
+            return snapshot
+        return self.serialize(await reports.abalance_report(*reports.manager_balances(*self.report_key())))
+
+    def serialize(self, result):
         serializer = serializers.TotalLeaveReportSerializer(result, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
\ No newline at end of file
+        with instrumentation.timed(self.request):
+            return serializer.data
+
+class ReportJobStart(APIView):
+    """Queue a total leave report to be built by the background worker; poll the returned job."""
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        job = jobs.enqueue(request.user.id, requested_scope(request), timezone.now().year)
+        data = serializers.ReportJobSerializer(job, context={'request': request}).data
+        return Response(data, status=status.HTTP_202_ACCEPTED, headers={'Location': data['url']})
+
+class ReportJobDetail(generics.RetrieveAPIView):
+    serializer_class = serializers.ReportJobSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return models.ReportJob.objects.filter(manager_id=self.request.user.id).defer('result')
+
+class ReportJobResult(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk):
+        job = generics.get_object_or_404(
+            models.ReportJob.objects.filter(manager_id=request.user.id).only('status', 'result'), pk=pk,
+        )
+        if job.status != models.JobStatus.DONE:
+            return Response(
+                {'error': 'The report is not ready', 'status': job.get_status_display()}, status=status.HTTP_409_CONFLICT,
+            )
+        return Response(job.result, status=status.HTTP_200_OK)
+
+class TeamConflicts(APIView):
+    """Pairs of subordinates whose pending or approved leave overlaps inside a date window."""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        today = timezone.now().date()
+        window = serializers.DateWindowSerializer(data={
+            'start': request.query_params.get('start', today),
+            'end': request.query_params.get('end', today + timedelta(days=30)),
+        })
+        if not window.is_valid():
+            return Response(window.errors, status=status.HTTP_400_BAD_REQUEST)
+        start, end = window.validated_data['start'], window.validated_data['end']
+
+        rows = overlaps.overlapping(
+            models.Application.objects.filter(manager_id=request.user.id), start, end,
+        ).order_by('start_date', 'id').values('id', 'user_id', 'user__name', 'start_date', 'end_date')
+
+        result = [
+            {
+                'start_date': max(overlap_start, start),
+                'end_date': min(overlap_end, end),
+                'employees': [first['user__name'], second['user__name']],
+                'applications': [first['id'], second['id']],
+            }
+            for first, second, overlap_start, overlap_end in overlaps.conflicts(rows)
+        ]
+        serializer = serializers.TeamConflictSerializer(result, many=True)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+class LeaveAnalytics(APIView):
+    """
+    Leave days in an arbitrary date range, grouped by any of month, leave_type, status and employee
+    (e.g. ?start=2023-07-01&end=2024-06-30&group_by=month,leave_type). Managers see their
+    subordinates; staff see everyone and may filter by manager.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        query = serializers.LeaveAnalyticsQuerySerializer(data=request.query_params)
+        if not query.is_valid():
+            return Response(query.errors, status=status.HTTP_400_BAD_REQUEST)
+        params = query.validated_data
+
+        manager_id = params.get('manager') if request.user.is_staff else request.user.id
+        result = reports.leave_analytics(params['start'], params['end'], params['group_by'], manager_id, params['include_archive'])
+        serializer = serializers.LeaveAnalyticsRowSerializer(result, many=True)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+class ExportView(APIView):
+    """
+    Base for the streaming exports. Staff see every application and may filter by manager;
+    everyone else only sees applications they submitted or manage. `archived=true` exports the archive.
+    """
+    permission_classes = [IsAuthenticated]
+    throttle_scope = 'exports'
+
+    def get(self, request):
+        filters = serializers.ExportFilterSerializer(data=request.query_params)
+        if not filters.is_valid():
+            return Response(filters.errors, status=status.HTTP_400_BAD_REQUEST)
+        params = filters.validated_data
+
+        applications = archive.source(params['archived']).objects.all()
+        if not request.user.is_staff:
+            applications = applications.filter(self.visible_to(request.user.id))
+        if 'manager' in params:
+            applications = applications.filter(manager_id=params['manager'])
+        if 'year' in params:
+            applications = applications.filter(reports.year_filter(params['year']))
+        if 'start' in params:
+            applications = applications.filter(start_date__gte=params['start'])
+        if 'end' in params:
+            applications = applications.filter(start_date__lte=params['end'])
+
+        return exports.stream(
+            self.rows(applications), self.fields, params['output'], self.filename,
+            asynchronous=isinstance(request._request, ASGIRequest),
+        )
+
+    def visible_to(self, user_id):
+        return Q(user_id=user_id) | Q(manager_id=user_id)
+
+class ApplicationExport(ExportView):
+    fields = ['id', 'employee_id', 'employee_name', 'leave_type', 'start_date', 'end_date', 'status', 'manager_id', 'reason']
+    filename = 'applications'
+
+    def rows(self, applications):
+        rows = applications.order_by('id').values(
+            'id', 'leave_type__name', 'start_date', 'end_date', 'status', 'manager_id', 'reason',
+            employee_id=F('user_id'), employee_name=F('user__name'),
+        ).iterator(chunk_size=exports.CHUNK_SIZE)
+        for row in rows:
+            row['leave_type'] = row['leave_type__name']
+            row['status'] = models.STATUS_LABELS[row['status']]
+            yield row
+
+class LeaveReportExport(ExportView):
+    fields = ['employee_id', 'employee_name', 'leave_type', 'total_days', 'pending_days', 'approved_days', 'rejected_days']
+    filename = 'leave-report'
+
+    def visible_to(self, user_id):
+        return Q(manager_id=user_id)
+
+    def rows(self, applications):
+        for row in reports.leave_totals(applications, 'user_id', 'user__name', 'leave_type__name', chunk_size=exports.CHUNK_SIZE):
+            row['employee_id'] = row['user_id']
+            row['employee_name'] = row['user__name']
+            row['leave_type'] = row['leave_type__name']
+            yield row
+
+class DashboardCacheStats(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response({name: cache.stats[name] for name in ['hits', 'misses', 'coalesced', 'invalidations']})
+
+class RequestMetrics(APIView):
+    """Per-route latency, query and serialization histograms from instrumentation.RequestMetricsMiddleware."""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response({
+            'query_budget': settings.REQUEST_QUERY_BUDGET,
+            'routes': instrumentation.snapshot(),
+            'dashboard_cache': {name: cache.stats[name] for name in ['hits', 'misses', 'coalesced', 'invalidations']},
+        })
+
+class PrometheusMetrics(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        cache_counters = [
+            ('dashboard_cache_total', {'result': name}, cache.stats[name]) for name in ['hits', 'misses', 'coalesced', 'invalidations']
+        ]
+        return HttpResponse(instrumentation.prometheus(cache_counters), content_type='text/plain; version=0.0.4')
+
+class ApplicationEvents(View):
+    """
+    Server-sent events of the signed-in user's application changes, as employee and as manager,
+    so dashboards update without polling. EventSource cannot set headers, so the access token
+    comes in the `token` query parameter and the stream ends when it expires. The browser's own
+    reconnect reuses the URL, so an expired token gets a 401 and EventSource gives up; the client
+    refreshes its tokens shortly before expiry and subscribes again (client/src/utils/api/events.js).
+    Needs the ASGI server: under WSGI a stream would hold a worker.
+    """
+
+    async def get(self, request):
+        if not isinstance(request, ASGIRequest):
+            return JsonResponse({'error': 'Event streams are only served by the ASGI application'}, status=status.HTTP_501_NOT_IMPLEMENTED)
+        try:
+            token = AccessToken(request.GET.get('token', ''))
+        except TokenError:
+            return JsonResponse({'detail': 'Given token not valid for any token type'}, status=status.HTTP_401_UNAUTHORIZED)
+        return StreamingHttpResponse(
+            events.stream(token['user_id'], token['exp']),
+            content_type='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+        )